@@ -0,0 +1,134 @@
+import logging
+from collections import defaultdict
+from schedule import monthly_totals
+
+# 월별 집계를 DB에서 바로 계산한다.
+#
+# Supabase는 sql/monthly_aggregates.sql 의 RPC 함수를, contracts.db(SQLite)는
+# 아래의 GROUP BY 쿼리를 사용한다. 두 경우 모두 start_month/end_month 필터를
+# DB 쪽에서 적용하므로 응답 크기는 행 수가 아니라 개월 수에 비례한다.
+# 월별 할부금은 기간과 겹치는 계약만 골라 겹치는 달만 펼치므로 계산량도 기간에 비례한다.
+# 결과는 {'YYYY-MM': 금액} (월 오름차순) 형태로 돌려준다.
+
+logger = logging.getLogger(__name__)
+
+SQLITE_MONTHLY_REVENUE = """
+    SELECT substr(payment_date, 1, 7) AS month, SUM(payment_amount) AS amount
+    FROM payment_records
+    WHERE (:start_month IS NULL OR payment_date >= :start_month || '-01')
+      AND (:end_month IS NULL OR payment_date <= :end_month || '-31')
+    GROUP BY month
+    ORDER BY month
+"""
+
+SQLITE_MONTHLY_INCOME = """
+    WITH RECURSIVE bounds (first_month, last_month) AS (
+        -- 'YYYY-MM' -> 월 번호 (기간이 없으면 NULL)
+        SELECT CAST(substr(:start_month, 1, 4) AS INTEGER) * 12 + CAST(substr(:start_month, 6, 2) AS INTEGER),
+               CAST(substr(:end_month, 1, 4) AS INTEGER) * 12 + CAST(substr(:end_month, 6, 2) AS INTEGER)
+    ),
+    candidates AS (
+        -- 기간과 겹치는 계약만: 끝 월 이전에 시작했고 (start_date 인덱스) 할부가 시작 월까지 이어지는 것
+        SELECT start_date, payment_months, total_installment, contract_amount,
+               CAST(substr(start_date, 1, 4) AS INTEGER) * 12 + CAST(substr(start_date, 6, 2) AS INTEGER) AS start_index
+        FROM contracts
+        WHERE (:end_month IS NULL OR start_date <= :end_month || '-31')
+    ),
+    overlapping AS (
+        SELECT candidates.* FROM candidates, bounds
+        WHERE first_month IS NULL OR start_index + MAX(payment_months, 1) > first_month
+    ),
+    installments (start_date, start_index, i, n, amount) AS (
+        -- 기간 시작 월에 해당하는 회차부터 펼친다
+        SELECT start_date, start_index,
+               CASE WHEN first_month > start_index THEN first_month - start_index ELSE 0 END,
+               payment_months,
+               CASE WHEN :include_contract_amount
+                    THEN (total_installment - contract_amount) * 1.0 / payment_months
+                    ELSE total_installment * 1.0 / payment_months
+               END
+        FROM overlapping, bounds
+        WHERE payment_months > 0
+        UNION ALL
+        SELECT start_date, start_index, i + 1, n, amount FROM installments, bounds
+        WHERE i + 1 < n AND (last_month IS NULL OR start_index + i + 1 <= last_month)
+    ),
+    entries (month, amount) AS (
+        SELECT substr(start_date, 1, 7), contract_amount
+        FROM overlapping
+        WHERE :include_contract_amount
+        UNION ALL
+        SELECT strftime('%Y-%m', start_date, 'start of month', '+' || i || ' months'), amount
+        FROM installments
+        UNION ALL
+        SELECT substr(start_date, 1, 7), total_installment - contract_amount
+        FROM overlapping
+        WHERE :include_contract_amount AND payment_months <= 0
+    )
+    SELECT month, SUM(amount) AS amount
+    FROM entries
+    WHERE (:start_month IS NULL OR month >= :start_month)
+      AND (:end_month IS NULL OR month <= :end_month)
+    GROUP BY month
+    ORDER BY month
+"""
+
+
+def month_range(start_month, end_month):
+    # 기존 라우트와 같이 두 값이 모두 있을 때만 필터링한다
+    if start_month and end_month:
+        return start_month, end_month
+    return None, None
+
+
+def supabase_monthly_revenue(client, start_month=None, end_month=None):
+    from postgrest.exceptions import APIError
+    start_month, end_month = month_range(start_month, end_month)
+    try:
+        response = client.rpc('monthly_revenue', {'start_month': start_month, 'end_month': end_month}).execute()
+        return {row['month']: row['amount'] for row in response.data}
+    except APIError as e:
+        logger.warning('monthly_revenue RPC 호출 실패, 클라이언트 집계로 대체합니다: %s', e)
+
+    query = client.table('payment_records').select('payment_date', 'payment_amount')
+    if start_month:
+        query = query.gte('payment_date', f'{start_month}-01').lte('payment_date', f'{end_month}-31')
+    monthly_revenue = defaultdict(float)
+    for record in query.execute().data:
+        monthly_revenue[record['payment_date'][:7]] += record['payment_amount']
+    return dict(sorted(monthly_revenue.items()))
+
+
+def supabase_monthly_income(client, start_month=None, end_month=None, include_contract_amount=True):
+    from postgrest.exceptions import APIError
+    start_month, end_month = month_range(start_month, end_month)
+    try:
+        response = client.rpc('monthly_income', {
+            'start_month': start_month,
+            'end_month': end_month,
+            'include_contract_amount': include_contract_amount
+        }).execute()
+        return {row['month']: row['amount'] for row in response.data}
+    except APIError as e:
+        logger.warning('monthly_income RPC 호출 실패, 클라이언트 집계로 대체합니다: %s', e)
+
+    query = client.table('contracts').select('start_date', 'contract_amount', 'total_installment', 'payment_months')
+    if end_month:
+        query = query.lte('start_date', f'{end_month}-31')
+    return monthly_totals(query.execute().data, include_contract_amount, start_month, end_month)
+
+
+def sqlite_monthly_revenue(conn, start_month=None, end_month=None):
+    start_month, end_month = month_range(start_month, end_month)
+    rows = conn.execute(SQLITE_MONTHLY_REVENUE, {'start_month': start_month, 'end_month': end_month})
+    return {month: amount for month, amount in rows}
+
+
+def sqlite_monthly_income(conn, start_month=None, end_month=None, include_contract_amount=True):
+    start_month, end_month = month_range(start_month, end_month)
+    rows = conn.execute(SQLITE_MONTHLY_INCOME, {
+        'start_month': start_month,
+        'end_month': end_month,
+        'include_contract_amount': int(include_contract_amount)
+    })
+    return {month: amount for month, amount in rows}
@@ -0,0 +1,183 @@
+import numpy as np
+from schedule import add_months, due_amounts, expand, months_elapsed
+
+# 미수금 연령 분석 (receivables aging)
+#
+# 기준일(as_of)까지 납기가 된 금액(스케줄)과 실제 입금액을 계약마다 비교해 연체액,
+# 가장 오래된 미납 항목의 납기일, 연체 일수/개월 수와 30/60/90일 연령 구간을 계산한다.
+# 입금 기록은 계약 상태와 같이 사업자번호로 계약에 연결하고, 한 사업자의 여러 계약에는
+# 시작일이 빠른 계약의 납기 금액부터 채운다 (FIFO). 한 계약 안에서도 가장 오래된 항목부터
+# 갚은 것으로 본다.
+#
+# 계약 × 월 행렬을 만들지 않는다. 스케줄이 계약금 + 같은 금액의 할부라서 어느 날짜까지의
+# 누적 납기 금액은 schedule.due_amounts로 바로 계산되고, 구간별 금액은 기준일과
+# 30/60/90일 전 누적 납기 금액의 차이로 구한다. 계약 수에 비례하는 벡터 연산 몇 번이다.
+
+BUCKETS = ('current', '0-30', '31-60', '61-90', '90+')
+CUTOFFS = (30, 60, 90)
+# 부동소수점 나눗셈 오차로 남는 금액은 연체로 보지 않는다
+TOLERANCE = 0.005
+
+ROW_FIELDS = ('id', 'title', 'business_number', 'representative', 'start_date', 'end_date', 'contract_total',
+              'due', 'paid', 'arrears', 'arrears_0_30', 'arrears_31_60', 'arrears_61_90', 'arrears_over_90',
+              'oldest_due_date', 'days_overdue', 'months_overdue', 'bucket')
+
+
+def _allocate(business, start_day, ids, due, paid_by_business):
+    # 사업자별 입금액을 (사업자, 시작일, id) 순으로 각 계약의 납기 금액에 채운다
+    order = np.lexsort((ids, start_day.view(np.int64), business))
+    ordered_business = business[order]
+    ordered_due = due[order]
+    group_start = np.ones(len(order), dtype=bool)
+    group_start[1:] = ordered_business[1:] != ordered_business[:-1]
+    first = np.maximum.accumulate(np.where(group_start, np.arange(len(order)), 0))
+    # 같은 사업자의 앞선 계약에 채운 납기 금액. 전체 누적합끼리 빼므로 자릿수 손실이
+    # 없도록 확장 정밀도로 누적한다
+    before = np.cumsum(ordered_due, dtype=np.longdouble) - ordered_due
+    prior = (before - before[first]).astype(np.float64)
+    allocated = np.empty_like(due)
+    allocated[order] = np.clip(paid_by_business[ordered_business] - prior, 0.0, ordered_due)
+    return allocated
+
+
+def aging_columns(contracts, payments, as_of, size):
+    """계약별 연령 분석 컬럼 배열 (snapshot.Frame 두 개와 기준일).
+
+    size는 사업자번호 코드의 범위(문자열 사전 크기)다. 문자열 컬럼은 코드 그대로 둔다.
+    """
+    as_of = np.datetime64(as_of, 'D')
+    start = contracts.start_day
+    schedule = (contracts.payment_months, contracts.total_installment, contracts.contract_amount)
+    due, due_count = due_amounts(start, *schedule, as_of)
+
+    # 기준일까지 들어온 입금만 센다
+    received = payments.day <= as_of
+    paid_by_business = np.bincount(payments.business[received], weights=payments.amount[received], minlength=size)
+    allocated = _allocate(contracts.business, start, contracts.id, due, paid_by_business)
+    arrears = due - allocated
+    late = arrears > TOLERANCE
+    arrears = np.where(late, arrears, 0.0)
+
+    # 30/60/90일이 넘은 연체액: 그 날짜까지의 납기 금액 중 아직 채우지 못한 부분
+    older = [np.where(late, np.maximum(due_amounts(start, *schedule, as_of - np.timedelta64(days, 'D'))[0] - allocated, 0.0), 0.0)
+             for days in CUTOFFS]
+
+    # 가장 오래된 미납 항목 p: 계약금부터 채우고 나머지는 회차 금액 단위로 채운다
+    months = contracts.payment_months
+    down = contracts.contract_amount
+    with np.errstate(divide='ignore', invalid='ignore'):
+        body = np.where(months > 0, (contracts.total_installment - down) / np.maximum(months, 1), contracts.total_installment - down)
+        paid_items = np.floor((allocated - down + TOLERANCE) / np.where(body > 0, body, 1.0))
+    unpaid = np.where(allocated + TOLERANCE < down, 0, 1 + np.maximum(paid_items, 0).astype(np.int64))
+    unpaid = np.minimum(unpaid, np.maximum(due_count - 1, 0))
+    oldest_due = np.where(late, add_months(start, np.maximum(unpaid - 1, 0)), np.datetime64('NaT'))
+    days_overdue = np.where(late, (as_of - oldest_due).astype(np.int64), 0)
+    months_overdue = np.where(late, np.maximum(months_elapsed(oldest_due, as_of), 0), 0)
+
+    bucket = np.select([~late, days_overdue <= CUTOFFS[0], days_overdue <= CUTOFFS[1], days_overdue <= CUTOFFS[2]],
+                       [0, 1, 2, 3], 4).astype(np.int8)
+    return {
+        'id': contracts.id,
+        'title': contracts.title,
+        'business': contracts.business,
+        'representative': contracts.representative,
+        'start_date': start,
+        'end_date': add_months(start, months),
+        'contract_total': contracts.total_installment,
+        'due': due,
+        'paid': allocated,
+        'arrears': arrears,
+        'arrears_0_30': arrears - older[0],
+        'arrears_31_60': older[0] - older[1],
+        'arrears_61_90': older[1] - older[2],
+        'arrears_over_90': older[2],
+        'oldest_due_date': oldest_due,
+        'days_overdue': days_overdue,
+        'months_overdue': months_overdue,
+        'bucket': bucket
+    }
+
+
+def monthly_arrears(contracts, payments):
+    """월말 기준 전체 연체액 -> (첫 월 인덱스, 월별 금액 배열).
+
+    사업자마다 그 달 말까지의 납기 금액에서 입금액을 뺀 값이 남으면 더한다. 한 사업자의 입금은
+    그 사업자 계약의 납기 금액에만 채우므로, 월말마다 aging_columns를 실행한 arrears 합계와 같다.
+    (사업자, 월)마다 증감이 있는 지점의 잔액만 계산하고, 잔액은 다음 증감까지 차분 배열로 이어 붙인다.
+    """
+    rows, due_month, due = expand(contracts.start_month, contracts.payment_months, contracts.total_installment,
+                                  contracts.contract_amount)
+    received = ~np.isnat(payments.day)
+    business = np.concatenate([contracts.business[rows], payments.business[received]])
+    month = np.concatenate([due_month, payments.day[received].astype('datetime64[M]').astype(np.int64)])
+    amount = np.concatenate([due, -payments.amount[received]])
+    if len(month) == 0:
+        return 0, np.zeros(0)
+
+    # (사업자, 월)별 증감 합계
+    order = np.lexsort((month, business))
+    business, month = business[order], month[order]
+    starts = np.flatnonzero(np.r_[True, (business[1:] != business[:-1]) | (month[1:] != month[:-1])])
+    business, month = business[starts], month[starts]
+    delta = np.add.reduceat(amount[order], starts)
+
+    # 사업자별 누적 잔액 (전체 누적합끼리 빼므로 확장 정밀도로 누적)
+    same = business[1:] == business[:-1]
+    group_first = np.maximum.accumulate(np.where(np.r_[True, ~same], np.arange(len(delta)), 0))
+    total = np.cumsum(delta, dtype=np.longdouble)
+    before = total - delta
+    balance = (total - before[group_first]).astype(np.float64)
+    owed = np.where(balance > TOLERANCE, balance, 0.0)
+
+    # 잔액은 같은 사업자의 다음 증감 월 전까지 유지된다: 그 월에 더하고 다음 증감 월에 뺀다
+    first = int(month.min())
+    size = int(month.max()) - first + 1
+    changes = np.bincount(month - first, weights=owed, minlength=size)
+    changes -= np.bincount(month[1:][same] - first, weights=owed[:-1][same], minlength=size)
+    arrears = np.cumsum(changes, dtype=np.longdouble).astype(np.float64)
+    return first, np.where(arrears > TOLERANCE, arrears, 0.0)
+
+
+def summary(columns):
+    # 구간별 계약 수와 연체액, 전체 납기/입금/연체 합계
+    bucket = columns['bucket']
+    counts = np.bincount(bucket, minlength=len(BUCKETS)).tolist()
+    amounts = np.bincount(bucket, weights=columns['arrears'], minlength=len(BUCKETS)).tolist()
+    return {
+        'contracts': len(bucket),
+        'due': float(columns['due'].sum()),
+        'paid': float(columns['paid'].sum()),
+        'arrears': float(columns['arrears'].sum()),
+        'buckets': [{'bucket': name, 'contracts': count, 'arrears': amount}
+                    for name, count, amount in zip(BUCKETS, counts, amounts)],
+        'aging': {
+            '0-30': float(columns['arrears_0_30'].sum()),
+            '31-60': float(columns['arrears_31_60'].sum()),
+            '61-90': float(columns['arrears_61_90'].sum()),
+            '90+': float(columns['arrears_over_90'].sum())
+        }
+    }
+
+
+def overdue_index(columns):
+    # 연체 계약 위치 (연체 일수, 연체액이 큰 순)
+    index = np.flatnonzero(columns['bucket'] > 0)
+    order = np.lexsort((-columns['arrears'][index], -columns['days_overdue'][index]))
+    return index[order]
+
+
+def aging_rows(columns, decode, index):
+    # index 위치의 계약을 화면/API/내보내기용 dict로 만든다
+    columns = {name: values[index] for name, values in columns.items()}
+    dates = {name: [None if value == 'NaT' else value for value in np.datetime_as_string(columns[name], unit='D').tolist()]
+             for name in ('start_date', 'end_date', 'oldest_due_date')}
+    for values in zip(
+            columns['id'].tolist(), decode(columns['title']), decode(columns['business']),
+            decode(columns['representative']), dates['start_date'], dates['end_date'],
+            columns['contract_total'].tolist(), columns['due'].tolist(), columns['paid'].tolist(),
+            columns['arrears'].tolist(), columns['arrears_0_30'].tolist(), columns['arrears_31_60'].tolist(),
+            columns['arrears_61_90'].tolist(), columns['arrears_over_90'].tolist(), dates['oldest_due_date'],
+            columns['days_overdue'].tolist(), columns['months_overdue'].tolist(), columns['bucket'].tolist()):
+        row = dict(zip(ROW_FIELDS, values))
+        row['bucket'] = BUCKETS[row['bucket']]
+        yield row
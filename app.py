@@ -1,30 +1,476 @@
-from flask import Flask, render_template, request, redirect, url_for, send_file, jsonify
-import pandas as pd
+from flask import Flask, render_template, request, redirect, url_for, send_file, jsonify, Response, stream_with_context
 from io import BytesIO
-from datetime import datetime
 from collections import defaultdict
-from dateutil.relativedelta import relativedelta
-from supabase import create_client, Client
+import numpy as np
+from itertools import chain
+from exports import iter_csv, iter_xlsx, CSV_MIMETYPE, XLSX_MIMETYPE
+from storage import create_repository, TABLE_COLUMNS
+from cache import create_cache
+from export_cache import create_export_cache
+import ledger
+from search_index import ContractSearchIndex, INDEX_COLUMNS
+from snapshot import AnalyticsSnapshot
+from schedule import month_index, month_labels, month_window
+import shared_aggregates
+import jobs
+import records
+import aging
+import reconcile
+import metrics
+import compression
+import series_format
 import os
+import tempfile
+import time
+import logging
+import click
 
 app = Flask(__name__)
 
-# Supabase 설정
-url = os.environ.get("SUPABASE_URL")
-key = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
+# 저장소 설정 (STORAGE_BACKEND: supabase | sqlite)
+app.config['STORAGE_BACKEND'] = os.environ.get('STORAGE_BACKEND', 'supabase')
+app.config['SUPABASE_URL'] = os.environ.get("SUPABASE_URL")
+app.config['SUPABASE_KEY'] = os.environ.get("SUPABASE_KEY")
+app.config['SQLITE_PATH'] = os.environ.get('SQLITE_PATH', os.path.join(app.root_path, 'contracts.db'))
+
+# 집계 캐시 설정 (CACHE_REDIS_URL이 있으면 Redis 호환 저장소 사용)
+app.config['CACHE_TTL'] = int(os.environ.get('CACHE_TTL', 300))
+app.config['CACHE_MAXSIZE'] = int(os.environ.get('CACHE_MAXSIZE', 256))
+app.config['CACHE_REDIS_URL'] = os.environ.get('CACHE_REDIS_URL')
+# 메모리 캐시의 테이블 버전 파일 디렉터리. 비우면 EXPORT_CACHE_DIR/versions를 함께 써서
+# 한 워커의 쓰기가 같은 호스트의 모든 워커 캐시 키를 바꾼다
+app.config['CACHE_VERSIONS_DIR'] = os.environ.get('CACHE_VERSIONS_DIR')
+
+# 자동완성 인덱스 재적재 주기(초). 다른 워커에서 생긴 변경을 반영하기 위함
+app.config['SEARCH_INDEX_REFRESH'] = int(os.environ.get('SEARCH_INDEX_REFRESH', 300))
+
+# 분석 스냅샷 재적재 주기(초). 이 프로세스의 쓰기는 바로 반영되고, 다른 워커의 쓰기는 공유 테이블
+# 버전이 바뀐 것을 보고 다음 조회에서 다시 적재한다. 이 주기는 DB를 직접 고친 경우의 안전장치다
+app.config['SNAPSHOT_REFRESH'] = int(os.environ.get('SNAPSHOT_REFRESH', 300))
+
+# 큰 표 화면(계약/입금 기록 목록, 월별 할부금, 계약 상태)은 렌더링하면서 이 크기(바이트)씩 전송
+app.config['STREAM_CHUNK_SIZE'] = int(os.environ.get('STREAM_CHUNK_SIZE', 8192))
+
+# 요청 계측 (/metrics). PROFILE_DIR을 지정하면 X-Profile 헤더가 붙은 요청을 cProfile로 기록
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR')
+metrics.init_app(app)
+
+# 응답 압축: 이 크기(바이트) 이상인 JSON/HTML/CSV/월별 시리즈 응답을 br 또는 gzip으로 보낸다 (0이면 끔)
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+compression.init_app(app)
+
+# 내보내기 파일 디스크 캐시 (EXPORT_CACHE_DIR를 비우면 사용하지 않음)
+app.config['EXPORT_CACHE_DIR'] = os.environ.get('EXPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'contracts-exports'))
+app.config['EXPORT_CACHE_MAX_BYTES'] = int(os.environ.get('EXPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+app.config['EXPORT_CACHE_TTL'] = int(os.environ.get('EXPORT_CACHE_TTL', 3600))
+
+# prefork 배포(gunicorn.conf.py)용 공유 집계 디렉터리. 지정하면 월별 시리즈와 계약 상태 표를
+# 갱신 프로세스 하나가 게시한 mmap 파일에서 읽고, 없으면 워커마다 직접 계산한다
+app.config['SHARED_AGGREGATES_DIR'] = os.environ.get('SHARED_AGGREGATES_DIR')
+app.config['SHARED_AGGREGATES_INTERVAL'] = int(os.environ.get('SHARED_AGGREGATES_INTERVAL', 60))
+
+# 백그라운드 내보내기 작업 (?async=1 또는 POST /export_jobs/<이름>). EXPORT_JOB_RUNNER가 thread면
+# 웹 프로세스의 스레드 풀에서, external이면 `flask export-worker` 프로세스에서 실행한다.
+# EXPORT_JOB_WORKERS는 배포 전체에서 동시에 실행되는 작업 수의 상한이다
+app.config['EXPORT_JOBS_DIR'] = os.environ.get('EXPORT_JOBS_DIR', os.path.join(app.instance_path, 'export_jobs'))
+app.config['EXPORT_JOB_WORKERS'] = int(os.environ.get('EXPORT_JOB_WORKERS', 2))
+app.config['EXPORT_JOB_RUNNER'] = os.environ.get('EXPORT_JOB_RUNNER', 'thread')
+
+def get_repository():
+    # 워커마다 저장소를 한 번만 만든다
+    repository = app.extensions.get('repository')
+    if repository is None:
+        repository = app.extensions['repository'] = metrics.instrument(create_repository(app.config))
+    return repository
+
+def get_cache():
+    cache = app.extensions.get('aggregate_cache')
+    if cache is None:
+        cache = app.extensions['aggregate_cache'] = create_cache(app.config)
+    return cache
+
+def get_export_cache():
+    if 'export_cache' not in app.extensions:
+        app.extensions['export_cache'] = create_export_cache(app.config)
+    return app.extensions['export_cache']
+
+SNAPSHOT_TABLES = ('contracts', 'payment_records')
+
+def table_versions():
+    # 스냅샷이 따라가는 테이블 버전 (집계 캐시의 버전)
+    cache = get_cache()
+    return tuple(cache.version(table) for table in SNAPSHOT_TABLES)
+
+def invalidate_tables(*tables):
+    # 쓰기 뒤에 집계 캐시와 내보내기 캐시의 테이블 버전을 올린다
+    snapshot = app.extensions.get('analytics_snapshot')
+    before = table_versions()
+    get_cache().invalidate(*tables)
+    export_cache = get_export_cache()
+    if export_cache is not None:
+        export_cache.invalidate(*tables)
+    # 이 프로세스의 쓰기는 update_snapshot으로 이미 반영했으므로, 그 사이 다른 쓰기가 없었다면
+    # 새 버전을 스냅샷에 기록해 다시 적재하지 않게 한다
+    if snapshot is not None and snapshot.table_versions == before:
+        snapshot.table_versions = table_versions()
+
+def get_search_index():
+    index = app.extensions.get('search_index')
+    if index is None:
+        index = app.extensions['search_index'] = ContractSearchIndex(app.config['SEARCH_INDEX_REFRESH'])
+    if index.loaded_at is None:
+        index.load(chain.from_iterable(get_repository().iter_batches('contracts', columns=INDEX_COLUMNS)))
+    elif index.is_stale():
+        repository = get_repository()
+        index.refresh_in_background(lambda: chain.from_iterable(repository.iter_batches('contracts', columns=INDEX_COLUMNS)))
+    return index
+
+def get_snapshot():
+    snapshot = app.extensions.get('analytics_snapshot')
+    if snapshot is None:
+        snapshot = app.extensions['analytics_snapshot'] = AnalyticsSnapshot(app.config['SNAPSHOT_REFRESH'])
+    # 다른 워커의 쓰기로 버전이 바뀌었으면 다시 적재한 뒤 계산한다 (새 버전 캐시 키에 옛 값이 들어가지 않도록)
+    snapshot.ensure_loaded(get_repository(), table_versions())
+    return snapshot
+
+def update_snapshot(table, rows=(), removed_ids=()):
+    # 스냅샷을 이미 적재한 프로세스에서만 바뀐 행을 반영한다
+    snapshot = app.extensions.get('analytics_snapshot')
+    if snapshot is not None and snapshot.loaded_at is not None:
+        snapshot.apply(table, rows, removed_ids)
+    # 공유 집계는 갱신 프로세스가 다시 계산해 게시한다 (poll 간격 + 계산 시간만큼 늦게 반영)
+    shared = get_shared_aggregates()
+    if shared is not None:
+        shared.mark_dirty()
+
+def get_shared_aggregates():
+    directory = app.config['SHARED_AGGREGATES_DIR']
+    if not directory:
+        return None
+    shared = app.extensions.get('shared_aggregates')
+    if shared is None:
+        shared = app.extensions['shared_aggregates'] = shared_aggregates.SharedAggregates(directory)
+    return shared
+
+def shared_bundle():
+    # 갱신 프로세스가 게시한 최신 집계 (아직 없으면 None -> 이 프로세스에서 계산)
+    shared = get_shared_aggregates()
+    return shared.current() if shared is not None else None
+
+def get_ledger_repository():
+    # 월별 원장이 없으면 프로세스에서 처음 쓸 때 한 번 만든다
+    repository = get_repository()
+    if not app.extensions.get('ledger_ready'):
+        ledger.ensure(repository)
+        app.extensions['ledger_ready'] = True
+    return repository
+
+def read_ledger(series, start_month=None, end_month=None):
+    return get_ledger_repository().read_ledger(series, start_month, end_month)
+
+def cached_monthly_income(start_month=None, end_month=None, include_contract_amount=True):
+    series = ledger.INCOME if include_contract_amount else ledger.INSTALLMENTS
+    bundle = shared_bundle()
+    if bundle is not None:
+        return bundle.series(series, start_month, end_month)
+    return get_cache().get_or_compute('monthly_income', ('contracts',), read_ledger, series, start_month, end_month)
+
+def cached_monthly_revenue(start_month=None, end_month=None):
+    bundle = shared_bundle()
+    if bundle is not None:
+        return bundle.series(ledger.REVENUE, start_month, end_month)
+    return get_cache().get_or_compute('monthly_revenue', ('payment_records',), read_ledger, ledger.REVENUE, start_month, end_month)
+
+# /api/monthly_series가 보내는 시리즈 (기본 순서)
+MONTHLY_SERIES = ('income', 'installments', 'revenue', 'arrears')
+
+def compute_monthly_series(bundle_version=None):
+    """전체 기간의 월별 시리즈를 빈 달 없이 같은 월 축에 맞춘다 -> (첫 월 인덱스, {이름: float64 배열}).
+
+    arrears는 그 달 말일을 기준일로 한 미수금 연령 분석의 전체 연체액이다 (aging.monthly_arrears).
+    bundle_version은 계산에 쓰지 않고 캐시 키만 나눈다 (api_monthly_series 참고).
+    """
+    sources = {
+        'income': cached_monthly_income(),
+        'installments': cached_monthly_income(include_contract_amount=False),
+        'revenue': cached_monthly_revenue()
+    }
+    snapshot = get_snapshot()
+    with metrics.span('compute'):
+        arrears_first, arrears = snapshot.monthly_arrears()
+        indices = {name: month_index(list(values)) for name, values in sources.items()}
+        bounds = [(int(index.min()), int(index.max())) for index in indices.values() if len(index)]
+        if len(arrears):
+            bounds.append((arrears_first, arrears_first + len(arrears) - 1))
+        if not bounds:
+            return 0, {name: np.zeros(0) for name in MONTHLY_SERIES}
+        first = min(low for low, _ in bounds)
+        size = max(high for _, high in bounds) - first + 1
+        series = {}
+        for name, values in sources.items():
+            series[name] = np.zeros(size)
+            series[name][indices[name] - first] = np.fromiter(values.values(), dtype=np.float64, count=len(values))
+        # 마지막 증감 뒤의 달은 마지막 연체액이 그대로 이어진다
+        series['arrears'] = np.zeros(size)
+        if len(arrears):
+            offset = arrears_first - first
+            series['arrears'][offset:offset + len(arrears)] = arrears
+            series['arrears'][offset + len(arrears):] = arrears[-1]
+        return first, series
+
+def series_response(labels, series, single=False):
+    # Accept 헤더에 맞는 형식(series_format.py)으로 월별 시리즈를 보낸다
+    mimetype = series_format.negotiate(request.accept_mimetypes)
+    if mimetype is None:
+        return jsonify({'error': '지원하는 형식이 아닙니다.', 'formats': series_format.formats()}), 406
+    with metrics.span('serialize'):
+        body = series_format.encode(mimetype, labels, series, single)
+    response = Response(body, mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+def compute_monthly_installments():
+    snapshot = get_snapshot()
+    with metrics.span('compute'):
+        return snapshot.monthly_totals()
+
+def compute_contract_status():
+    snapshot = get_snapshot()
+    with metrics.span('compute'):
+        return snapshot.contract_status()
+
+def cached_contract_status():
+    # 계약/입금 기록이 바뀌기 전까지 캐시 사용
+    return get_cache().get_or_compute('contract_status', ('contracts', 'payment_records'), compute_contract_status)
+
+def contract_status_batches(batch_size=1000):
+    bundle = shared_bundle()
+    if bundle is not None:
+        return bundle.contract_status_batches(batch_size)
+    rows = cached_contract_status()
+    return (rows[i:i + batch_size] for i in range(0, len(rows), batch_size))
+
+def compute_aging(as_of):
+    # 연체 계약만 행으로 만든다 (연체 일수, 연체액이 큰 순). 요약은 전체 계약 기준
+    snapshot = get_snapshot()
+    with metrics.span('compute'):
+        columns = snapshot.aging_columns(as_of)
+        return {
+            'as_of': as_of,
+            'summary': aging.summary(columns),
+            'contracts': list(aging.aging_rows(columns, snapshot.strings.decode, aging.overdue_index(columns)))
+        }
 
-def safe_float(value):
-    try:
-        return float(value.replace(',', '')) if value else 0.0
-    except ValueError:
-        return 0.0
+def cached_aging(as_of):
+    # 계약/입금 기록이 바뀌기 전까지 기준일별로 캐시 사용
+    return get_cache().get_or_compute('aging', ('contracts', 'payment_records'), compute_aging, as_of)
 
-def safe_int(value):
-    try:
-        return int(float(value.replace(',', ''))) if value else 0
-    except ValueError:
-        return 0
+def send_stream(chunks, mimetype, download_name):
+    # 생성기 응답으로 내려보내 첫 청크부터 바로 전송한다
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={download_name}'
+    })
+
+def buffered(chunks, size):
+    # 템플릿이 만드는 작은 문자열 조각을 size바이트 정도씩 묶어 UTF-8로 내보낸다
+    parts = []
+    length = 0
+    for chunk in chunks:
+        parts.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(parts).encode('utf-8')
+            parts = []
+            length = 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+def stream_page(template_name, **context):
+    """큰 표 화면을 렌더링하면서 바로 내려보낸다.
+
+    context의 행 반복자는 템플릿이 순회하는 동안에만 읽히므로 메모리는 청크 크기만큼만 쓴다.
+    렌더링 시간은 청크마다 render 단계로 기록한다 (flask.stream_template의 렌더링 시그널은
+    응답이 끝나기 전에 요청 계측을 마치므로 쓰지 않는다).
+    """
+    template = app.jinja_env.get_or_select_template(template_name)
+    app.update_template_context(context)
+    chunks = metrics.timed_iter(buffered(template.generate(context), app.config['STREAM_CHUNK_SIZE']), 'render')
+    return Response(stream_with_context(chunks), mimetype='text/html')
+
+def send_export(download_name, tables, mimetype, generate, *extra):
+    # 같은 버전(tables의 버전 + extra)의 파일이 디스크 캐시에 있으면 그대로 보내고
+    # (If-None-Match/If-Modified-Since가 맞으면 304), 없으면 generate()의 청크를
+    # 스트리밍하면서 캐시에 저장한다
+    export_cache = get_export_cache()
+    if export_cache is None:
+        return send_stream(generate(), mimetype, download_name)
+    entry = export_cache.entry(download_name, tables, extra)
+    stat = export_cache.lookup(entry)
+    if stat is not None:
+        return send_file(entry.path, mimetype=mimetype, as_attachment=True, download_name=download_name,
+                         etag=entry.etag, last_modified=stat.st_mtime, conditional=True)
+    response = send_stream(export_cache.store(entry, generate()), mimetype, download_name)
+    response.set_etag(entry.etag)
+    response.last_modified = time.time()
+    return response
+
+def contract_status_version():
+    # 계약 상태는 오늘 날짜와 (공유 집계를 쓰면) 게시 버전에 따라 달라진다
+    bundle = shared_bundle()
+    return time.strftime('%Y-%m-%d'), bundle.version if bundle is not None else None
+
+# 내보내기 이름 -> (MIME 형식, 내용이 의존하는 테이블)
+EXPORTS = {
+    'contracts.csv': (CSV_MIMETYPE, ('contracts',)),
+    'contracts.xlsx': (XLSX_MIMETYPE, ('contracts',)),
+    'payment_records.csv': (CSV_MIMETYPE, ('payment_records',)),
+    'payment_records.xlsx': (XLSX_MIMETYPE, ('payment_records',)),
+    'monthly_installments.csv': (CSV_MIMETYPE, ('contracts',)),
+    'monthly_installments.xlsx': (XLSX_MIMETYPE, ('contracts',)),
+    'contract_status.csv': (CSV_MIMETYPE, ('contracts', 'payment_records')),
+    'contract_status.xlsx': (XLSX_MIMETYPE, ('contracts', 'payment_records')),
+    'aging.csv': (CSV_MIMETYPE, ('contracts', 'payment_records')),
+    'aging.xlsx': (XLSX_MIMETYPE, ('contracts', 'payment_records'))
+}
+
+def monthly_params(values):
+    # 월별 할부금 내보내기의 기간 (형식이 틀리면 ValueError)
+    params = {'start_month': values.get('start_month', ''), 'end_month': values.get('end_month', '')}
+    month_window(params['start_month'], params['end_month'])
+    return params
+
+def aging_params(values):
+    # 미수금 연령 분석 기준일 (없으면 오늘, 형식이 틀리면 ValueError)
+    as_of = records.parse_date(values.get('as_of'))
+    return {'as_of': as_of.isoformat() if as_of else time.strftime('%Y-%m-%d')}
+
+def monthly_installments_file(ext, start_month, end_month):
+    # 스냅샷에서 월별 할부금 계산 (기간이 있으면 기간과 겹치는 계약만).
+    # CSV는 할부금만, XLSX는 계약금을 포함한 금액을 내보낸다
+    snapshot = get_snapshot()
+    with metrics.span('compute'):
+        monthly_data = snapshot.monthly_totals(ext == '.xlsx', start_month, end_month)
+
+    with metrics.span('serialize'):
+        # 데이터프레임 생성 (pandas는 이 내보내기에서만 쓰므로 여기서 임포트)
+        import pandas as pd
+        amount_column = 'Amount' if ext == '.xlsx' else 'Installment Amount'
+        df = pd.DataFrame(list(monthly_data.items()), columns=['Month', amount_column])
+        df = df.sort_values('Month')
+
+        output = BytesIO()
+        if ext == '.xlsx':
+            with pd.ExcelWriter(output, engine='openpyxl') as writer:
+                df.to_excel(writer, index=False, sheet_name='Monthly Installments')
+        else:
+            df.to_csv(output, index=False, encoding='utf-8-sig')
+    return [output.getvalue()]
+
+def export_chunks(name, params, track=None):
+    # 내보내기 파일의 청크 (다운로드 라우트와 백그라운드 작업이 함께 쓴다).
+    # track은 배치 이터러블을 감싸 진행 상황을 기록한다
+    stem, ext = os.path.splitext(name)
+    if stem == 'monthly_installments':
+        return monthly_installments_file(ext, params.get('start_month', ''), params.get('end_month', ''))
+    if stem == 'contract_status':
+        batches = contract_status_batches()
+    elif stem == 'aging':
+        rows = cached_aging(params['as_of'])['contracts']
+        batches = (rows[i:i + 1000] for i in range(0, len(rows), 1000))
+    else:
+        batches = get_repository().iter_batches(stem, columns=TABLE_COLUMNS[stem])
+    if track is not None:
+        batches = track(batches)
+    if ext == '.csv':
+        return iter_csv(batches)
+    return iter_xlsx(batches, 'Payment Records' if stem == 'payment_records' else 'Sheet1')
+
+def export_total(name):
+    # 진행률 계산용 전체 행 수 (월별 할부금과 연령 분석은 행 단위로 세지 않음)
+    stem = os.path.splitext(name)[0]
+    if stem in ('monthly_installments', 'aging'):
+        return None
+    table = 'contracts' if stem == 'contract_status' else stem
+    return get_repository().query_page(table, 1, 1, columns=('id',))[1]
+
+def run_export_job(kind, params, track):
+    # 작업 스레드(또는 export-worker 프로세스)에서 실행된다
+    return export_chunks(kind, params, track), export_total(kind)
+
+def download_export(name, params=None):
+    # ?async=1 이면 백그라운드 작업으로 넣고 작업 상태를 돌려준다 (202)
+    params = params or {}
+    if request.args.get('async'):
+        return enqueue_export(name, params)
+    mimetype, tables = EXPORTS[name]
+    extra = sorted(params.items())
+    if name.startswith('contract_status'):
+        extra.extend(contract_status_version())
+    stem = os.path.splitext(name)[0]
+    if stem in TABLE_COLUMNS:
+        # 컬럼이 추가된 배포 뒤에 이전 형식의 캐시 파일을 보내지 않도록 컬럼 목록도 키에 넣는다
+        extra.append(TABLE_COLUMNS[stem])
+    return send_export(name, tables, mimetype, lambda: export_chunks(name, params), *extra)
+
+def get_export_jobs():
+    queue = app.extensions.get('export_jobs')
+    if queue is None:
+        queue = app.extensions['export_jobs'] = jobs.ExportJobQueue(app.config['EXPORT_JOBS_DIR'],
+                                                                    app.config['EXPORT_JOB_WORKERS'])
+    return queue
+
+def start_export_jobs():
+    # thread 모드에서는 이 프로세스가 대기 작업을 처리한다 (이전 프로세스가 남긴 작업 포함)
+    if app.config['EXPORT_JOB_RUNNER'] == 'thread':
+        get_export_jobs().start(run_export_job)
+
+def enqueue_export(name, params):
+    job = get_export_jobs().enqueue(name, params)
+    start_export_jobs()
+    return jsonify(export_job_status(job)), 202, {'Location': url_for('export_job', job_id=job['id'])}
+
+def export_job_status(job):
+    status = {name: job[name] for name in ('id', 'kind', 'params', 'status', 'rows', 'total', 'error',
+                                          'created_at', 'started_at', 'finished_at')}
+    if job['status'] == jobs.DONE:
+        status['progress'] = 1.0
+    elif job['total']:
+        status['progress'] = min(job['rows'] / job['total'], 1.0)
+    else:
+        status['progress'] = None
+    status['status_url'] = url_for('export_job', job_id=job['id'])
+    if job['status'] == jobs.DONE:
+        status['download_url'] = url_for('download_export_job', job_id=job['id'])
+    return status
+
+def paginate(table, default_sort='id', default_desc=False, stream=False):
+    # 요청 인자(page, limit, sort, order, business_number, contract_type, date_from, date_to)로
+    # 페이지 조회를 DB에 넘긴다. stream이면 행 목록 대신 행 반복자를 돌려준다 (stream_page용)
+    page = max(request.args.get('page', 1, type=int), 1)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    sort = request.args.get('sort', default_sort)
+    if sort not in TABLE_COLUMNS[table]:
+        sort = default_sort
+    order = request.args.get('order', 'desc' if default_desc else 'asc')
+    filters = {name: request.args.get(name, '') for name in ('business_number', 'contract_type', 'date_from', 'date_to')}
+    count = 'estimated' if request.args.get('count') == 'estimated' else 'exact'
+
+    repository = get_repository()
+    query = repository.iter_page if stream else repository.query_page
+    rows, total = query(table, page, limit, sort, order == 'desc', filters, count, TABLE_COLUMNS[table])
+    return rows, {
+        'page': page,
+        'limit': limit,
+        'total': total,
+        'pages': (total + limit - 1) // limit if total is not None else None,
+        'sort': sort,
+        'order': order,
+        'filters': filters
+    }
+
+def read_form(table):
+    # 폼 입력을 검증해 저장소에 넘길 dict로 만든다 (틀리면 records.FormError -> form_error)
+    return records.parse_form(table, request.form).as_row()
 
 @app.route('/')
 def index():
@@ -32,88 +478,47 @@ def index():
 
 @app.route('/add_contract', methods=['POST'])
 def add_contract():
-    # 폼에서 데이터 가져오기
-    title = request.form['title']
-    business_number = request.form['business_number']
-    representative = request.form['representative']
-    contract_type = request.form['contract_type']
-    product_price = safe_float(request.form['product_price'])
-    quantity = safe_int(request.form['quantity'])
-    total_amount = safe_float(request.form['total_amount'])
-    tax = safe_float(request.form['tax'])
-    total_with_tax = safe_float(request.form['total_with_tax'])
-    contract_amount = safe_float(request.form['contract_amount'])
-    total_installment = safe_float(request.form['total_installment'])
-    payment_months = safe_int(request.form['payment_months'])
-    start_date = request.form['start_date']
-
-    # Supabase에 데이터 삽입
-    supabase.table('contracts').insert({
-        'title': title,
-        'business_number': business_number,
-        'representative': representative,
-        'contract_type': contract_type,
-        'product_price': product_price,
-        'quantity': quantity,
-        'total_amount': total_amount,
-        'tax': tax,
-        'total_with_tax': total_with_tax,
-        'contract_amount': contract_amount,
-        'total_installment': total_installment,
-        'payment_months': payment_months,
-        'start_date': start_date
-    }).execute()
+    # 폼 입력 검증 (틀린 값은 400 오류 화면)
+    data = read_form('contracts')
+
+    # 저장소에 데이터 삽입
+    _, contract = get_ledger_repository().write_with_ledger('contracts', data=data, ledger_rows=ledger.change_rows)
+    update_snapshot('contracts', [contract])
+    get_search_index().upsert(contract)
+    invalidate_tables('contracts')
 
     return redirect(url_for('index'))
 
 @app.route('/view_contracts')
 def view_contracts():
-    # Supabase에서 계약 데이터 가져오기
-    response = supabase.table('contracts').select('*').execute()
-    contracts = response.data
+    # 저장소에서 계약 데이터를 한 페이지만 가져오기 (행을 읽는 대로 렌더링해 전송)
+    contracts, pagination = paginate('contracts', stream=True)
 
-    return render_template('contracts.html', contracts=contracts)
+    return stream_page('contracts.html', contracts=contracts, pagination=pagination)
+
+@app.route('/api/contracts')
+def api_contracts():
+    contracts, pagination = paginate('contracts')
+    return jsonify({'data': contracts, **pagination})
 
 @app.route('/edit_contract/<int:id>', methods=['GET', 'POST'])
 def edit_contract(id):
     if request.method == 'POST':
-        # 폼에서 데이터 가져오기
-        title = request.form['title']
-        business_number = request.form['business_number']
-        representative = request.form['representative']
-        contract_type = request.form['contract_type']
-        product_price = safe_float(request.form['product_price'])
-        quantity = safe_int(request.form['quantity'])
-        total_amount = safe_float(request.form['total_amount'])
-        tax = safe_float(request.form['tax'])
-        total_with_tax = safe_float(request.form['total_with_tax'])
-        contract_amount = safe_float(request.form['contract_amount'])
-        total_installment = safe_float(request.form['total_installment'])
-        payment_months = safe_int(request.form['payment_months'])
-        start_date = request.form['start_date']
-
-        # Supabase에서 데이터 업데이트
-        supabase.table('contracts').update({
-            'title': title,
-            'business_number': business_number,
-            'representative': representative,
-            'contract_type': contract_type,
-            'product_price': product_price,
-            'quantity': quantity,
-            'total_amount': total_amount,
-            'tax': tax,
-            'total_with_tax': total_with_tax,
-            'contract_amount': contract_amount,
-            'total_installment': total_installment,
-            'payment_months': payment_months,
-            'start_date': start_date
-        }).eq('id', id).execute()
+        # 폼 입력 검증 (틀린 값은 400 오류 화면)
+        data = read_form('contracts')
+
+        # 저장소에서 데이터 업데이트
+        _, contract = get_ledger_repository().write_with_ledger('contracts', id, data, ledger.change_rows)
+        if contract is None:
+            return "Contract not found", 404
+        update_snapshot('contracts', [contract])
+        get_search_index().upsert(contract)
+        invalidate_tables('contracts')
 
         return redirect(url_for('view_contracts'))
     else:
-        # Supabase에서 계약 데이터 가져오기
-        response = supabase.table('contracts').select('*').eq('id', id).execute()
-        contract = response.data[0] if response.data else None
+        # 저장소에서 계약 데이터 가져오기
+        contract = get_repository().get('contracts', id)
 
         if contract:
             return render_template('edit_contract.html', contract=contract)
@@ -122,101 +527,57 @@ def edit_contract(id):
 
 @app.route('/delete_contract/<int:id>')
 def delete_contract(id):
-    # Supabase에서 계약 삭제
-    supabase.table('contracts').delete().eq('id', id).execute()
+    # 저장소에서 계약 삭제
+    get_ledger_repository().write_with_ledger('contracts', id, ledger_rows=ledger.change_rows)
+    update_snapshot('contracts', removed_ids=[id])
+    get_search_index().remove(id)
+    # 연결된 입금 기록의 contract_id/match_score도 지워지므로 입금 기록 캐시도 무효화한다
+    invalidate_tables('contracts', 'payment_records')
     return redirect(url_for('view_contracts'))
 
 @app.route('/payment_record', methods=['GET', 'POST'])
 def payment_record():
     if request.method == 'POST':
-        # 폼에서 데이터 가져오기
-        title = request.form['title']
-        business_number = request.form['business_number']
-        representative = request.form['representative']
-        payer_name = request.form['payer_name']
-        payment_account = request.form['payment_account']
-        payment_date = request.form['payment_date']
-        payment_amount = safe_float(request.form['payment_amount'])
-        memo = request.form['memo']
-
-        # Supabase에 데이터 삽입
-        supabase.table('payment_records').insert({
-            'title': title,
-            'business_number': business_number,
-            'representative': representative,
-            'payer_name': payer_name,
-            'payment_account': payment_account,
-            'payment_date': payment_date,
-            'payment_amount': payment_amount,
-            'memo': memo
-        }).execute()
+        # 폼 입력 검증 (틀린 값은 400 오류 화면)
+        data = read_form('payment_records')
+
+        # 저장소에 데이터 삽입
+        _, record = get_ledger_repository().write_with_ledger('payment_records', data=data, ledger_rows=ledger.change_rows)
+        update_snapshot('payment_records', [record])
+        invalidate_tables('payment_records')
 
         return redirect(url_for('view_payment_records'))
     return render_template('payment_record.html')
 
 @app.route('/view_payment_records')
 def view_payment_records():
-    # Supabase에서 입금 기록 가져오기
-    response = supabase.table('payment_records').select('*').order('payment_date', desc=True).execute()
-    records = response.data
+    # 저장소에서 입금 기록을 한 페이지만 가져오기 (행을 읽는 대로 렌더링해 전송)
+    records, pagination = paginate('payment_records', 'payment_date', default_desc=True, stream=True)
 
-    return render_template('view_payment_records.html', records=records)
+    return stream_page('view_payment_records.html', records=records, pagination=pagination)
+
+@app.route('/api/payment_records')
+def api_payment_records():
+    records, pagination = paginate('payment_records', 'payment_date', default_desc=True)
+    return jsonify({'data': records, **pagination})
 
 @app.route('/monthly_installments')
 def monthly_installments():
-    # Supabase에서 계약 데이터 가져오기
-    response = supabase.table('contracts').select('*').execute()
-    contracts = response.data
-
-    # 월별 할부금 계산
-    monthly_data = defaultdict(float)
-    contract_data = []
-
-    for contract in contracts:
-        start_date = datetime.strptime(contract['start_date'], '%Y-%m-%d')
-        start_month = start_date.strftime('%Y-%m')
-        
-        contract_monthly = defaultdict(float)
-        
-        # 1. 계약금을 시작 월에 추가
-        monthly_data[start_month] += contract['contract_amount']
-        contract_monthly[start_month] += contract['contract_amount']
-        
-        # 2. 할부금 계산 및 분배
-        if contract['payment_months'] > 0:
-            monthly_installment = (contract['total_installment'] - contract['contract_amount']) / contract['payment_months']
-            for i in range(contract['payment_months']):
-                month = (start_date + relativedelta(months=i)).strftime('%Y-%m')
-                monthly_data[month] += monthly_installment
-                contract_monthly[month] += monthly_installment
-        else:
-            # 3. 할부기간이 0인 경우 (일시불)
-            monthly_data[start_month] += contract['total_installment'] - contract['contract_amount']
-            contract_monthly[start_month] += contract['total_installment'] - contract['contract_amount']
-
-        contract_data.append({
-            'id': contract['id'],
-            'title': contract['title'],
-            'representative': contract['representative'],
-            'monthly': contract_monthly
-        })
+    # 월별 할부금 합계 계산 (계약이 바뀌기 전까지 캐시 사용)
+    monthly_data = get_cache().get_or_compute('monthly_installment_totals', ('contracts',), compute_monthly_installments)
 
     # 월 정렬
     months = sorted(monthly_data.keys())
 
-    return render_template('monthly_installments.html', months=months, monthly_data=monthly_data, contract_data=contract_data)
+    # 계약별 할부금은 계약 배치마다 펼쳐 렌더링하면서 전송한다
+    contract_data = get_snapshot().contract_schedules()
+
+    return stream_page('monthly_installments.html', months=months, monthly_data=monthly_data, contract_data=contract_data)
 
 @app.route('/monthly_revenue')
 def monthly_revenue():
-    # Supabase에서 입금 기록 가져오기
-    response = supabase.table('payment_records').select('*').execute()
-    records = response.data
-
-    # 월별 수익 계산
-    monthly_revenue = defaultdict(float)
-    for record in records:
-        month = datetime.strptime(record['payment_date'], '%Y-%m-%d').strftime('%Y-%m')
-        monthly_revenue[month] += record['payment_amount']
+    # 저장소에서 월별 수익 집계 가져오기
+    monthly_revenue = cached_monthly_revenue()
 
     # 월 정렬
     months = sorted(monthly_revenue.keys())
@@ -225,28 +586,14 @@ def monthly_revenue():
 
 @app.route('/dashboard')
 def dashboard():
-    # Supabase에서 계약 및 입금 기록 데이터 가져오기
-    contracts_response = supabase.table('contracts').select('*').execute()
-    payments_response = supabase.table('payment_records').select('*').execute()
-
-    contracts = contracts_response.data
-    payments = payments_response.data
-
-    # 월별 할부금 및 수익 계산
-    monthly_installments = defaultdict(float)
-    monthly_revenue = defaultdict(float)
-
-    for contract in contracts:
-        start_date = datetime.strptime(contract['start_date'], '%Y-%m-%d')
-        monthly_installment = contract['total_installment'] / contract['payment_months']
-        
-        for i in range(contract['payment_months']):
-            month = (start_date + relativedelta(months=i)).strftime('%Y-%m')
-            monthly_installments[month] += monthly_installment
-
-    for payment in payments:
-        month = datetime.strptime(payment['payment_date'], '%Y-%m-%d').strftime('%Y-%m')
-        monthly_revenue[month] += payment['payment_amount']
+    # 저장소에서 월별 할부금 및 수익 집계 가져오기
+    # 원장은 먼저 준비해 두고 두 집계를 동시에 읽는다
+    installments, revenue = get_ledger_repository().gather(
+        lambda: cached_monthly_income(include_contract_amount=False),
+        cached_monthly_revenue
+    )
+    monthly_installments = defaultdict(float, installments)
+    monthly_revenue = defaultdict(float, revenue)
 
     # 월 정렬
     months = sorted(set(list(monthly_installments.keys()) + list(monthly_revenue.keys())))
@@ -255,305 +602,271 @@ def dashboard():
 
 @app.route('/contract_status')
 def contract_status():
-    # Supabase에서 계약 및 입금 기록 데이터 가져오기
-    contracts_response = supabase.table('contracts').select('*').execute()
-    payments_response = supabase.table('payment_records').select('*').execute()
-
-    contracts = contracts_response.data
-    payments = payments_response.data
-
-    # 계약 상태 계산
-    contract_status = []
-    current_date = datetime.now().date()
-
-    for contract in contracts:
-        start_date = datetime.strptime(contract['start_date'], '%Y-%m-%d').date()
-        end_date = start_date + relativedelta(months=contract['payment_months'])
-        
-        paid_amount = sum(payment['payment_amount'] for payment in payments if payment['business_number'] == contract['business_number'])
-        remaining_amount = max(0, contract['total_with_tax'] - paid_amount)
-        
-        status = {
-            'title': contract['title'],
-            'business_number': contract['business_number'],
-            'representative': contract['representative'],
-            'end_date': end_date.strftime('%Y-%m-%d'),
-            'total_amount': contract['total_with_tax'],
-            'paid_amount': paid_amount,
-            'remaining_amount': remaining_amount,
-            'contract_status': '진행중' if current_date <= end_date else '만료'
-        }
-        
-        contract_status.append(status)
+    # 계약 상태 계산 (공유 집계가 있으면 그것을, 없으면 바뀌기 전까지 캐시 사용).
+    # 배치 단위로 렌더링하면서 전송한다
+    contract_status = chain.from_iterable(contract_status_batches())
 
-    return render_template('contract_status.html', contracts=contract_status)
+    return stream_page('contract_status.html', contracts=contract_status)
+
+@app.route('/aging')
+def aging_report():
+    # 기준일(as_of, 기본 오늘)의 미수금 연령 분석: 구간별 요약과 연체 계약 목록
+    try:
+        params = aging_params(request.args)
+    except ValueError:
+        return render_template('error.html', error='기준일은 YYYY-MM-DD 형식으로 지정하세요.'), 400
+
+    report = cached_aging(params['as_of'])
+
+    return render_template('aging.html', as_of=report['as_of'], summary=report['summary'], contracts=report['contracts'])
+
+@app.route('/api/aging')
+def api_aging():
+    try:
+        params = aging_params(request.args)
+    except ValueError:
+        return jsonify({'error': '기준일은 YYYY-MM-DD 형식으로 지정하세요.'}), 400
+
+    report = cached_aging(params['as_of'])
+    rows = report['contracts']
+    bucket = request.args.get('bucket', '')
+    if bucket in aging.BUCKETS:
+        rows = [row for row in rows if row['bucket'] == bucket]
+    page = max(request.args.get('page', 1, type=int), 1)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    return jsonify({
+        'as_of': report['as_of'],
+        'summary': report['summary'],
+        'data': rows[(page - 1) * limit:page * limit],
+        'page': page,
+        'limit': limit,
+        'total': len(rows),
+        'pages': (len(rows) + limit - 1) // limit,
+        'bucket': bucket
+    })
 
 @app.route('/download_csv')
 def download_csv():
-    # Supabase에서 계약 데이터 가져오기
-    response = supabase.table('contracts').select('*').execute()
-    contracts = response.data
-
-    df = pd.DataFrame(contracts)
-    output = BytesIO()
-    df.to_csv(output, index=False, encoding='utf-8-sig')
-    output.seek(0)
-    return send_file(output, mimetype='text/csv', as_attachment=True, download_name='contracts.csv')
+    # 저장소에서 계약 데이터를 배치 단위로 가져와 바로 내보내기 (같은 버전이면 캐시 파일)
+    return download_export('contracts.csv')
 
 @app.route('/download_xlsx')
 def download_xlsx():
-    # Supabase에서 계약 데이터 가져오기
-    response = supabase.table('contracts').select('*').execute()
-    contracts = response.data
-
-    df = pd.DataFrame(contracts)
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Sheet1')
-    output.seek(0)
-    return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name='contracts.xlsx')
+    # 저장소에서 계약 데이터를 배치 단위로 가져와 바로 내보내기 (같은 버전이면 캐시 파일)
+    return download_export('contracts.xlsx')
 
 @app.route('/autocomplete')
 def autocomplete():
     term = request.args.get('term', '')
-    
-    # Supabase에서 자동완성 데이터 가져오기
-    response = supabase.table('contracts').select('title', 'business_number', 'representative').ilike('title', f'%{term}%').execute()
-    results = response.data
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
 
-    return jsonify([{'value': result['title'], 'business_number': result['business_number'], 'representative': result['representative']} for result in results])
+    # 메모리 인덱스에서 자동완성 데이터 찾기 (DB 조회 없음)
+    results = get_search_index().search(term, limit)
+
+    return jsonify(results)
 
 @app.route('/download_monthly_csv')
 def download_monthly_csv():
-    # Supabase에서 계약 데이터 가져오기
-    contracts_response = supabase.table('contracts').select('*').execute()
-    contracts = contracts_response.data
-
-    # 월별 할부금 계산
-    monthly_data = defaultdict(float)
-
-    for contract in contracts:
-        start_date = datetime.strptime(contract['start_date'], '%Y-%m-%d')
-        monthly_installment = contract['total_installment'] / contract['payment_months']
-        
-        for i in range(contract['payment_months']):
-            month = (start_date + relativedelta(months=i)).strftime('%Y-%m')
-            monthly_data[month] += monthly_installment
-
-    # 데이터프레임 생성
-    df = pd.DataFrame(list(monthly_data.items()), columns=['Month', 'Installment Amount'])
-    df = df.sort_values('Month')
-
-    # CSV 파일 생성
-    output = BytesIO()
-    df.to_csv(output, index=False, encoding='utf-8-sig')
-    output.seek(0)
-
-    return send_file(
-        output,
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name='monthly_installments.csv'
-    )
+    try:
+        params = monthly_params(request.args)
+    except ValueError:
+        return render_template('error.html', error='기간은 YYYY-MM 형식으로 지정하세요.'), 400
+
+    return download_export('monthly_installments.csv', params)
 
 @app.route('/download_payment_records_csv')
 def download_payment_records_csv():
-    # Supabase에서 입금 기록 데이터 가져오기
-    response = supabase.table('payment_records').select('*').execute()
-    records = response.data
-
-    # 데이터프레임 생성
-    df = pd.DataFrame(records)
-
-    # CSV 파일 생성
-    output = BytesIO()
-    df.to_csv(output, index=False, encoding='utf-8-sig')
-    output.seek(0)
-
-    return send_file(
-        output,
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name='payment_records.csv'
-    )
+    # 저장소에서 입금 기록 데이터를 배치 단위로 가져와 바로 내보내기 (같은 버전이면 캐시 파일)
+    return download_export('payment_records.csv')
 
 @app.route('/download_payment_records_xlsx')
 def download_payment_records_xlsx():
-    # Supabase에서 입금 기록 데이터 가져오기
-    response = supabase.table('payment_records').select('*').execute()
-    records = response.data
-
-    # 데이터프레임 생성
-    df = pd.DataFrame(records)
-
-    # XLSX 파일 생성
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Payment Records')
-    output.seek(0)
-
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='payment_records.xlsx'
-    )
+    # 저장소에서 입금 기록 데이터를 배치 단위로 가져와 바로 내보내기 (같은 버전이면 캐시 파일)
+    return download_export('payment_records.xlsx')
 
 @app.route('/download_monthly_xlsx')
 def download_monthly_xlsx():
-    # Supabase에서 계약 데이터 가져오기
-    contracts_response = supabase.table('contracts').select('*').execute()
-    contracts = contracts_response.data
-
-    # 월 할부금 계산
-    monthly_data = defaultdict(float)
-
-    for contract in contracts:
-        start_date = datetime.strptime(contract['start_date'], '%Y-%m-%d')
-        start_month = start_date.strftime('%Y-%m')
-        
-        # 1. 계약금을 시작 월에 추가
-        monthly_data[start_month] += contract['contract_amount']
-        
-        # 2. 할부금 계산 및 분배
-        if contract['payment_months'] > 0:
-            monthly_installment = (contract['total_installment'] - contract['contract_amount']) / contract['payment_months']
-            for i in range(contract['payment_months']):
-                month = (start_date + relativedelta(months=i)).strftime('%Y-%m')
-                monthly_data[month] += monthly_installment
-        else:
-            # 3. 할부기간이 0인 경우 (일시불)
-            monthly_data[start_month] += contract['total_installment'] - contract['contract_amount']
-
-    # 데이터프레임 생성
-    df = pd.DataFrame(list(monthly_data.items()), columns=['Month', 'Amount'])
-    df = df.sort_values('Month')
-
-    # XLSX 파일 생성
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Monthly Installments')
-    output.seek(0)
-
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='monthly_installments.xlsx'
-    )
+    try:
+        params = monthly_params(request.args)
+    except ValueError:
+        return render_template('error.html', error='기간은 YYYY-MM 형식으로 지정하세요.'), 400
+
+    return download_export('monthly_installments.xlsx', params)
 
 @app.route('/api/monthly_income')
 def api_monthly_income():
     start_month = request.args.get('start_month', '')
     end_month = request.args.get('end_month', '')
 
-    # Supabase에서 계약 데이터 가져오기
-    contracts_response = supabase.table('contracts').select('*').execute()
-    contracts = contracts_response.data
-
-    # 월별 할부금 계산
-    monthly_data = defaultdict(float)
-
-    for contract in contracts:
-        start_date = datetime.strptime(contract['start_date'], '%Y-%m-%d')
-        start_month_str = start_date.strftime('%Y-%m')
-        
-        # 1. 계약금을 시작 월에 추가
-        monthly_data[start_month_str] += contract['contract_amount']
-        
-        # 2. 할부금 계산 및 분배
-        if contract['payment_months'] > 0:
-            monthly_installment = (contract['total_installment'] - contract['contract_amount']) / contract['payment_months']
-            for i in range(contract['payment_months']):
-                month = (start_date + relativedelta(months=i)).strftime('%Y-%m')
-                monthly_data[month] += monthly_installment
-        else:
-            # 3. 할부기간이 0인 경우 (일시불)
-            monthly_data[start_month_str] += contract['total_installment'] - contract['contract_amount']
-
-    # 필터링
-    if start_month and end_month:
-        monthly_data = {k: v for k, v in monthly_data.items() if start_month <= k <= end_month}
+    # 저장소에서 월별 할부금 집계 가져오기 (기간 필터는 DB에서 적용)
+    monthly_data = cached_monthly_income(start_month, end_month)
 
     # 정렬
-    sorted_data = sorted(monthly_data.items())
+    labels = sorted(monthly_data)
 
-    return jsonify({
-        'labels': [item[0] for item in sorted_data],
-        'data': [item[1] for item in sorted_data]
-    })
+    return series_response(labels, {'income': np.fromiter((monthly_data[month] for month in labels), dtype=np.float64, count=len(labels))}, single=True)
 
 @app.route('/api/monthly_revenue')
 def api_monthly_revenue():
     start_month = request.args.get('start_month', '')
     end_month = request.args.get('end_month', '')
 
-    # Supabase에서 입금 기록 가져오기
-    response = supabase.table('payment_records').select('*').execute()
-    records = response.data
+    # 저장소에서 월별 수익 집계 가져오기 (기간 필터는 DB에서 적용)
+    monthly_revenue = cached_monthly_revenue(start_month, end_month)
 
-    # 월별 수익 계산
-    monthly_revenue = defaultdict(float)
-    for record in records:
-        month = datetime.strptime(record['payment_date'], '%Y-%m-%d').strftime('%Y-%m')
-        monthly_revenue[month] += record['payment_amount']
+    # 정렬
+    labels = sorted(monthly_revenue)
+
+    return series_response(labels, {'revenue': np.fromiter((monthly_revenue[month] for month in labels), dtype=np.float64, count=len(labels))}, single=True)
+
+@app.route('/api/monthly_series')
+def api_monthly_series():
+    # 여러 월별 시리즈(series=income,installments,revenue,arrears 중 쉼표로 구분)를 같은 월 축으로 보낸다.
+    # 빈 달은 0이고, 기간(start_month, end_month)은 둘 다 있을 때만 적용한다
+    names = [name for name in request.args.get('series', ','.join(MONTHLY_SERIES)).split(',') if name]
+    unknown = [name for name in names if name not in MONTHLY_SERIES]
+    if unknown or not names:
+        return jsonify({'error': f'알 수 없는 시리즈입니다: {",".join(unknown)}', 'series': list(MONTHLY_SERIES)}), 400
+    try:
+        params = monthly_params(request.args)
+    except ValueError:
+        return jsonify({'error': '기간은 YYYY-MM 형식으로 지정하세요.'}), 400
+
+    # 공유 집계를 쓰면 income/revenue는 게시된 묶음에서 온다. 쓰기로 테이블 버전이 오른 뒤 갱신 프로세스가
+    # 새 묶음을 게시하기 전까지는 옛 묶음이라, 묶음 버전도 키에 넣어 새 묶음이 나오면 다시 계산한다
+    bundle = shared_bundle()
+    first, series = get_cache().get_or_compute('monthly_series', ('contracts', 'payment_records'), compute_monthly_series,
+                                               bundle.version if bundle is not None else None)
+    start, stop = 0, len(series['income'])
+    window = month_window(params['start_month'], params['end_month'])
+    if window is not None:
+        start = min(max(window[0] - first, 0), stop)
+        stop = max(min(window[1] - first + 1, stop), start)
+
+    labels = month_labels(range(first + start, first + stop))
+    return series_response(labels, {name: series[name][start:stop] for name in names})
+
+def run_import(table, fileobj, filename, batch_size, encoding):
+    # 원장이 없으면 먼저 만든 뒤 가져오기를 시작해야 증감분이 두 번 반영되지 않는다
+    repository = get_ledger_repository()
+
+    def after_insert(rows):
+        update_snapshot(table, rows)
+        if table == 'contracts':
+            index = get_search_index()
+            for contract in rows:
+                index.upsert(contract)
+
+    from importer import import_file
+    try:
+        return import_file(repository, table, fileobj, filename, batch_size=batch_size, encoding=encoding,
+                           after_insert=after_insert, ledger_rows=ledger.inserted_rows)
+    finally:
+        invalidate_tables(table)
+
+@app.route('/import/<any(contracts, payment_records):table>', methods=['POST'])
+def import_records(table):
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'error': '업로드할 CSV/XLSX 파일을 선택하세요.'}), 400
+
+    batch_size = min(max(request.form.get('batch_size', 500, type=int), 1), 5000)
+    encoding = request.form.get('encoding', 'utf-8-sig')
+    try:
+        report = run_import(table, upload.stream, upload.filename, batch_size, encoding)
+    except (ValueError, UnicodeDecodeError) as e:
+        app.logger.error(f'일괄 가져오기 중 오류 발생: {str(e)}')
+        return jsonify({'error': f'파일을 읽을 수 없습니다: {str(e)}'}), 400
+
+    return jsonify(report)
+
+def run_reconcile(rematch=False, dry_run=False):
+    report = reconcile.run(get_repository(), rematch=rematch, dry_run=dry_run)
+    if report.get('saved'):
+        invalidate_tables('payment_records')
+    return report
+
+@app.route('/reconcile', methods=['POST'])
+def reconcile_payments():
+    # 연결되지 않은 입금 기록을 계약에 연결한다 (rematch=1: 전체 다시, dry_run=1: 저장하지 않음)
+    return jsonify(run_reconcile(bool(request.values.get('rematch')), bool(request.values.get('dry_run'))))
+
+@app.route('/api/cache_stats')
+def api_cache_stats():
+    export_cache = get_export_cache()
+    return jsonify({**get_cache().stats(), 'exports': export_cache.stats() if export_cache is not None else None})
+
+@app.route('/export_jobs/<name>', methods=['POST'])
+def create_export_job(name):
+    # 큰 내보내기를 백그라운드 작업으로 넣는다. 진행 상황은 Location의 상태 URL로 확인
+    if name not in EXPORTS:
+        return jsonify({'error': f'알 수 없는 내보내기입니다: {name}'}), 404
+    params = {}
+    if name.startswith('monthly_installments'):
+        try:
+            params = monthly_params(request.values)
+        except ValueError:
+            return jsonify({'error': '기간은 YYYY-MM 형식으로 지정하세요.'}), 400
+    elif name.startswith('aging'):
+        try:
+            params = aging_params(request.values)
+        except ValueError:
+            return jsonify({'error': '기준일은 YYYY-MM-DD 형식으로 지정하세요.'}), 400
+    return enqueue_export(name, params)
+
+@app.route('/export_jobs/<job_id>')
+def export_job(job_id):
+    job = get_export_jobs().get(job_id)
+    if job is None:
+        return jsonify({'error': '내보내기 작업을 찾을 수 없습니다.'}), 404
+    if job['status'] in (jobs.QUEUED, jobs.RUNNING):
+        # 재시작 등으로 멈춘 작업이 있으면 다시 가져가게 한다
+        start_export_jobs()
+    return jsonify(export_job_status(job))
+
+@app.route('/export_jobs/<job_id>/download')
+def download_export_job(job_id):
+    job = get_export_jobs().get(job_id)
+    if job is None:
+        return jsonify({'error': '내보내기 작업을 찾을 수 없습니다.'}), 404
+    if job['status'] != jobs.DONE:
+        return jsonify(export_job_status(job)), 409
+    try:
+        return send_file(job['file'], mimetype=EXPORTS[job['kind']][0], as_attachment=True,
+                         download_name=job['kind'], etag=job['id'], conditional=True)
+    except FileNotFoundError:
+        return jsonify({'error': '내보내기 파일이 보관 기간이 지나 삭제되었습니다.'}), 404
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus 형식 (이 워커 프로세스의 값)
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
+@app.route('/download_aging_csv')
+def download_aging_csv():
+    try:
+        params = aging_params(request.args)
+    except ValueError:
+        return render_template('error.html', error='기준일은 YYYY-MM-DD 형식으로 지정하세요.'), 400
 
-    # 필터링
-    if start_month and end_month:
-        monthly_revenue = {k: v for k, v in monthly_revenue.items() if start_month <= k <= end_month}
+    # 연체 계약 목록 내보내기 (같은 기준일, 같은 버전이면 캐시 파일)
+    return download_export('aging.csv', params)
 
-    # 정렬
-    sorted_data = sorted(monthly_revenue.items())
+@app.route('/download_aging_xlsx')
+def download_aging_xlsx():
+    try:
+        params = aging_params(request.args)
+    except ValueError:
+        return render_template('error.html', error='기준일은 YYYY-MM-DD 형식으로 지정하세요.'), 400
 
-    return jsonify({
-        'labels': [item[0] for item in sorted_data],
-        'data': [item[1] for item in sorted_data]
-    })
+    # 연체 계약 목록 내보내기 (같은 기준일, 같은 버전이면 캐시 파일)
+    return download_export('aging.xlsx', params)
 
 @app.route('/download_contract_status_csv')
 def download_contract_status_csv():
     try:
-        # Supabase에서 계약 및 입금 기록 데이터 가져오기
-        contracts_response = supabase.table('contracts').select('*').execute()
-        payments_response = supabase.table('payment_records').select('*').execute()
-
-        contracts = contracts_response.data
-        payments = payments_response.data
-
-        # 계약 상태 계산
-        contract_status = []
-        current_date = datetime.now().date()
-
-        for contract in contracts:
-            start_date = datetime.strptime(contract['start_date'], '%Y-%m-%d').date()
-            end_date = start_date + relativedelta(months=contract['payment_months'])
-            
-            paid_amount = sum(payment['payment_amount'] for payment in payments if payment['business_number'] == contract['business_number'])
-            remaining_amount = max(0, contract['total_with_tax'] - paid_amount)
-            
-            status = {
-                'title': contract['title'],
-                'business_number': contract['business_number'],
-                'representative': contract['representative'],
-                'end_date': end_date.strftime('%Y-%m-%d'),
-                'total_amount': contract['total_with_tax'],
-                'paid_amount': paid_amount,
-                'remaining_amount': remaining_amount,
-                'contract_status': '진행중' if current_date <= end_date else '만료'
-            }
-            
-            contract_status.append(status)
-
-        # DataFrame 생성 및 CSV 파일로 변환
-        df = pd.DataFrame(contract_status)
-        output = BytesIO()
-        df.to_csv(output, index=False, encoding='utf-8-sig')
-        output.seek(0)
-        
-        return send_file(output, 
-                         mimetype='text/csv', 
-                         as_attachment=True, 
-                         download_name='contract_status.csv')
+        # 스냅샷으로 계산한 계약 상태를 배치 단위로 내보내기 (같은 버전이면 캐시 파일)
+        return download_export('contract_status.csv')
 
     except Exception as e:
         app.logger.error(f'계약 상태 CSV 다운로드 중 오류 발생: {str(e)}')
@@ -562,48 +875,8 @@ def download_contract_status_csv():
 @app.route('/download_contract_status_xlsx')
 def download_contract_status_xlsx():
     try:
-        # Supabase에서 계약 및 입금 기록 데이터 가져오기
-        contracts_response = supabase.table('contracts').select('*').execute()
-        payments_response = supabase.table('payment_records').select('*').execute()
-
-        contracts = contracts_response.data
-        payments = payments_response.data
-
-        # 계약 상태 계산 (위의 CSV 함수와 동일한 로직)
-        contract_status = []
-        current_date = datetime.now().date()
-
-        for contract in contracts:
-            start_date = datetime.strptime(contract['start_date'], '%Y-%m-%d').date()
-            end_date = start_date + relativedelta(months=contract['payment_months'])
-            
-            paid_amount = sum(payment['payment_amount'] for payment in payments if payment['business_number'] == contract['business_number'])
-            remaining_amount = max(0, contract['total_with_tax'] - paid_amount)
-            
-            status = {
-                'title': contract['title'],
-                'business_number': contract['business_number'],
-                'representative': contract['representative'],
-                'end_date': end_date.strftime('%Y-%m-%d'),
-                'total_amount': contract['total_with_tax'],
-                'paid_amount': paid_amount,
-                'remaining_amount': remaining_amount,
-                'contract_status': '진행중' if current_date <= end_date else '만료'
-            }
-            
-            contract_status.append(status)
-
-        # DataFrame 생성 및 XLSX 파일로 변환
-        df = pd.DataFrame(contract_status)
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Sheet1')
-        output.seek(0)
-        
-        return send_file(output, 
-                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 
-                         as_attachment=True, 
-                         download_name='contract_status.xlsx')
+        # 스냅샷으로 계산한 계약 상태를 배치 단위로 내보내기 (같은 버전이면 캐시 파일)
+        return download_export('contract_status.xlsx')
 
     except Exception as e:
         app.logger.error(f'계약 상태 XLSX 다운로드 중 오류 발생: {str(e)}')
@@ -612,33 +885,26 @@ def download_contract_status_xlsx():
 @app.route('/edit_payment_record/<int:id>', methods=['GET', 'POST'])
 def edit_payment_record(id):
     if request.method == 'POST':
-        # 폼에서 데이터 가져오기
-        title = request.form['title']
-        business_number = request.form['business_number']
-        representative = request.form['representative']
-        payer_name = request.form['payer_name']
-        payment_account = request.form['payment_account']
-        payment_date = request.form['payment_date']
-        payment_amount = safe_float(request.form['payment_amount'])
-        memo = request.form['memo']
-
-        # Supabase에서 데이터 업데이트
-        supabase.table('payment_records').update({
-            'title': title,
-            'business_number': business_number,
-            'representative': representative,
-            'payer_name': payer_name,
-            'payment_account': payment_account,
-            'payment_date': payment_date,
-            'payment_amount': payment_amount,
-            'memo': memo
-        }).eq('id', id).execute()
+        # 폼 입력 검증 (틀린 값은 400 오류 화면)
+        data = read_form('payment_records')
+
+        # 저장소에서 데이터 업데이트
+        repository = get_ledger_repository()
+        current = repository.get('payment_records', id)
+        if current and reconcile.inputs_changed(current, data):
+            # 계약을 찾는 데 쓴 값이 바뀌면 연결을 지우고 다음 대사에서 다시 찾는다
+            data.update(contract_id=None, match_score=None)
+        # 원장 증감분은 위에서 읽은 값이 아니라 수정과 같은 트랜잭션의 이전 행으로 만든다
+        _, record = repository.write_with_ledger('payment_records', id, data, ledger.change_rows)
+        if record is None:
+            return "Payment record not found", 404
+        update_snapshot('payment_records', [record])
+        invalidate_tables('payment_records')
 
         return redirect(url_for('view_payment_records'))
     else:
-        # Supabase에서 입금 기록 데이터 가져오기
-        response = supabase.table('payment_records').select('*').eq('id', id).execute()
-        record = response.data[0] if response.data else None
+        # 저장소에서 입금 기록 데이터 가져오기
+        record = get_repository().get('payment_records', id)
 
         if record:
             return render_template('edit_payment_record.html', record=record)
@@ -647,10 +913,83 @@ def edit_payment_record(id):
 
 @app.route('/delete_payment_record/<int:id>')
 def delete_payment_record(id):
-    # Supabase에서 입금 기록 삭제
-    supabase.table('payment_records').delete().eq('id', id).execute()
+    # 저장소에서 입금 기록 삭제
+    get_ledger_repository().write_with_ledger('payment_records', id, ledger_rows=ledger.change_rows)
+    update_snapshot('payment_records', removed_ids=[id])
+    invalidate_tables('payment_records')
     return redirect(url_for('view_payment_records'))
 
+@app.cli.command('ledger-rebuild')
+def ledger_rebuild_command():
+    """월별 원장을 계약/입금 기록 전체로 다시 만든다."""
+    rows = ledger.rebuild(get_repository())
+    get_cache().invalidate('contracts', 'payment_records')
+    print(f'월별 원장을 다시 만들었습니다: {rows}행')
+
+@app.cli.command('ledger-check')
+def ledger_check_command():
+    """월별 원장을 DB 집계와 비교한다."""
+    mismatches = ledger.check(get_repository())
+    for mismatch in mismatches:
+        print(f"{mismatch['series']} {mismatch['month']}: 원장={mismatch['ledger']} 재계산={mismatch['expected']}")
+    if mismatches:
+        raise SystemExit(f'월별 원장 불일치: {len(mismatches)}건')
+    print('월별 원장이 재계산 결과와 일치합니다.')
+
+@app.cli.command('shared-refresh')
+@click.option('--once', is_flag=True, help='한 번만 게시하고 끝낸다')
+def shared_refresh_command(once):
+    """공유 집계 갱신 프로세스를 실행한다 (배포 전체에서 하나만)."""
+    if not app.config['SHARED_AGGREGATES_DIR']:
+        raise click.UsageError('SHARED_AGGREGATES_DIR 환경 변수를 지정하세요.')
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(process)d] [refresher] %(message)s')
+    if once:
+        meta = shared_aggregates.publish(get_ledger_repository(), app.config['SHARED_AGGREGATES_DIR'])
+        print(f"공유 집계 {meta['version']}을 게시했습니다 ({meta['build_seconds']:.2f}초).")
+        return
+    run_shared_refresher()
+
+def run_shared_refresher(stop=None):
+    # gunicorn.conf.py의 갱신 프로세스와 shared-refresh 명령에서 사용
+    shared_aggregates.run_refresher(get_repository(), app.config['SHARED_AGGREGATES_DIR'],
+                                    app.config['SHARED_AGGREGATES_INTERVAL'], stop=stop)
+
+@app.cli.command('export-worker')
+def export_worker_command():
+    """백그라운드 내보내기 작업을 실행한다 (EXPORT_JOB_RUNNER=external)."""
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(process)d] [export-worker] %(message)s')
+    get_export_jobs().work(run_export_job)
+
+@app.cli.command('import-records')
+@click.argument('table', type=click.Choice(['contracts', 'payment_records']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=500, show_default=True, help='한 번에 삽입할 행 수')
+@click.option('--encoding', default='utf-8-sig', show_default=True, help='CSV 인코딩 (은행 파일은 cp949인 경우가 많음)')
+def import_records_command(table, path, batch_size, encoding):
+    """CSV/XLSX 파일의 계약 또는 입금 기록을 일괄 가져온다."""
+    try:
+        with open(path, 'rb') as f:
+            report = run_import(table, f, path, batch_size, encoding)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise click.ClickException(f'파일을 읽을 수 없습니다: {e}')
+    for error in report['errors']:
+        print(f"{error['row']}행: {error['error']}")
+    print(f"{report['total_rows']}행 중 {report['inserted']}행을 가져왔습니다 (오류 {report['error_count']}건).")
+
+@app.cli.command('reconcile-payments')
+@click.option('--rematch', is_flag=True, help='이미 연결된 입금 기록도 다시 계산한다')
+@click.option('--dry-run', is_flag=True, help='저장하지 않고 결과만 출력한다')
+def reconcile_payments_command(rematch, dry_run):
+    """계약에 연결되지 않은 입금 기록을 후보 계약과 대사해 contract_id를 저장한다."""
+    report = run_reconcile(rematch, dry_run)
+    print(f"입금 기록 {report['payments']}건 중 {report['matched']}건 연결 (사업자번호 일치 {report['exact']}건,"
+          f" 유사 {report['fuzzy']}건), 미연결 {report['unmatched']}건 (후보 경합 {report['ambiguous']}건),"
+          f" {report['seconds']:.2f}초")
+
+@app.errorhandler(records.FormError)
+def form_error(error):
+    return render_template('error.html', error=str(error)), 400
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('error.html', error='페이지를 찾을 수 없습니다.'), 404
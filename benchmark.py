@@ -0,0 +1,466 @@
+import json
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+import click
+import numpy as np
+
+# 성능 측정
+#
+# 합성 데이터를 만든 SQLite DB(contracts.db와 같은 스키마)를 저장소로 쓰고, Flask 테스트
+# 클라이언트로 각 라우트를 반복 호출해 지연 시간(p50/p95/p99), 처리량, 최대 RSS를 잰다.
+# 결과는 JSON으로 저장해 두고 다음 실행에서 --compare 로 비교한다.
+#
+#   python benchmark.py seed --contracts 100000 --payments 1000000 --db /tmp/bench.db
+#   python benchmark.py run --db /tmp/bench.db --output baseline.json
+#   python benchmark.py run --db /tmp/bench.db --compare baseline.json
+#   python benchmark.py importtime --budget-ms 500
+#   python benchmark.py encoding --months 600
+
+SURNAMES = '김이박최정강조윤장임한오서신권황안송류홍'
+SYLLABLES = '가나다라마바사아자차카타파하한빛서울하루새봄솔별숲온누리미래푸른행복사랑은하늘'
+SUFFIXES = ('유치원', '어린이집', '학원', '치과', '의원', '상사', '마트', '식당', '약국', '스튜디오')
+BANKS = ('국민', '신한', '우리', '하나', '농협', '기업')
+
+# 할부 개월 수 분포 (0은 일시불)
+PAYMENT_MONTHS = (0, 1, 3, 6, 10, 12, 24, 36, 48, 60)
+PAYMENT_MONTHS_WEIGHTS = (0.08, 0.04, 0.06, 0.10, 0.05, 0.30, 0.20, 0.10, 0.04, 0.03)
+
+# 라우트 이름 -> 경로. {term}, {start_month}, {end_month}는 실행 시 채운다
+ROUTES = {
+    'dashboard': '/dashboard',
+    'contract_status': '/contract_status',
+    'aging': '/aging',
+    'api_aging': '/api/aging',
+    'monthly_installments': '/monthly_installments',
+    'monthly_revenue': '/monthly_revenue',
+    'view_contracts': '/view_contracts?page=2&sort=start_date&order=desc',
+    'view_payment_records': '/view_payment_records?page=2&sort=payment_date&order=desc',
+    'api_monthly_income': '/api/monthly_income',
+    'api_monthly_income_range': '/api/monthly_income?start_month={start_month}&end_month={end_month}',
+    'api_monthly_revenue': '/api/monthly_revenue',
+    'api_monthly_series': '/api/monthly_series',
+    'autocomplete': '/autocomplete?term={term}',
+    'download_csv': '/download_csv',
+    'download_xlsx': '/download_xlsx',
+    'download_monthly_csv': '/download_monthly_csv',
+    'download_monthly_xlsx': '/download_monthly_xlsx',
+    'download_payment_records_csv': '/download_payment_records_csv',
+    'download_payment_records_xlsx': '/download_payment_records_xlsx',
+    'download_contract_status_csv': '/download_contract_status_csv',
+    'download_contract_status_xlsx': '/download_contract_status_xlsx',
+    'download_aging_csv': '/download_aging_csv',
+    'download_aging_xlsx': '/download_aging_xlsx'
+}
+
+# templates 디렉터리가 없는 환경에서 쓰는 대체 템플릿. 넘겨받은 데이터를 모두 순회하므로
+# 렌더링 비용은 실제 화면과 비슷한 규모로 잡힌다
+TABLE_TEMPLATE = '{% for row in rows %}<tr>{% for value in row.values() %}<td>{{ value }}</td>{% endfor %}</tr>{% endfor %}'
+MONTHS_TEMPLATE = '{% for month in months %}<tr><td>{{ month }}</td>{% for series in series_list %}<td>{{ series[month] }}</td>{% endfor %}</tr>{% endfor %}'
+STANDIN_TEMPLATES = {
+    'index.html': '<html></html>',
+    'error.html': '{{ error }}',
+    'contracts.html': TABLE_TEMPLATE.replace('rows', 'contracts'),
+    'view_payment_records.html': TABLE_TEMPLATE.replace('rows', 'records'),
+    'contract_status.html': TABLE_TEMPLATE.replace('rows', 'contracts'),
+    'aging.html': TABLE_TEMPLATE.replace('rows', 'contracts'),
+    'monthly_revenue.html': MONTHS_TEMPLATE.replace('series_list', '[monthly_revenue]'),
+    'dashboard.html': MONTHS_TEMPLATE.replace('series_list', '[monthly_installments, monthly_revenue]'),
+    'monthly_installments.html': MONTHS_TEMPLATE.replace('series_list', '[monthly_data]')
+        + '{% for contract in contract_data %}<tr><td>{{ contract.title }}</td>'
+          '{% for month in months %}<td>{{ contract.monthly[month] }}</td>{% endfor %}</tr>{% endfor %}'
+}
+
+
+def _names(rng, size, prefix_chars, length):
+    chars = np.array(list(prefix_chars))
+    return [''.join(parts) for parts in chars[rng.integers(0, len(chars), (size, length))]]
+
+
+def generate_contracts(rng, count, businesses, today):
+    # 대부분은 사업자마다 한두 건이고, 일부 사업자(Zipf 분포)는 여러 건 계약한다
+    business = np.where(rng.random(count) < 0.3, rng.zipf(1.6, count) - 1, rng.integers(0, businesses, count)) % businesses
+    titles = [name + SUFFIXES[i % len(SUFFIXES)] for i, name in enumerate(_names(rng, businesses, SYLLABLES, 3))]
+    representatives = [surname + given for surname, given in zip(
+        _names(rng, businesses, SURNAMES, 1), _names(rng, businesses, SYLLABLES, 2))]
+
+    months = rng.choice(PAYMENT_MONTHS, count, p=PAYMENT_MONTHS_WEIGHTS)
+    # 최근 3년 사이에 시작, 최근 계약일수록 많게
+    days_ago = (rng.beta(1.2, 2.0, count) * 3 * 365).astype(int)
+    start = np.datetime64(today) - days_ago.astype('timedelta64[D]')
+    price = rng.choice((50000, 100000, 300000, 700000, 1100000, 2500000), count)
+    quantity = rng.choice((1, 1, 1, 2, 3, 5, 10, 100), count)
+    total = (price * quantity).astype(float)
+    tax = np.round(total * 0.1)
+    with_tax = total + tax
+    down = np.round(with_tax * rng.choice((0.0, 0.0, 0.1, 0.2), count), -3)
+    taxable = rng.random(count) < 0.85
+
+    rows = []
+    for i in range(count):
+        b = int(business[i])
+        rows.append((
+            titles[b], f'{100 + b % 800:03d}-{10 + b // 800 % 90:02d}-{b % 100000:05d}', representatives[b],
+            '과세' if taxable[i] else '면세', float(price[i]), int(quantity[i]), float(total[i]), float(tax[i]),
+            float(with_tax[i]), float(down[i]), float(with_tax[i] - down[i]), int(months[i]), str(start[i])
+        ))
+    return rows
+
+
+def generate_payments(rng, count, contracts, today):
+    # 계약마다 할부 회차에 맞춰 입금된 기록 (며칠 늦게 들어온 입금 포함)
+    months = np.array([contract[11] for contract in contracts])
+    remaining = np.array([contract[10] for contract in contracts])
+    start = np.array([contract[12] for contract in contracts], dtype='datetime64[M]')
+
+    picks = rng.integers(0, len(contracts), count)
+    installment = np.round(remaining[picks] / np.maximum(months[picks], 1), -2)
+    paid_on = (start[picks] + rng.integers(0, 24, count) % np.maximum(months[picks], 1)).astype('datetime64[D]')
+    paid_on = np.minimum(paid_on + rng.poisson(3, count), np.datetime64(today)).astype(str)
+
+    rows = []
+    for i, pick in enumerate(picks.tolist()):
+        title, business_number, representative = contracts[pick][:3]
+        rows.append((
+            title, business_number, representative, representative,
+            f'{BANKS[pick % len(BANKS)]} {pick:012d}', paid_on[i], float(installment[i]), ''
+        ))
+    return rows
+
+
+def seed_database(path, contracts=10000, payments=50000, seed=42, today=None):
+    from storage import SQLiteRepository
+
+    today = today or date.today().isoformat()
+    rng = np.random.default_rng(seed)
+    if os.path.exists(path):
+        os.remove(path)
+
+    repository = SQLiteRepository(path)
+    conn = repository.connection()
+    contract_rows = generate_contracts(rng, contracts, max(contracts // 3, 1), today)
+    with conn:
+        conn.executemany(
+            'INSERT INTO contracts (title, business_number, representative, contract_type, product_price, quantity,'
+            ' total_amount, tax, total_with_tax, contract_amount, total_installment, payment_months, start_date)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            contract_rows
+        )
+        conn.executemany(
+            'INSERT INTO payment_records (title, business_number, representative, payer_name, payment_account,'
+            ' payment_date, payment_amount, memo) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            generate_payments(rng, payments, contract_rows, today) if contract_rows else []
+        )
+    repository.close()
+    return path
+
+
+def peak_rss_mb():
+    # 리눅스는 KB, macOS는 바이트 단위
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 1)
+
+
+def _load_app(db_path, cache):
+    os.environ['STORAGE_BACKEND'] = 'sqlite'
+    os.environ['SQLITE_PATH'] = db_path
+    if cache:
+        # 실행마다 빈 내보내기 캐시로 시작해 첫 요청은 파일을 만들고 이후 요청은 캐시 파일을 보낸다
+        os.environ['EXPORT_CACHE_DIR'] = tempfile.mkdtemp(prefix='contracts-bench-exports-')
+    else:
+        os.environ['CACHE_TTL'] = '0'
+        os.environ['EXPORT_CACHE_DIR'] = ''
+    from jinja2 import ChoiceLoader, DictLoader
+    from app import app
+
+    # 실제 템플릿이 있으면 그것을 쓰고, 없는 것만 대체 템플릿으로 렌더링한다
+    app.jinja_loader = ChoiceLoader([app.jinja_loader, DictLoader(STANDIN_TEMPLATES)])
+    return app
+
+
+def _sample_terms(db_path, count=20):
+    conn = sqlite3.connect(db_path)
+    try:
+        titles = [row[0] for row in conn.execute('SELECT title FROM contracts ORDER BY random() LIMIT ?', (count,))]
+    finally:
+        conn.close()
+    from search_index import choseong
+    # 접두사 1~2글자, 초성, 부분 문자열을 섞어 쓴다
+    terms = []
+    for i, title in enumerate(titles):
+        terms.append((title[:1], title[:2], choseong(title[:2]), title[1:3])[i % 4])
+    return terms or ['가']
+
+
+def time_route(app, path_for, requests, concurrency):
+    # 첫 요청(캐시/원장/인덱스 적재 포함)은 따로 재고, 이후 requests번을 concurrency개 스레드로 보낸다
+    def call(i):
+        client = app.test_client()
+        path = path_for(i)
+        started = time.perf_counter()
+        response = client.get(path)
+        size = len(response.get_data())
+        response.close()
+        elapsed = time.perf_counter() - started
+        return elapsed, size, response.status_code
+
+    cold, size, status = call(0)
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(call, range(1, requests + 1)))
+    else:
+        results = [call(i) for i in range(1, requests + 1)]
+    wall = time.perf_counter() - started
+
+    latencies = np.array([result[0] for result in results]) * 1000
+    errors = sum(1 for result in results if result[2] >= 400) + (status >= 400)
+    return {
+        'path': path_for(0),
+        'requests': requests,
+        'cold_ms': round(cold * 1000, 3),
+        'mean_ms': round(float(latencies.mean()), 3) if requests else None,
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3) if requests else None,
+        'p95_ms': round(float(np.percentile(latencies, 95)), 3) if requests else None,
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3) if requests else None,
+        'max_ms': round(float(latencies.max()), 3) if requests else None,
+        'throughput_rps': round(requests / wall, 2) if wall > 0 else None,
+        'response_bytes': size,
+        'status': status,
+        'errors': errors,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+# app 임포트(워커 시작)에 들어가면 안 되는 패키지. 내보내기/가져오기 라우트나
+# Supabase 클라이언트를 처음 쓸 때 임포트한다
+LAZY_PACKAGES = ('pandas', 'openpyxl', 'supabase', 'postgrest', 'gotrue', 'realtime', 'storage3', 'httpx')
+# app 임포트 시간 상한 (ms). importtime 명령과 tests/test_import_time.py가 함께 쓴다
+IMPORT_BUDGET_MS = 500.0
+
+
+def import_times(module='app'):
+    """새 인터프리터에서 `python -X importtime -c "import <module>"`을 실행해 최상위 패키지별 누적 시간(ms)을 돌려준다.
+
+    Supabase 환경변수는 빼고 실행한다 (임포트만으로 클라이언트를 만들거나 실패하면 안 됨).
+    """
+    env = {name: value for name, value in os.environ.items() if not name.startswith('SUPABASE_')}
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    if result.returncode != 0:
+        raise SystemExit(f'{module} 임포트 실패:\n{result.stderr[-2000:]}')
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        # 패키지를 처음 임포트한 줄의 누적 시간이 가장 크다
+        package = name.strip().split('.')[0]
+        packages[package] = max(packages.get(package, 0.0), int(cumulative) / 1000)
+    return packages
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline, threshold):
+    # p50/p95가 threshold배 이상 느려진 라우트를 돌려준다
+    regressions = []
+    for name, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if previous.get(metric) and current.get(metric) and current[metric] > previous[metric] * threshold:
+                regressions.append((name, metric, previous[metric], current[metric]))
+    return regressions
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command('seed')
+@click.option('--db', 'db_path', required=True, type=click.Path(dir_okay=False), help='만들 SQLite 파일 (있으면 덮어씀)')
+@click.option('--contracts', default=10000, show_default=True, help='계약 수')
+@click.option('--payments', default=50000, show_default=True, help='입금 기록 수')
+@click.option('--seed', default=42, show_default=True, help='난수 시드')
+def seed_command(db_path, contracts, payments, seed):
+    """합성 계약/입금 기록으로 SQLite DB를 만든다."""
+    started = time.perf_counter()
+    seed_database(db_path, contracts, payments, seed)
+    print(f'{db_path}: 계약 {contracts}건, 입금 기록 {payments}건 ({time.perf_counter() - started:.1f}초)')
+
+
+@cli.command('run')
+@click.option('--db', 'db_path', type=click.Path(dir_okay=False), help='측정할 DB (없으면 합성 데이터로 새로 만듦)')
+@click.option('--contracts', default=10000, show_default=True, help='--db가 없을 때 만들 계약 수')
+@click.option('--payments', default=50000, show_default=True, help='--db가 없을 때 만들 입금 기록 수')
+@click.option('--seed', default=42, show_default=True, help='난수 시드')
+@click.option('--route', 'routes', multiple=True, type=click.Choice(list(ROUTES)), help='측정할 라우트 (기본값: 전체)')
+@click.option('--requests', default=20, show_default=True, help='라우트마다 보낼 요청 수 (첫 요청 제외)')
+@click.option('--download-requests', default=3, show_default=True, help='download_* 라우트에 보낼 요청 수')
+@click.option('--concurrency', default=1, show_default=True, help='동시에 요청을 보낼 스레드 수')
+@click.option('--cache/--no-cache', default=True, show_default=True, help='집계/내보내기 캐시 사용 여부')
+@click.option('--output', type=click.Path(dir_okay=False), help='결과를 저장할 JSON 파일')
+@click.option('--compare', 'baseline_path', type=click.Path(exists=True, dir_okay=False), help='비교할 이전 결과 JSON')
+@click.option('--threshold', default=1.2, show_default=True, help='이 배수 이상 느려지면 회귀로 본다')
+def run_command(db_path, contracts, payments, seed, routes, requests, download_requests, concurrency, cache,
+                output, baseline_path, threshold):
+    """라우트별 지연 시간, 처리량, 최대 RSS를 측정한다."""
+    if not db_path:
+        db_path = os.path.join(tempfile.gettempdir(), f'contracts-bench-{contracts}-{payments}-{seed}.db')
+    if not os.path.exists(db_path):
+        print(f'합성 데이터 생성: {db_path}')
+        seed_database(db_path, contracts, payments, seed)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in ('contracts', 'payment_records')}
+        first_month, last_month = conn.execute('SELECT substr(min(start_date), 1, 7), substr(max(start_date), 1, 7) FROM contracts').fetchone()
+    finally:
+        conn.close()
+
+    app = _load_app(db_path, cache)
+    terms = _sample_terms(db_path)
+    values = {'start_month': last_month or '2024-01', 'end_month': last_month or '2024-12'}
+    if first_month and last_month:
+        # 최근 1년 구간
+        end = datetime.strptime(last_month, '%Y-%m')
+        values['start_month'] = max(first_month, f'{end.year - 1}-{end.month:02d}')
+
+    results = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'db': os.path.abspath(db_path),
+            'contracts': counts['contracts'],
+            'payment_records': counts['payment_records'],
+            'cache': cache,
+            'concurrency': concurrency
+        },
+        'routes': {}
+    }
+
+    print(f"계약 {counts['contracts']}건, 입금 기록 {counts['payment_records']}건, 캐시 {'사용' if cache else '끔'}")
+    print(f"{'route':32} {'cold':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>9} {'rss MB':>8}")
+    for name in routes or ROUTES:
+        template = ROUTES[name]
+        path_for = lambda i, template=template: template.format(term=terms[i % len(terms)], **values)
+        count = download_requests if name.startswith('download_') else requests
+        result = results['routes'][name] = time_route(app, path_for, count, concurrency)
+        print(f"{name:32} {result['cold_ms']:9.1f} {result['p50_ms'] or 0:9.1f} {result['p95_ms'] or 0:9.1f}"
+              f" {result['p99_ms'] or 0:9.1f} {result['throughput_rps'] or 0:9.1f} {result['peak_rss_mb']:8.1f}"
+              + (f"  (오류 {result['errors']}건, 상태 {result['status']})" if result['errors'] else ''))
+    results['meta']['peak_rss_mb'] = peak_rss_mb()
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f'결과 저장: {output}')
+
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), threshold)
+        for name, metric, previous, current in regressions:
+            print(f'회귀: {name} {metric} {previous:.1f}ms -> {current:.1f}ms')
+        if regressions:
+            raise SystemExit(f'{len(regressions)}개 지표가 {threshold}배 이상 느려졌습니다.')
+        print('기준 결과 대비 회귀 없음.')
+
+
+def _median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.median(timings)), result
+
+
+@cli.command('encoding')
+@click.option('--months', default=600, show_default=True, help='시리즈 길이 (개월)')
+@click.option('--series', 'series_count', default=4, show_default=True, help='시리즈 수')
+@click.option('--repeat', default=50, show_default=True, help='형식마다 인코딩 반복 횟수 (중앙값 사용)')
+@click.option('--seed', default=42, show_default=True, help='난수 시드')
+def encoding_command(months, series_count, repeat, seed):
+    """월별 시리즈 API 응답 형식별 인코딩 시간과 전송 크기를 지금의 jsonify 응답과 비교한다."""
+    from flask import Flask, jsonify
+    import compression
+    import series_format
+    from schedule import month_labels
+
+    rng = np.random.default_rng(seed)
+    labels = month_labels(np.arange(months) + np.datetime64('2000-01', 'M').astype(np.int64))
+    names = ['income', 'installments', 'revenue', 'arrears'] + [f'series{i}' for i in range(4, series_count)]
+    # 할부금처럼 나눗셈으로 생긴 소수가 섞인 금액
+    series = {name: rng.integers(100000, 100000000, months) / rng.choice([1, 3, 7, 12, 36], months)
+              for name in names[:series_count]}
+
+    flask_app = Flask(__name__)
+
+    def baseline():
+        with flask_app.app_context():
+            return jsonify({'labels': labels, 'series': {name: values.tolist() for name, values in series.items()}}).get_data()
+
+    encoders = [('jsonify', baseline)]
+    for mimetype in series_format.formats():
+        encoders.append((mimetype, lambda mimetype=mimetype: series_format.encode(mimetype, labels, series)))
+
+    print(f'{months}개월 x 시리즈 {series_count}개, JSON 인코더: {"orjson" if series_format._orjson() else "json"}')
+    print(f"{'format':38} {'encode ms':>10} {'bytes':>9} " + ' '.join(f'{encoding:>9}' for encoding in compression.encodings())
+          + f" {'speedup':>8}")
+    reference_ms = reference = None
+    for name, encode in encoders:
+        elapsed, body = _median_ms(encode, repeat)
+        if reference is None:
+            reference_ms, reference = elapsed, body
+        sizes = ' '.join(f'{len(compression.compress(body, encoding)):9d}' for encoding in compression.encodings())
+        note = '' if name == 'jsonify' or not name.endswith('json') else ('  (jsonify와 같은 바이트)' if body == reference else '  (jsonify와 다름)')
+        print(f'{name:38} {elapsed:10.3f} {len(body):9d} {sizes} {reference_ms / elapsed:7.1f}x{note}')
+
+
+@cli.command('importtime')
+@click.option('--runs', default=5, show_default=True, help='반복 횟수 (패키지별 중앙값 사용)')
+@click.option('--budget-ms', default=IMPORT_BUDGET_MS, show_default=True, help='app 임포트 시간 상한 (ms)')
+@click.option('--top', default=10, show_default=True, help='출력할 패키지 수')
+def importtime_command(runs, budget_ms, top):
+    """app 임포트 시간을 재고 상한을 넘거나 지연 임포트할 패키지가 올라오면 실패한다."""
+    samples = [import_times() for _ in range(runs)]
+    packages = {name: float(np.median([sample.get(name, 0.0) for sample in samples]))
+                for name in set().union(*samples)}
+    total = packages.get('app', 0.0)
+
+    print(f"{'package':24} {'ms':>9}")
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f'{name:24} {ms:9.1f}')
+
+    problems = [f'{name} 패키지가 app 임포트 시 함께 로드됩니다' for name in LAZY_PACKAGES if name in packages]
+    if total > budget_ms:
+        problems.append(f'app 임포트 {total:.1f}ms가 상한 {budget_ms:.0f}ms를 넘었습니다')
+    for problem in problems:
+        print(f'회귀: {problem}')
+    if problems:
+        raise SystemExit(f'임포트 시간 점검 실패 ({len(problems)}건).')
+    print(f'app 임포트 {total:.1f}ms (상한 {budget_ms:.0f}ms) 이내.')
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,164 @@
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+# 집계 결과 캐시
+#
+# 키에 테이블 버전을 포함해 둔다. 쓰기 라우트가 invalidate()로 버전을 올리면
+# 그 테이블에 의존하는 항목은 바로 지워지고, 이후 조회는 새 버전 키로 다시 계산된다.
+# TTL은 오늘 날짜에 따라 달라지는 값(계약 상태 등)을 위한 안전장치다.
+#
+# 메모리 캐시의 값은 워커마다 따로 두지만, versions_dir을 주면 테이블 버전은
+# <versions_dir>/<table> 파일의 수정 시각(ns)으로 읽어 같은 호스트의 모든 워커가 같은 값을 본다.
+# 한 워커의 쓰기로 버전이 오르면 다른 워커도 다음 조회부터 새 키로 다시 계산한다.
+# 여러 호스트에 걸쳐 배포하면 CACHE_REDIS_URL로 Redis 버전을 써야 한다.
+
+logger = logging.getLogger(__name__)
+
+
+class FileTableVersions:
+    # 테이블 버전 = directory/<table> 파일의 수정 시각(ns). 파일이 없으면 0
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, table):
+        try:
+            return os.stat(os.path.join(self.directory, table)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def bump(self, *tables):
+        now = time.time_ns()
+        for table in tables:
+            path = os.path.join(self.directory, table)
+            try:
+                with open(path, 'a'):
+                    os.utime(path, ns=(now, now))
+            except OSError:
+                logger.exception('테이블 버전 갱신 실패: %s', path)
+
+
+class AggregateCache:
+    def __init__(self, maxsize=256, ttl=300, versions_dir=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._versions = defaultdict(int)
+        self._shared_versions = FileTableVersions(versions_dir) if versions_dir else None
+        self._lock = threading.Lock()
+
+    def version(self, table):
+        if self._shared_versions is not None:
+            return self._shared_versions.get(table)
+        return self._versions[table]
+
+    def _key(self, name, tables, args):
+        return (name, args, tuple(self.version(table) for table in tables))
+
+    def get_or_compute(self, name, tables, compute, *args):
+        # tables: 결과가 의존하는 테이블 목록, compute(*args)로 값을 계산한다
+        key = self._key(name, tables, args)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        value = compute(*args)
+
+        with self._lock:
+            if key == self._key(name, tables, args):
+                self._entries[key] = (now + self.ttl, tables, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, *tables):
+        # 다른 워커의 항목은 지울 수 없지만 공유 버전이 바뀌어 더 이상 조회되지 않고 LRU로 밀려난다
+        if self._shared_versions is not None:
+            self._shared_versions.bump(*tables)
+        with self._lock:
+            for table in tables:
+                self._versions[table] += 1
+            for key in [key for key, entry in self._entries.items() if set(entry[1]) & set(tables)]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'shared_versions': self._shared_versions is not None,
+                'versions': {table: self.version(table) for table in ('contracts', 'payment_records')}
+            }
+
+
+class RedisAggregateCache(AggregateCache):
+    # 테이블 버전과 값을 Redis 호환 저장소에 두어 여러 프로세스가 함께 쓴다.
+    # 오래된 버전의 키는 더 이상 조회되지 않고 TTL로 사라진다.
+
+    def __init__(self, client, ttl=300, prefix='contracts_cache'):
+        super().__init__(maxsize=0, ttl=ttl)
+        self.client = client
+        self.prefix = prefix
+
+    def version(self, table):
+        return int(self.client.get(f'{self.prefix}:version:{table}') or 0)
+
+    def get_or_compute(self, name, tables, compute, *args):
+        key = f'{self.prefix}:{pickle.dumps(self._key(name, tables, args)).hex()}'
+        cached = self.client.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return pickle.loads(cached)
+
+        with self._lock:
+            self.misses += 1
+        value = compute(*args)
+        self.client.setex(key, self.ttl, pickle.dumps(value))
+        return value
+
+    def invalidate(self, *tables):
+        for table in tables:
+            self.client.incr(f'{self.prefix}:version:{table}')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'redis',
+                'hits': self.hits,
+                'misses': self.misses,
+                'ttl': self.ttl,
+                'versions': {table: self.version(table) for table in ('contracts', 'payment_records')}
+            }
+
+
+def create_cache(config):
+    ttl = int(config.get('CACHE_TTL', 300))
+    redis_url = config.get('CACHE_REDIS_URL')
+    if redis_url:
+        try:
+            import redis
+            return RedisAggregateCache(redis.Redis.from_url(redis_url), ttl=ttl)
+        except ImportError:
+            logger.warning('redis 패키지가 없어 메모리 캐시를 사용합니다')
+    # 워커끼리 테이블 버전을 맞추는 디렉터리. 지정하지 않으면 내보내기 캐시의 versions/를 함께 쓴다
+    versions_dir = config.get('CACHE_VERSIONS_DIR')
+    if not versions_dir and config.get('EXPORT_CACHE_DIR'):
+        versions_dir = os.path.join(config['EXPORT_CACHE_DIR'], 'versions')
+    return AggregateCache(maxsize=int(config.get('CACHE_MAXSIZE', 256)), ttl=ttl, versions_dir=versions_dir or None)
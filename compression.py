@@ -0,0 +1,59 @@
+import gzip
+from flask import request
+from metrics import span
+from series_format import JSON_MIMETYPE, FLOAT64_MIMETYPE, ARROW_MIMETYPE
+
+# 응답 압축
+#
+# 스트리밍이 아닌 JSON/HTML/CSV/월별 시리즈 응답 중 COMPRESS_MIN_SIZE 바이트 이상인 것을
+# Accept-Encoding에 맞춰 br(brotli 패키지가 있을 때) 또는 gzip으로 압축한다. 작은 응답은
+# 압축해도 줄어드는 양보다 헤더와 CPU 비용이 커서 그대로 보낸다. 파일 다운로드(send_file)와
+# 스트리밍 응답은 건드리지 않는다. 압축 시간은 serialize 단계로 기록한다.
+
+COMPRESSIBLE = (JSON_MIMETYPE, FLOAT64_MIMETYPE, ARROW_MIMETYPE, 'text/html', 'text/csv', 'text/plain')
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def encodings():
+    # 보낼 수 있는 Content-Encoding (선호 순서)
+    return ['br', 'gzip'] if _brotli() is not None else ['gzip']
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return _brotli().compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def init_app(app):
+    # metrics.init_app 뒤에 불러야 응답 크기 지표에 압축된 크기가 잡힌다
+    # (after_request는 등록의 역순으로 실행된다)
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+    if not min_size:
+        return
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+                or response.status_code in (204, 304) or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE):
+            return response
+        response.vary.add('Accept-Encoding')
+        if response.content_length is None or response.content_length < min_size:
+            return response
+        encoding = request.accept_encodings.best_match(encodings())
+        if encoding is None:
+            return response
+        with span('serialize'):
+            response.set_data(compress(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,157 @@
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from cache import FileTableVersions
+
+# 내보내기 파일 디스크 캐시
+#
+# 다운로드 라우트가 만든 CSV/XLSX를 디렉터리에 파일로 저장해 두고, 같은 버전의 데이터를
+# 다시 요청하면 파일을 그대로 보낸다(send_file -> wsgi.file_wrapper/sendfile).
+# 키는 내보내기 이름 + 의존 테이블 버전 + 추가 값(기간, 날짜 등)의 해시이고 ETag로도 쓴다.
+# 테이블 버전은 versions/<table> 파일의 수정 시각(ns)이라 여러 워커가 같은 값을 본다
+# (집계 캐시도 기본으로 같은 파일을 버전으로 쓴다).
+# 쓰기 라우트가 invalidate()로 버전을 올리면 이전 파일은 더 이상 조회되지 않고
+# max_bytes를 넘을 때 마지막 사용 시각(atime) 순으로 지워진다.
+# ttl은 DB를 직접 고친 경우처럼 버전이 오르지 않은 변경에 대한 안전장치다.
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_DIR = 'versions'
+TEMP_PREFIX = '.tmp-'
+
+
+class ExportEntry:
+    def __init__(self, name, etag, path):
+        self.name = name
+        self.etag = etag
+        self.path = path
+
+
+class ExportCache:
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, ttl=3600, namespace=''):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.versions = FileTableVersions(os.path.join(directory, VERSIONS_DIR))
+
+    def version(self, table):
+        return self.versions.get(table)
+
+    def invalidate(self, *tables):
+        self.versions.bump(*tables)
+
+    def entry(self, name, tables, extra=()):
+        # name: 다운로드 파일 이름 (예: 'contracts.xlsx'), tables: 내용이 의존하는 테이블
+        versions = [(table, self.version(table)) for table in tables]
+        etag = hashlib.sha1(repr((self.namespace, name, versions, tuple(extra))).encode('utf-8')).hexdigest()
+        stem, ext = os.path.splitext(name)
+        return ExportEntry(name, etag, os.path.join(self.directory, f'{stem}-{etag}{ext}'))
+
+    def lookup(self, entry):
+        # 저장된 파일이 있으면 마지막 사용 시각을 갱신하고 stat을 돌려준다 (없으면 None)
+        try:
+            stat = os.stat(entry.path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        if time.time() - stat.st_mtime > self.ttl:
+            self._remove(entry.path)
+            self.misses += 1
+            return None
+        try:
+            # mtime(Last-Modified)은 두고 atime만 LRU용으로 갱신한다
+            os.utime(entry.path, ns=(time.time_ns(), stat.st_mtime_ns))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return stat
+
+    def store(self, entry, chunks):
+        # 청크를 그대로 내보내면서 임시 파일에 쓰고, 끝까지 보낸 경우에만 캐시에 넣는다
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=TEMP_PREFIX)
+        except OSError:
+            logger.exception('내보내기 캐시에 쓸 수 없습니다: %s', self.directory)
+            yield from chunks
+            return
+
+        iterator = iter(chunks)
+        stored = False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iterator:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(temp_path, entry.path)
+            stored = True
+            self.evict()
+        finally:
+            if not stored:
+                self._remove(temp_path)
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+
+    def _files(self):
+        files = []
+        with os.scandir(self.directory) as entries:
+            for item in entries:
+                if item.is_file() and not item.name.startswith(TEMP_PREFIX):
+                    try:
+                        stat = item.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_atime_ns, stat.st_size, item.path))
+        return files
+
+    def evict(self):
+        # 전체 크기가 max_bytes를 넘으면 가장 오래 쓰지 않은 파일부터 지운다
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        files = self._files()
+        return {
+            'directory': self.directory,
+            'hits': self.hits,
+            'misses': self.misses,
+            'files': len(files),
+            'bytes': sum(size for _, size, _ in files),
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl
+        }
+
+
+def create_export_cache(config):
+    # EXPORT_CACHE_DIR가 비어 있으면 캐시를 쓰지 않는다
+    directory = config.get('EXPORT_CACHE_DIR')
+    if not directory:
+        return None
+    # 같은 디렉터리를 다른 DB와 함께 써도 섞이지 않도록 저장소 위치를 키에 넣는다
+    if config.get('STORAGE_BACKEND') == 'sqlite':
+        namespace = os.path.abspath(config.get('SQLITE_PATH') or '')
+    else:
+        namespace = config.get('SUPABASE_URL') or ''
+    try:
+        return ExportCache(directory, int(config.get('EXPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024)),
+                           int(config.get('EXPORT_CACHE_TTL', 3600)), namespace)
+    except OSError:
+        logger.exception('내보내기 캐시 디렉터리를 만들 수 없어 캐시 없이 내보냅니다: %s', directory)
+        return None
@@ -0,0 +1,68 @@
+import csv
+import os
+import tempfile
+from io import StringIO
+
+# 스트리밍 내보내기
+#
+# 행을 배치 단위로 받아 바로 내보낸다. CSV는 배치마다 청크를 만들어 보내고,
+# XLSX는 openpyxl write-only 모드로 임시 파일에 쓴 뒤 파일을 조각내어 보낸다.
+# 어느 쪽이든 메모리에는 배치 하나만 올라가므로 테이블 크기와 무관하다.
+# openpyxl은 XLSX를 만들 때 임포트한다 (앱 시작 시간에 넣지 않음).
+
+CSV_MIMETYPE = 'text/csv'
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def iter_csv(batches, columns=None):
+    # batches: dict 목록의 이터러블. columns가 없으면 첫 행의 키를 헤더로 쓴다
+    buffer = StringIO()
+    writer = None
+    yield '\ufeff'.encode('utf-8')
+
+    for batch in batches:
+        for row in batch:
+            if writer is None:
+                columns = columns or list(row)
+                writer = csv.writer(buffer, lineterminator='\n')
+                writer.writerow(columns)
+            writer.writerow([row.get(column) for column in columns])
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    if writer is None and columns:
+        yield (','.join(columns) + '\n').encode('utf-8')
+
+
+def iter_xlsx(batches, sheet_name='Sheet1', columns=None):
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    header_written = False
+
+    for batch in batches:
+        for row in batch:
+            if not header_written:
+                columns = columns or list(row)
+                sheet.append(columns)
+                header_written = True
+            sheet.append([row.get(column) for column in columns])
+
+    if not header_written and columns:
+        sheet.append(list(columns))
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook.save(path)
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(FILE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
@@ -0,0 +1,67 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+
+# 운영 배포용 gunicorn 설정
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# 워커는 prefork 방식으로 여러 개 띄운다. 월별 시리즈와 계약 상태 표는 master가 띄운
+# 갱신 프로세스 하나만 계산해 SHARED_AGGREGATES_DIR에 게시하고, 워커는 게시된 파일을
+# mmap으로 읽기만 한다 (shared_aggregates.py). 갱신 프로세스를 따로 관리하려면
+# SHARED_AGGREGATES_REFRESHER=0 으로 끄고 `flask --app app shared-refresh`를 하나 띄운다.
+#
+# 나머지 집계(연체, 월별 할부금, 월별 내보내기 등)는 워커마다 메모리 캐시와 분석 스냅샷으로
+# 계산한다. 테이블 버전은 CACHE_VERSIONS_DIR(기본 EXPORT_CACHE_DIR/versions) 파일의 수정
+# 시각으로 모든 워커가 함께 보므로, 한 워커의 쓰기 뒤 다른 워커도 스냅샷을 다시 적재한다.
+# 스냅샷은 워커마다 한 벌씩이라 메모리는 워커 수에 비례한다.
+#
+# 백그라운드 내보내기 작업(jobs.py)도 master가 띄운 `flask export-worker` 프로세스에서
+# 실행해 XLSX 생성이 웹 워커의 요청 처리 시간을 빼앗지 않게 한다. 따로 관리하려면
+# EXPORT_WORKER=0 으로 끈다.
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('WORKER_THREADS', 4))
+# 대용량 내보내기(스트리밍 XLSX)가 끝날 때까지 기다린다
+timeout = int(os.environ.get('WORKER_TIMEOUT', 120))
+keepalive = 5
+max_requests = int(os.environ.get('MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+accesslog = '-'
+# app은 워커마다 fork 뒤에 import 해서 저장소 연결/스레드 풀을 워커가 각자 만든다
+preload_app = False
+
+os.environ.setdefault('SHARED_AGGREGATES_DIR', os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'contracts-aggregates'))
+os.environ.setdefault('EXPORT_JOB_RUNNER', 'external')
+
+_helpers = []
+
+
+def _spawn(server, label, command):
+    # master는 app을 import 하지 않으므로 보조 프로세스는 CLI 명령으로 따로 띄운다
+    process = subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'app', command],
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    _helpers.append(process)
+    server.log.info('%s 시작 (pid: %s)', label, process.pid)
+
+
+def when_ready(server):
+    if os.environ.get('SHARED_AGGREGATES_REFRESHER', '1') != '0':
+        _spawn(server, f"공유 집계 갱신 프로세스 ({os.environ['SHARED_AGGREGATES_DIR']})", 'shared-refresh')
+    if os.environ.get('EXPORT_WORKER', '1') != '0' and os.environ['EXPORT_JOB_RUNNER'] == 'external':
+        _spawn(server, '내보내기 작업 프로세스', 'export-worker')
+
+
+def on_exit(server):
+    for process in _helpers:
+        process.terminate()
+    for process in _helpers:
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
@@ -0,0 +1,159 @@
+import codecs
+import zipfile
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+from storage import MATCH_COLUMNS, TABLE_COLUMNS
+from records import FLOAT_COLUMNS, INT_COLUMNS, DATE_COLUMNS, REQUIRED_COLUMNS
+
+# 계약/입금 기록 일괄 가져오기
+#
+# CSV/XLSX 파일을 chunk_size 행씩 읽어서 pandas로 한 번에 검증/정규화하고,
+# 유효한 행은 batch_size 단위로 저장소에 일괄 삽입한다. 파일 전체를 메모리에
+# 올리지 않으며, 잘못된 행은 행 번호(헤더가 1행)와 사유를 모아 돌려준다.
+# 컬럼 규칙과 오류 문구는 폼 검증(records.parse_form)과 같다.
+
+# 은행/엑셀 양식의 한글 헤더
+COLUMN_ALIASES = {
+    '상호': 'title',
+    '사업자번호': 'business_number',
+    '대표자': 'representative',
+    '계약유형': 'contract_type',
+    '제품가격': 'product_price',
+    '수량': 'quantity',
+    '공급가액': 'total_amount',
+    '세액': 'tax',
+    '합계': 'total_with_tax',
+    '계약금': 'contract_amount',
+    '총할부금': 'total_installment',
+    '할부개월': 'payment_months',
+    '시작일': 'start_date',
+    '입금자명': 'payer_name',
+    '입금계좌': 'payment_account',
+    '입금일': 'payment_date',
+    '입금액': 'payment_amount',
+    '메모': 'memo'
+}
+
+MAX_REPORTED_ERRORS = 1000
+
+
+def _read_csv(fileobj, chunk_size, encoding):
+    for chunk in pd.read_csv(fileobj, chunksize=chunk_size, dtype=str, keep_default_na=False, encoding=encoding):
+        yield chunk
+
+
+def _read_xlsx(fileobj, chunk_size):
+    # 확장자만 .xlsx인 파일(zip이 아니거나 통합 문서 항목이 없는 zip)은 다른 읽기 오류처럼 ValueError로 알린다
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        raise ValueError(f'XLSX 파일이 아닙니다 ({e})') from None
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(value).strip() if value is not None else '' for value in next(rows, ())]
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=header, dtype=object)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header, dtype=object)
+    finally:
+        workbook.close()
+
+
+def read_chunks(fileobj, filename, chunk_size=5000, encoding='utf-8-sig'):
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        return _read_xlsx(fileobj, chunk_size)
+    return _read_csv(fileobj, chunk_size, encoding)
+
+
+def normalize_chunk(table, df, first_row):
+    # 한 청크를 정규화해 (삽입할 행 목록, 오류 목록)을 돌려준다
+    df = df.rename(columns=lambda name: COLUMN_ALIASES.get(str(name).strip(), str(name).strip()))
+    df.index = pd.RangeIndex(first_row, first_row + len(df))
+    errors = pd.Series('', index=df.index)
+
+    missing = [column for column in REQUIRED_COLUMNS[table] if column not in df.columns]
+    if missing:
+        errors[:] = f'필수 컬럼이 없습니다: {", ".join(missing)}'
+        return [], [{'row': row, 'error': error} for row, error in errors.items()]
+
+    out = pd.DataFrame(index=df.index)
+    for column in TABLE_COLUMNS[table]:
+        if column == 'id' or column in MATCH_COLUMNS:
+            continue
+        values = df[column] if column in df.columns else pd.Series('', index=df.index)
+        text = values.fillna('').astype(str).str.strip()
+
+        if column in FLOAT_COLUMNS[table] or column in INT_COLUMNS[table]:
+            cleaned = text.str.replace(',', '', regex=False)
+            numbers = pd.to_numeric(cleaned, errors='coerce')
+            # 'inf', '-inf'도 숫자로 읽히지만 폼 검증처럼 유한한 값만 받는다
+            invalid = ~np.isfinite(numbers) & (cleaned != '')
+            errors[invalid & (errors == '')] = f'{column} 값이 숫자가 아닙니다'
+            numbers = numbers.mask(invalid, 0).fillna(0)
+            out[column] = numbers.astype('int64') if column in INT_COLUMNS[table] else numbers.astype('float64')
+        elif column in DATE_COLUMNS[table]:
+            cleaned = text.str.slice(0, 10).str.replace(r'[./]', '-', regex=True)
+            dates = pd.to_datetime(cleaned, errors='coerce', format='%Y-%m-%d')
+            errors[dates.isna() & (errors == '')] = f'{column} 날짜 형식이 올바르지 않습니다 (YYYY-MM-DD)'
+            out[column] = dates.dt.strftime('%Y-%m-%d')
+        else:
+            out[column] = text
+
+    for column in REQUIRED_COLUMNS[table]:
+        blank = df[column].fillna('').astype(str).str.strip() == ''
+        errors[blank & (errors == '')] = f'{column} 값이 비어 있습니다'
+
+    valid = errors == ''
+    rows = out[valid].to_dict('records')
+    return rows, [{'row': row, 'error': error} for row, error in errors[~valid].items()]
+
+
+def import_file(repository, table, fileobj, filename, batch_size=500, chunk_size=5000, encoding='utf-8-sig',
+                after_insert=None, ledger_rows=None):
+    """파일을 읽어 table에 일괄 삽입하고 결과 보고서를 돌려준다.
+
+    ledger_rows가 있으면 배치마다 insert_many_with_ledger로 삽입과 원장 증감분을 한 트랜잭션에서 반영한다.
+    after_insert(rows)는 삽입된 행(id 포함)으로 배치마다 호출된다.
+    """
+    if table not in TABLE_COLUMNS:
+        raise ValueError(f'알 수 없는 테이블입니다: {table}')
+    # 인코딩 이름은 입력값이라 먼저 확인한다 (잘못된 이름은 pandas 안에서 LookupError가 난다)
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        raise ValueError(f'알 수 없는 인코딩입니다: {encoding}') from None
+
+    report = {'table': table, 'total_rows': 0, 'inserted': 0, 'error_count': 0, 'errors': []}
+    next_row = 2
+    pending = []
+
+    def flush(rows):
+        if ledger_rows:
+            inserted = repository.insert_many_with_ledger(table, rows, ledger_rows)
+        else:
+            inserted = repository.insert_many(table, rows)
+        report['inserted'] += len(inserted)
+        if after_insert:
+            after_insert(inserted)
+
+    for chunk in read_chunks(fileobj, filename, chunk_size, encoding):
+        rows, errors = normalize_chunk(table, chunk, next_row)
+        next_row += len(chunk)
+        report['total_rows'] += len(chunk)
+        report['error_count'] += len(errors)
+        report['errors'].extend(errors[:MAX_REPORTED_ERRORS - len(report['errors'])])
+
+        pending.extend(rows)
+        while len(pending) >= batch_size:
+            flush(pending[:batch_size])
+            pending = pending[batch_size:]
+
+    if pending:
+        flush(pending)
+    return report
@@ -0,0 +1,214 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+# 비동기 내보내기 작업 큐
+#
+# 큰 XLSX/CSV 내보내기를 요청 스레드 밖에서 만든다. 작업은 SQLite 작업 테이블(jobs.db)에
+# 기록되므로 프로세스가 다시 시작해도 남아 있고, 대기 중이거나 하트비트가 끊긴 작업은
+# 다시 실행된다. 동시에 실행되는 작업 수는 모든 프로세스를 통틀어 max_running개로 제한한다
+# (claim()이 BEGIN IMMEDIATE 안에서 실행 중인 작업 수를 세고 하나를 가져간다).
+#
+# 실행은 두 가지 중 하나다.
+#   thread  : 작업을 넣은 웹 프로세스의 스레드 풀에서 실행 (개발 서버)
+#   external: `flask export-worker` 프로세스가 실행 (gunicorn.conf.py가 띄운다).
+#             XLSX 생성은 CPU를 많이 쓰므로 웹 워커와 GIL을 나눠 쓰지 않게 한다.
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS export_jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0,
+    total INTEGER,
+    file TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS export_jobs_status_idx ON export_jobs (status, created_at);
+"""
+
+JOB_FIELDS = ('id', 'kind', 'params', 'status', 'rows', 'total', 'file', 'error', 'attempts',
+              'created_at', 'started_at', 'finished_at', 'heartbeat_at')
+
+
+def _job(row):
+    if row is None:
+        return None
+    job = dict(zip(JOB_FIELDS, row))
+    job['params'] = json.loads(job['params'])
+    return job
+
+
+class ExportJobQueue:
+    def __init__(self, directory, max_running=2, max_attempts=3, heartbeat=10, retention=86400):
+        self.directory = directory
+        self.files_dir = os.path.join(directory, 'files')
+        self.path = os.path.join(directory, 'jobs.db')
+        self.max_running = max_running
+        self.max_attempts = max_attempts
+        self.heartbeat = heartbeat
+        self.retention = retention
+        self._executor = None
+        self._lock = threading.Lock()
+        os.makedirs(self.files_dir, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    # 조회/등록
+
+    def enqueue(self, kind, params=None):
+        self.cleanup()
+        job_id = uuid.uuid4().hex
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'INSERT INTO export_jobs (id, kind, params, status, created_at) VALUES (?, ?, ?, ?, ?)',
+                (job_id, kind, json.dumps(params or {}), QUEUED, time.time())
+            )
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute(f'SELECT {", ".join(JOB_FIELDS)} FROM export_jobs WHERE id = ?', (job_id,)).fetchone()
+        return _job(row)
+
+    def cleanup(self):
+        # 보관 기간이 지난 완료/실패 작업과 파일을 지운다
+        cutoff = time.time() - self.retention
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'DELETE FROM export_jobs WHERE status IN (?, ?) AND finished_at < ? RETURNING file',
+                (DONE, FAILED, cutoff)
+            ).fetchall()
+        for (path,) in rows:
+            if path and os.path.exists(path):
+                os.unlink(path)
+
+    # 실행
+
+    def claim(self):
+        # 실행 중인 작업이 max_running보다 적으면 가장 오래된 대기 작업을 실행 중으로 바꿔 돌려준다
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # 하트비트가 끊긴 작업(프로세스 종료 등)은 다시 대기시키거나 실패 처리한다
+                stale = now - self.heartbeat * 3
+                conn.execute(
+                    'UPDATE export_jobs SET status = CASE WHEN attempts < ? THEN ? ELSE ? END,'
+                    " error = CASE WHEN attempts < ? THEN NULL ELSE '작업 프로세스가 응답하지 않습니다' END,"
+                    ' finished_at = CASE WHEN attempts < ? THEN NULL ELSE ? END'
+                    ' WHERE status = ? AND heartbeat_at < ?',
+                    (self.max_attempts, QUEUED, FAILED, self.max_attempts, self.max_attempts, now, RUNNING, stale)
+                )
+                running = conn.execute('SELECT COUNT(*) FROM export_jobs WHERE status = ?', (RUNNING,)).fetchone()[0]
+                row = None
+                if running < self.max_running:
+                    row = conn.execute(
+                        'UPDATE export_jobs SET status = ?, rows = 0, started_at = ?, heartbeat_at = ?, attempts = attempts + 1'
+                        ' WHERE id = (SELECT id FROM export_jobs WHERE status = ? ORDER BY created_at LIMIT 1)'
+                        f' RETURNING {", ".join(JOB_FIELDS)}',
+                        (RUNNING, now, now, QUEUED)
+                    ).fetchone()
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        return _job(row)
+
+    def _update(self, job_id, **values):
+        columns = ', '.join(f'{name} = ?' for name in values)
+        with closing(self._connect()) as conn:
+            conn.execute(f'UPDATE export_jobs SET {columns} WHERE id = ?', (*values.values(), job_id))
+
+    def run(self, job, export):
+        """작업 하나를 실행한다.
+
+        export(kind, params, track)는 (청크 이터러블, 전체 행 수 또는 None)을 돌려준다.
+        track(batches)로 배치 이터러블을 감싸면 진행 행 수가 기록된다.
+        """
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.heartbeat):
+                self._update(job['id'], heartbeat_at=time.time())
+
+        def track(batches):
+            rows = 0
+            reported = time.monotonic()
+            for batch in batches:
+                rows += len(batch)
+                if time.monotonic() - reported >= 0.5:
+                    self._update(job['id'], rows=rows)
+                    reported = time.monotonic()
+                yield batch
+            self._update(job['id'], rows=rows)
+
+        threading.Thread(target=beat, name=f'job-{job["id"][:8]}', daemon=True).start()
+        ext = os.path.splitext(job['kind'])[1]
+        path = os.path.join(self.files_dir, job['id'] + ext)
+        fd, temp_path = tempfile.mkstemp(dir=self.files_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                chunks, total = export(job['kind'], job['params'], track)
+                if total is not None:
+                    self._update(job['id'], total=total)
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(temp_path, path)
+            self._update(job['id'], status=DONE, file=path, finished_at=time.time())
+        except Exception as e:
+            logger.exception('내보내기 작업 실패: %s', job['id'])
+            self._update(job['id'], status=FAILED, error=str(e), finished_at=time.time())
+        finally:
+            stop.set()
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    def drain(self, export):
+        # 대기 작업이 없거나 동시 실행 한도에 닿을 때까지 실행한다
+        while True:
+            job = self.claim()
+            if job is None:
+                return
+            self.run(job, export)
+
+    def start(self, export):
+        # thread 모드: 이 프로세스의 스레드 풀에서 대기 작업을 처리한다
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_running, thread_name_prefix='export-job')
+        self._executor.submit(self.drain, export)
+
+    def work(self, export, poll=1.0, stop=None):
+        # external 모드: 종료할 때까지 대기 작업을 가져와 스레드 max_running개로 실행한다
+        with ThreadPoolExecutor(max_workers=self.max_running, thread_name_prefix='export-job') as executor:
+            while stop is None or not stop.is_set():
+                job = self.claim()
+                if job is None:
+                    time.sleep(poll)
+                    continue
+                executor.submit(self.run, job, export)
@@ -0,0 +1,161 @@
+import math
+from itertools import chain
+import numpy as np
+from schedule import expand, month_labels, SCHEDULE_COLUMNS
+from records import decode, decode_columns
+
+# 월별 원장(monthly_ledger)
+#
+# 월별 합계를 요청마다 다시 계산하지 않고 저장소의 monthly_ledger 테이블에 유지한다.
+# 쓰기 라우트는 바뀐 계약/입금 기록만큼의 증감분을 반영하고(수정은 이전 값을 빼고 새 값을 더함),
+# /api/monthly_* 는 개월 수만큼의 행만 읽는다. entries는 그 달에 들어간 항목 수로,
+# 0이 된 달은 결과에서 빠진다.
+# 증감분은 records.Contract/PaymentRecord로 해석한 레코드(미리 계산한 월 인덱스)로 만든다.
+
+INCOME = 'income'                # 계약금 + 할부금 (monthly_installments, /api/monthly_income)
+INSTALLMENTS = 'installments'    # total_installment / payment_months (dashboard)
+REVENUE = 'revenue'              # 입금액 (monthly_revenue, /api/monthly_revenue)
+
+SERIES = (INCOME, INSTALLMENTS, REVENUE)
+
+# 원장 계산에 필요한 컬럼
+LEDGER_COLUMNS = {
+    'contracts': SCHEDULE_COLUMNS,
+    'payment_records': ('payment_date', 'payment_amount')
+}
+
+
+def _accumulate(deltas, series, month, amount, sign=1):
+    # 같은 달의 항목을 합쳐 deltas[(series, 'YYYY-MM')] = [금액, 항목 수] 에 더한다
+    if month.size == 0:
+        return deltas
+    months, inverse = np.unique(month, return_inverse=True)
+    sums = np.bincount(inverse, weights=amount)
+    counts = np.bincount(inverse)
+    for label, total, count in zip(month_labels(months), sums.tolist(), counts.tolist()):
+        entry = deltas.setdefault((series, label), [0.0, 0])
+        entry[0] += sign * total
+        entry[1] += sign * count
+    return deltas
+
+
+def _months(days):
+    # datetime64[D] -> 월 인덱스
+    return days.astype('datetime64[M]').astype(np.int64)
+
+
+def _schedule_deltas(columns, sign, deltas):
+    # columns: (시작 월 인덱스, 할부 개월 수, 총 할부금, 계약금) 배열
+    if len(columns[0]) == 0:
+        return deltas
+    _, month, amount = expand(*columns, include_contract_amount=True)
+    _accumulate(deltas, INCOME, month, amount, sign)
+    _, month, amount = expand(*columns, include_contract_amount=False)
+    _accumulate(deltas, INSTALLMENTS, month, amount, sign)
+    return deltas
+
+
+def contract_deltas(contracts, sign=1, deltas=None):
+    # contracts: records.Contract 목록 (시작일이 없는 계약은 건너뜀)
+    deltas = {} if deltas is None else deltas
+    contracts = [contract for contract in contracts if contract.start_month is not None]
+    return _schedule_deltas((
+        [contract.start_month for contract in contracts],
+        [contract.payment_months for contract in contracts],
+        [contract.total_installment for contract in contracts],
+        [contract.contract_amount for contract in contracts]
+    ), sign, deltas)
+
+
+def payment_deltas(records, sign=1, deltas=None):
+    # records: records.PaymentRecord 목록 (입금일이 없는 기록은 건너뜀)
+    deltas = {} if deltas is None else deltas
+    records = [record for record in records if record.payment_month is not None]
+    if not records:
+        return deltas
+    month = np.array([record.payment_month for record in records], dtype=np.int64)
+    amount = np.array([record.payment_amount for record in records], dtype=np.float64)
+    return _accumulate(deltas, REVENUE, month, amount, sign)
+
+
+def contract_batch_deltas(rows, sign=1, deltas=None):
+    # 저장소의 dict 행 배치를 컬럼 배열로 한 번에 해석해 반영한다 (전체 재계산용)
+    deltas = {} if deltas is None else deltas
+    columns = decode_columns('contracts', rows, SCHEDULE_COLUMNS)
+    valid = ~np.isnat(columns['start_date'])
+    return _schedule_deltas((
+        _months(columns['start_date'][valid]),
+        columns['payment_months'][valid],
+        columns['total_installment'][valid],
+        columns['contract_amount'][valid]
+    ), sign, deltas)
+
+
+def payment_batch_deltas(rows, sign=1, deltas=None):
+    deltas = {} if deltas is None else deltas
+    columns = decode_columns('payment_records', rows, LEDGER_COLUMNS['payment_records'])
+    valid = ~np.isnat(columns['payment_date'])
+    return _accumulate(deltas, REVENUE, _months(columns['payment_date'][valid]), columns['payment_amount'][valid], sign)
+
+
+def _rows(deltas):
+    return [
+        {'series': series, 'month': month, 'amount': amount, 'entries': entries}
+        for (series, month), (amount, entries) in sorted(deltas.items())
+    ]
+
+
+def change_rows(table, old=None, new=None):
+    # 행 하나의 변경에 따른 증감분 (추가: old=None, 삭제: new=None, 수정: 둘 다, 저장소의 dict 행).
+    # 저장소의 write_with_ledger(table, ..., change_rows)가 쓰기와 같은 트랜잭션에서 부른다
+    table_deltas = contract_deltas if table == 'contracts' else payment_deltas
+    deltas = table_deltas([decode(table, old)] if old else [], -1)
+    table_deltas([decode(table, new)] if new else [], 1, deltas)
+    return _rows(deltas)
+
+
+def inserted_rows(table, rows):
+    # 일괄 가져오기로 삽입할 행의 증감분. 저장소의 insert_many_with_ledger(table, rows, inserted_rows)가
+    # 삽입과 같은 트랜잭션에서 반영한다
+    deltas = contract_batch_deltas(rows) if table == 'contracts' else payment_batch_deltas(rows)
+    return _rows(deltas)
+
+
+def compute(repository, batch_size=5000):
+    # 계약/입금 기록 전체로 원장을 처음부터 계산한다
+    deltas = {}
+    for batch in repository.iter_batches('contracts', batch_size, LEDGER_COLUMNS['contracts']):
+        contract_batch_deltas(batch, 1, deltas)
+    for batch in repository.iter_batches('payment_records', batch_size, LEDGER_COLUMNS['payment_records']):
+        payment_batch_deltas(batch, 1, deltas)
+    return _rows(deltas)
+
+
+def ensure(repository):
+    # 원장이 비어 있으면 한 번 만들어 둔다
+    if not repository.has_ledger():
+        rebuild(repository)
+
+
+def rebuild(repository):
+    rows = compute(repository)
+    repository.replace_ledger(rows)
+    return len(rows)
+
+
+def check(repository, rel_tol=1e-9, abs_tol=1e-6):
+    # 원장과 DB 집계(처음부터 다시 계산한 값)를 비교해 어긋난 달의 목록을 돌려준다
+    expected = {
+        INCOME: repository.monthly_income(),
+        INSTALLMENTS: repository.monthly_income(include_contract_amount=False),
+        REVENUE: repository.monthly_revenue()
+    }
+    mismatches = []
+    for series in SERIES:
+        actual = repository.read_ledger(series)
+        for month in sorted(set(chain(actual, expected[series]))):
+            a = actual.get(month)
+            b = expected[series].get(month)
+            if a is None or b is None or not math.isclose(a, b, rel_tol=rel_tol, abs_tol=abs_tol):
+                mismatches.append({'series': series, 'month': month, 'ledger': a, 'expected': b})
+    return mismatches
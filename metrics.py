@@ -0,0 +1,344 @@
+import cProfile
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import request, before_render_template, template_rendered
+from flask.json.provider import DefaultJSONProvider
+
+# 요청 계측
+#
+# 요청마다 단계별 시간을 모아 Prometheus 형식(/metrics)으로 내보낸다.
+# 단계: db(저장소 호출), compute(집계 계산), serialize(JSON/CSV/XLSX), render(Jinja),
+# handler(그 밖의 라우트 코드). 단계 안에서 연 하위 단계의 시간은 빼고 기록하므로
+# 같은 스레드에서는 단계 시간의 합이 요청 시간과 같다. gather()로 다른 스레드에서
+# 실행된 조회는 해당 단계에 더해진다.
+#
+# PROFILE_DIR 설정이 있으면 X-Profile 헤더가 붙은 요청 하나를 cProfile로 기록해
+# PROFILE_DIR/<route>-<시각>.prof 에 저장한다 (스트리밍 응답은 전송이 끝날 때까지).
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864, 268435456)
+
+# 저장소 메서드 중 계측할 것. 앞의 것들은 첫 인자가 테이블 이름이다
+TABLE_METHODS = ('select', 'iter_batches', 'query_page', 'iter_page', 'get', 'insert', 'insert_many', 'update', 'delete',
+                 'write_with_ledger', 'insert_many_with_ledger')
+METHOD_TABLES = {
+    'monthly_revenue': 'payment_records',
+    'monthly_income': 'contracts',
+    'has_ledger': 'monthly_ledger',
+    'read_ledger': 'monthly_ledger',
+    'apply_ledger_deltas': 'monthly_ledger',
+    'replace_ledger': 'monthly_ledger'
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labels, labels)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._values = {}   # labels -> [버킷별 개수, 합계, 개수]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, counts):
+                    cumulative += bucket
+                    le = 'le="' + _number(bound) + '"'
+                    lines.append(f'{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}')
+                le = 'le="+Inf"'
+                lines.append(f'{self.name}_bucket{_labels(self.labels, labels, le)} {count}')
+                lines.append(f'{self.name}_sum{_labels(self.labels, labels)} {_number(total)}')
+                lines.append(f'{self.name}_count{_labels(self.labels, labels)} {count}')
+        return lines
+
+
+REQUESTS = Counter('app_requests_total', '처리한 요청 수', ('route', 'method', 'status'))
+REQUEST_DURATION = Histogram('app_request_duration_seconds', '요청 처리 시간 (스트리밍 응답은 전송 완료까지)', ('route',))
+PHASE_DURATION = Histogram('app_phase_duration_seconds', '요청 하나에서 단계별로 쓴 시간', ('route', 'phase'))
+ROWS_FETCHED = Counter('app_db_rows_total', '저장소에서 읽거나 쓴 행 수', ('route', 'table'))
+DB_CALLS = Counter('app_db_calls_total', '저장소 호출 수', ('route', 'table'))
+RESPONSE_BYTES = Histogram('app_response_bytes', '응답 본문 크기', ('route',), BYTES_BUCKETS)
+
+METRICS = (REQUESTS, REQUEST_DURATION, PHASE_DURATION, ROWS_FETCHED, DB_CALLS, RESPONSE_BYTES)
+
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+class _Span:
+    __slots__ = ('phase', 'parent', 'child', 'thread')
+
+    def __init__(self, phase, parent=None):
+        self.phase = phase
+        self.parent = parent
+        self.child = 0.0
+        self.thread = threading.get_ident()
+
+    def close(self, state, elapsed):
+        # 자기 시간(하위 단계 제외)을 기록하고, 같은 스레드의 상위 단계에서는 전체 시간을 뺀다
+        state.add(self.phase, elapsed - self.child)
+        if self.parent is not None and self.parent.thread == self.thread:
+            self.parent.child += elapsed
+
+
+class RequestMetrics:
+    def __init__(self, route, method):
+        self.route = route
+        self.method = method
+        self.started = time.perf_counter()
+        self.root = _Span('handler')
+        self.phases = {}
+        self.bytes = 0
+        self.status = None
+        self.profiler = None
+        self.profile_path = None
+        self.renders = []
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + max(seconds, 0.0)
+
+
+_request = ContextVar('request_metrics', default=None)
+_span = ContextVar('metrics_span', default=None)
+
+
+@contextmanager
+def span(phase):
+    # with span('compute'): ... 요청 밖(CLI, 백그라운드 스레드)에서는 아무것도 하지 않는다
+    state = _request.get()
+    if state is None:
+        yield
+        return
+    current_span = _Span(phase, _span.get())
+    token = _span.set(current_span)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _span.reset(token)
+        current_span.close(state, time.perf_counter() - started)
+
+
+def timed_iter(iterable, phase):
+    # 생성기가 다음 항목을 만드는 시간만 phase로 기록한다 (yield 사이에 span을 열어 두지 않음)
+    iterator = iter(iterable)
+    try:
+        while True:
+            with span(phase):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close:
+            close()
+
+
+def _row_count(result):
+    if isinstance(result, tuple):
+        result = result[0]
+    if isinstance(result, (list, dict)):
+        return len(result)
+    return 1 if result else 0
+
+
+class InstrumentedRepository:
+    # 저장소 호출을 db 단계로 기록하고 테이블별 행 수를 센다. 나머지 속성은 그대로 넘긴다
+
+    def __init__(self, repository):
+        self._repository = repository
+
+    def __getattr__(self, name):
+        attr = getattr(self._repository, name)
+        if name not in TABLE_METHODS and name not in METHOD_TABLES:
+            return attr
+
+        def call(*args, **kwargs):
+            state = _request.get()
+            if state is None:
+                return attr(*args, **kwargs)
+            table = args[0] if name in TABLE_METHODS and args else METHOD_TABLES.get(name, '')
+            labels = (state.route, table)
+            DB_CALLS.inc(labels)
+            if name == 'iter_batches':
+                return self._count_batches(attr(*args, **kwargs), labels)
+            if name == 'iter_page':
+                with span('db'):
+                    rows, total = attr(*args, **kwargs)
+                return self._count_rows(rows, labels), total
+            with span('db'):
+                result = attr(*args, **kwargs)
+            ROWS_FETCHED.inc(labels, _row_count(result))
+            return result
+
+        return call
+
+    def _count_batches(self, batches, labels):
+        for batch in timed_iter(batches, 'db'):
+            ROWS_FETCHED.inc(labels, len(batch))
+            yield batch
+
+    def _count_rows(self, rows, labels):
+        for row in timed_iter(rows, 'db'):
+            ROWS_FETCHED.inc(labels)
+            yield row
+
+
+def instrument(repository):
+    return InstrumentedRepository(repository)
+
+
+class InstrumentedJSONProvider(DefaultJSONProvider):
+    # jsonify 직렬화 시간을 serialize 단계로 기록한다
+
+    def dumps(self, obj, **kwargs):
+        with span('serialize'):
+            return super().dumps(obj, **kwargs)
+
+
+def _counted(state, iterable):
+    for chunk in timed_iter(iterable, 'serialize'):
+        state.bytes += len(chunk)
+        yield chunk
+
+
+def _finish(state):
+    if state.finished:
+        return
+    state.finished = True
+    if state.profiler is not None:
+        state.profiler.disable()
+        state.profiler.dump_stats(state.profile_path)
+
+    route = state.route
+    REQUESTS.inc((route, state.method, str(state.status)))
+    REQUEST_DURATION.observe((route,), time.perf_counter() - state.started)
+    RESPONSE_BYTES.observe((route,), state.bytes)
+    for phase, seconds in state.phases.items():
+        PHASE_DURATION.observe((route, phase), seconds)
+    if _request.get() is state:
+        _request.set(None)
+        _span.set(None)
+
+
+def init_app(app):
+    app.json = InstrumentedJSONProvider(app)
+
+    @app.before_request
+    def start_request_metrics():
+        state = RequestMetrics(request.endpoint or 'unmatched', request.method)
+        _request.set(state)
+        _span.set(state.root)
+
+        profile_dir = app.config.get('PROFILE_DIR')
+        if profile_dir and request.headers.get('X-Profile'):
+            os.makedirs(profile_dir, exist_ok=True)
+            state.profile_path = os.path.join(profile_dir, f'{state.route}-{int(time.time() * 1000)}.prof')
+            state.profiler = cProfile.Profile()
+            state.profiler.enable()
+
+    @app.after_request
+    def finish_request_metrics(response):
+        state = _request.get()
+        if state is None:
+            return response
+        state.add('handler', time.perf_counter() - state.started - state.root.child)
+        state.status = response.status_code
+        if state.profile_path:
+            response.headers['X-Profile-File'] = os.path.basename(state.profile_path)
+
+        if response.direct_passthrough:
+            # send_file 응답은 본문을 서버에 그대로 넘겨 close 콜백이 불리지 않으므로 여기서 마친다
+            state.bytes = response.content_length or 0
+            _finish(state)
+            return response
+
+        if response.is_streamed:
+            # 스트리밍 응답은 청크를 만드는 시간과 보낸 바이트를 전송이 끝날 때까지 센다
+            response.response = _counted(state, response.response)
+        else:
+            state.bytes = response.content_length or 0
+        response.call_on_close(lambda: _finish(state))
+        return response
+
+    # Jinja 렌더링은 render_template 전후 시그널로 잰다
+    def start_render(sender, template, context, **extra):
+        state = _request.get()
+        if state is not None:
+            render_span = _Span('render', _span.get())
+            state.renders.append((render_span, _span.set(render_span), time.perf_counter()))
+
+    def end_render(sender, template, context, **extra):
+        state = _request.get()
+        if state is not None and state.renders:
+            render_span, token, started = state.renders.pop()
+            _span.reset(token)
+            render_span.close(state, time.perf_counter() - started)
+
+    before_render_template.connect(start_render, app, weak=False)
+    template_rendered.connect(end_render, app, weak=False)
@@ -0,0 +1,481 @@
+import re
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from itertools import chain
+import numpy as np
+from records import decode_columns
+from schedule import add_months
+
+# 입금 기록 대사 (payment -> contract)
+#
+# 계약에 연결되지 않은 입금 기록(contract_id가 비어 있는 행)마다 후보 계약을 찾아 가장
+# 잘 맞는 계약의 id를 저장한다. 모든 입금 × 모든 계약을 비교하지 않고 계약 쪽에 색인을
+# 만들어 후보만 고른다 (blocking).
+#   1. 정규화한 사업자번호가 같은 계약 (하이픈/공백 무시)
+#   2. 사업자번호가 한 글자 틀린 계약: 번호에서 한 글자씩 지운 문자열 색인 (symmetric delete).
+#      입력 번호의 삭제형과 계약 번호의 삭제형이 만나면 편집 거리 1~2(치환, 누락, 추가, 자리 바뀜)다
+#   3. 상호/대표자/입금자명이 비슷한 계약: 정규화한 이름의 2-gram 색인
+# 한 사업자번호/이름에 계약이 아주 많으면(프랜차이즈 등) 그 안에서 다시 회차 금액/계약금/총액이
+# 입금액에 가까운 계약만 후보로 둔다 (금액이 같으면 시작일이 입금일에 가까운 계약).
+# 후보마다 사업자번호 일치 정도, 이름 유사도, 금액(계약금/회차 금액의 배수/총액과의 차이),
+# 입금일(계약 기간 안인지)을 점수로 합쳐 벡터 연산으로 한 번에 계산하고 가장 높은 계약을 고른다.
+# 사업자번호가 같은 계약이 있으면 그중 가장 잘 맞는 계약에 연결하고, 없으면 점수가 MIN_SCORE를
+# 넘고 다른 사업자의 후보보다 MIN_MARGIN 이상 높을 때만 연결한다 (아니면 ambiguous로 남긴다).
+
+CONTRACT_FIELDS = ('id', 'title', 'business_number', 'representative', 'start_date',
+                   'payment_months', 'total_installment', 'contract_amount')
+PAYMENT_FIELDS = ('id', 'title', 'business_number', 'representative', 'payer_name',
+                  'payment_date', 'payment_amount', 'contract_id')
+
+# 사업자번호 일치 정도
+EXACT = 1.0
+TYPO = 0.7
+
+WEIGHTS = {'business': 0.35, 'name': 0.35, 'amount': 0.2, 'date': 0.1}
+# 사업자번호가 같은 계약이 없을 때 이 점수 이상이어야 연결한다. 오타 번호만 맞거나 이름만
+# 맞아서는 넘지 못한다
+MIN_SCORE = 0.55
+# 다른 사업자의 후보와 점수 차이가 이보다 작으면 연결하지 않는다
+MIN_MARGIN = 0.05
+# 이름만 비슷한 후보의 최소 2-gram Jaccard 유사도
+MIN_NAME_SIMILARITY = 0.5
+# 입금 한 건당 이름 후보 수
+MAX_NAME_CANDIDATES = 10
+# 너무 많은 이름에 나오는 2-gram('유치', '학원' 등)은 후보를 좁히지 못하므로 색인에서 건너뛴다
+MAX_POSTINGS = 500
+# 한 사업자번호/이름의 계약이 이보다 많으면 금액이 가까운 계약만 후보로 둔다
+MAX_BLOCK = 16
+# 금액 기준(회차 금액, 계약금, 총액)마다 가까운 쪽으로 앞뒤 이만큼
+BLOCK_NEIGHBORS = 4
+# 이보다 짧은 사업자번호는 오타 후보를 찾지 않는다
+MIN_NUMBER_LENGTH = 6
+# 금액 상대 오차가 이만큼이면 금액 점수 0
+AMOUNT_TOLERANCE = 0.2
+# 계약 시작 전/종료 후 이 일수 안의 입금은 기간 안으로 본다. 벗어나면 1년에 걸쳐 점수가 줄어든다
+DAYS_BEFORE_START = 31
+DAYS_AFTER_END = 92
+
+# 시작일/입금일이 없는 값(NaT)은 이 날짜로 본다 (정렬 키를 32비트 안에 두기 위해)
+_NO_DAY = -(1 << 31)
+
+_NON_DIGITS = re.compile(r'\D')
+_NAME_NOISE = re.compile(r'\(주\)|㈜|주식회사|\(유\)|유한회사|[\s()\[\]\-.,·]')
+
+
+def normalize_business_number(value):
+    # '123-45-67890' -> '1234567890' (숫자가 없으면 '')
+    return _NON_DIGITS.sub('', value or '')
+
+
+def normalize_name(value):
+    # 법인 표기, 공백, 괄호/구두점을 지우고 소문자로
+    return _NAME_NOISE.sub('', value or '').lower()
+
+
+def _bigrams(text):
+    if len(text) < 2:
+        return frozenset((text,)) if text else frozenset()
+    return frozenset(text[i:i + 2] for i in range(len(text) - 1))
+
+
+def _deletions(text):
+    return {text[:i] + text[i + 1:] for i in range(len(text))}
+
+
+def _similarity(left, right):
+    # 2-gram 집합의 Jaccard 유사도
+    if not left or not right:
+        return 0.0
+    shared = len(left & right)
+    return shared / (len(left) + len(right) - shared)
+
+
+class _AmountBlock:
+    # 계약이 많은 블록을 금액 기준(두 가지 회차 금액, 계약금, 총액)마다 (금액, 시작일) 순으로 정렬해 둔다.
+    # 금액은 순위로 바꿔 (순위, 시작일)을 정수 하나로 합치고 searchsorted 한 번으로 찾는다
+
+    def __init__(self, index, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        starts = np.maximum(index.start[positions].view(np.int64), _NO_DAY) - _NO_DAY
+        self.keys = []
+        for values in (index.body, index.flat, index.down, index.total):
+            levels, rank = np.unique(np.round(values[positions], 2), return_inverse=True)
+            keys = (rank.astype(np.int64) << 32) + starts
+            order = np.argsort(keys, kind='stable')
+            self.keys.append((levels, keys[order], positions[order]))
+        # 입금 한 건씩 찾을 때(nearest_one)는 numpy 호출 비용이 더 크므로 리스트로도 둔다
+        self.lists = [(levels.tolist(), keys.tolist(), positions.tolist()) for levels, keys, positions in self.keys]
+
+    def nearest(self, amounts, days):
+        # 입금마다 가장 가까운 금액의 계약 중 시작일이 입금일에 가까운 곳의 앞뒤 BLOCK_NEIGHBORS개
+        # (입금 수 × 후보 수 행렬. 블록 끝에서 잘린 자리는 같은 계약이 반복된다)
+        days = np.maximum(days, _NO_DAY) - _NO_DAY
+        offsets = np.arange(-BLOCK_NEIGHBORS, BLOCK_NEIGHBORS)
+        found = []
+        for levels, keys, positions in self.keys:
+            right = np.minimum(np.searchsorted(levels, amounts), len(levels) - 1)
+            left = np.maximum(right - 1, 0)
+            level = np.where(np.abs(amounts - levels[left]) <= np.abs(levels[right] - amounts), left, right)
+            center = np.searchsorted(keys, (level.astype(np.int64) << 32) + days)
+            found.append(positions[np.clip(center[:, None] + offsets, 0, len(keys) - 1)])
+        return np.concatenate(found, axis=1)
+
+    def nearest_one(self, amount, day):
+        day = max(day, _NO_DAY) - _NO_DAY
+        found = set()
+        for levels, keys, positions in self.lists:
+            right = min(bisect_left(levels, amount), len(levels) - 1)
+            left = max(right - 1, 0)
+            level = left if abs(amount - levels[left]) <= abs(levels[right] - amount) else right
+            center = bisect_left(keys, (level << 32) + day)
+            found.update(positions[max(center - BLOCK_NEIGHBORS, 0):center + BLOCK_NEIGHBORS])
+        return found
+
+
+class ContractIndex:
+    """계약 후보 색인 (사업자번호, 사업자번호 삭제형, 이름 2-gram)."""
+
+    def __init__(self, rows):
+        columns = decode_columns('contracts', rows, CONTRACT_FIELDS)
+        self.ids = np.array(columns['id'], dtype=np.int64)
+        self.start = columns['start_date']
+        self.months = columns['payment_months']
+        self.total = columns['total_installment']
+        self.down = columns['contract_amount']
+        self.end = add_months(self.start, self.months)
+        # 회차 금액: 계약금을 뺀 나머지를 나눈 금액(schedule.due_amounts, 개월 수가 0이면 일시불)과
+        # total_installment 전체를 나눈 금액(include_contract_amount=False 스케줄)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.body = np.where(self.months > 0, (self.total - self.down) / np.maximum(self.months, 1), self.total - self.down)
+            self.flat = self.total / np.maximum(self.months, 1)
+
+        self.by_business = defaultdict(list)
+        self.by_name = defaultdict(list)
+        self.names = []
+        for position, (number, title, representative) in enumerate(
+                zip(columns['business_number'], columns['title'], columns['representative'])):
+            number = normalize_business_number(number)
+            if number:
+                self.by_business[number].append(position)
+            names = tuple({name for name in (normalize_name(title), normalize_name(representative)) if name})
+            self.names.append(names)
+            for name in names:
+                self.by_name[name].append(position)
+
+        # 사업자번호 코드와 코드 순으로 늘어놓은 계약 위치 (코드 c의 계약은 by_code[starts[c]:starts[c] + sizes[c]])
+        self.codes = {number: code for code, number in enumerate(self.by_business)}
+        self.sizes = np.array([len(positions) for positions in self.by_business.values()], dtype=np.int64)
+        self.starts = np.cumsum(self.sizes) - self.sizes
+        self.by_code = np.array(list(chain.from_iterable(self.by_business.values())), dtype=np.int64)
+        # 계약별 사업자 (번호가 없는 계약은 계약마다 다른 음수)
+        self.business = -1 - np.arange(len(self.ids), dtype=np.int64)
+        self.business[self.by_code] = np.repeat(np.arange(len(self.sizes)), self.sizes)
+
+        self.by_deletion = defaultdict(list)
+        for number in self.by_business:
+            if len(number) >= MIN_NUMBER_LENGTH:
+                for variant in _deletions(number):
+                    self.by_deletion[variant].append(number)
+
+        self.grams = {name: _bigrams(name) for name in self.by_name}
+        self.by_gram = defaultdict(list)
+        for name, grams in self.grams.items():
+            for gram in grams:
+                self.by_gram[gram].append(name)
+        self.blocks = {}
+
+    def block(self, key, positions):
+        block = self.blocks.get(key)
+        if block is None:
+            block = self.blocks[key] = _AmountBlock(self, positions)
+        return block
+
+    def narrow(self, key, positions, amount, day):
+        # 입금 한 건의 후보. 큰 블록에서는 금액/시작일이 가까운 계약만
+        if len(positions) <= MAX_BLOCK:
+            return positions
+        return self.block(key, positions).nearest_one(amount, day)
+
+    def similar_numbers(self, number):
+        # 편집 거리가 작은 (같지는 않은) 계약 사업자번호
+        if len(number) < MIN_NUMBER_LENGTH:
+            return set()
+        found = set(self.by_deletion.get(number, ()))
+        for variant in _deletions(number):
+            if variant in self.by_business:
+                found.add(variant)
+            found.update(self.by_deletion.get(variant, ()))
+        found.discard(number)
+        return found
+
+    def similar_names(self, grams):
+        # 2-gram을 많이 공유하는 계약 이름 (공유 개수 순 최대 MAX_NAME_CANDIDATES개)
+        counts = Counter()
+        for gram in grams:
+            names = self.by_gram.get(gram)
+            if names and len(names) <= MAX_POSTINGS:
+                counts.update(names)
+        return [name for name, _ in counts.most_common(MAX_NAME_CANDIDATES)]
+
+    def name_similarity(self, name, payment_grams):
+        return max((_similarity(grams, self.grams[name]) for grams in payment_grams), default=0.0)
+
+
+def _normalized(values, normalize):
+    # 같은 값이 반복되는 컬럼은 고유한 값만 정규화한다
+    cache = {}
+    result = []
+    for value in values:
+        normalized = cache.get(value)
+        if normalized is None:
+            normalized = cache[value] = normalize(value)
+        result.append(normalized)
+    return result
+
+
+def _exact_candidates(index, codes, amounts, days):
+    # 사업자번호가 같은 계약 후보 (입금 위치 배열, 계약 위치 배열)
+    sizes = np.zeros(len(codes), dtype=np.int64)
+    known = codes >= 0
+    sizes[known] = index.sizes[codes[known]]
+    small = np.flatnonzero((sizes > 0) & (sizes <= MAX_BLOCK))
+    counts = sizes[small]
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    pay_pos = [np.repeat(small, counts)]
+    con_pos = [index.by_code[np.repeat(index.starts[codes[small]], counts) + offsets]]
+
+    # 큰 블록은 블록마다 한 번에 금액/시작일이 가까운 계약만 고른다
+    large = np.flatnonzero(sizes > MAX_BLOCK)
+    large = large[np.argsort(codes[large], kind='stable')]
+    numbers = list(index.by_business)
+    for positions in np.split(large, np.flatnonzero(np.diff(codes[large])) + 1):
+        if not len(positions):
+            continue
+        number = numbers[codes[positions[0]]]
+        found = index.block(number, index.by_business[number]).nearest(amounts[positions], days[positions])
+        # 금액 기준끼리 겹친 후보는 점수가 같으므로 그대로 둔다
+        pay_pos.append(np.repeat(positions, found.shape[1]))
+        con_pos.append(found.ravel())
+    return np.concatenate(pay_pos), np.concatenate(con_pos)
+
+
+def _contract_similarity(index, contract, similarities, payment_grams):
+    # 계약 이름(상호, 대표자) 중 가장 비슷한 쪽. similarities는 이름별 유사도 캐시
+    score = 0.0
+    for name in index.names[contract]:
+        value = similarities.get(name)
+        if value is None:
+            value = similarities[name] = index.name_similarity(name, payment_grams)
+        score = max(score, value)
+    return score
+
+
+def _name_candidates(index, names, gram_cache):
+    # 입금 이름 조합 하나의 이름 후보: (2-gram 목록, 이름별 유사도, 작은 블록의 계약과 유사도, 큰 블록 이름)
+    payment_grams = []
+    for name in names:
+        grams = gram_cache.get(name)
+        if grams is None:
+            grams = gram_cache[name] = _bigrams(name)
+        payment_grams.append(grams)
+    similarities = {}
+    contracts = {}
+    large = []
+    if payment_grams:
+        for name in index.similar_names(frozenset().union(*payment_grams)):
+            value = similarities[name] = index.name_similarity(name, payment_grams)
+            if value < MIN_NAME_SIMILARITY:
+                continue
+            positions = index.by_name[name]
+            if len(positions) > MAX_BLOCK:
+                large.append(name)
+                continue
+            # 계약의 다른 이름이 더 비슷하면 그 이름도 후보 이름에 들어 있다
+            for contract in positions:
+                if contracts.get(contract, 0.0) < value:
+                    contracts[contract] = value
+    return payment_grams, similarities, list(contracts), list(contracts.values()), large
+
+
+def _candidates(index, columns):
+    # (입금 위치, 계약 위치, 사업자번호 일치 정도, 이름 유사도) 후보 배열.
+    # 한 입금의 후보는 연속으로 놓인다 (match가 정렬 없이 입금별로 묶는다)
+    amounts = columns['payment_amount']
+    days = columns['payment_date'].view(np.int64)
+    numbers = _normalized(columns['business_number'], normalize_business_number)
+    codes = np.fromiter((index.codes.get(number, -1) for number in numbers), dtype=np.int64, count=len(numbers))
+
+    # 1. 사업자번호가 같은 계약. 같은 사업자로 보고 이름은 비교하지 않는다
+    exact_pay, exact_con = _exact_candidates(index, codes, amounts, days)
+
+    # 2, 3. 사업자번호가 같은 계약이 없는 입금: 번호가 비슷하거나 이름이 비슷한 계약
+    pay_pos, con_pos, level, similarity = [], [], [], []
+    gram_cache = {}
+    name_cache = {}
+    fuzzy = np.flatnonzero(codes < 0).tolist()
+    titles, representatives, payers = (_normalized([columns[name][position] for position in fuzzy], normalize_name)
+                                       for name in ('title', 'representative', 'payer_name'))
+    for i, position in enumerate(fuzzy):
+        number = numbers[position]
+        amount = float(amounts[position])
+        day = int(days[position])
+        found = {}
+        if number:
+            for similar in index.similar_numbers(number):
+                for contract in index.narrow(similar, index.by_business[similar], amount, day):
+                    found[contract] = TYPO
+
+        # 이름 후보는 같은 이름 조합의 입금(매달 들어오는 같은 입금자)끼리 함께 쓴다.
+        # 계약이 적은 이름의 후보는 금액과 관계없으므로 계약 목록까지 캐시한다
+        names = tuple(sorted({titles[i], representatives[i], payers[i]} - {''}))
+        cached = name_cache.get(names)
+        if cached is None:
+            cached = name_cache[names] = _name_candidates(index, names, gram_cache)
+        payment_grams, similarities, contracts, scores, large = cached
+        count = len(contracts)
+        pay_pos.extend([position] * count)
+        con_pos.extend(contracts)
+        level.extend([0.0] * count)
+        similarity.extend(scores)
+        for name in large:
+            for contract in index.narrow(('name', name), index.by_name[name], amount, day):
+                found.setdefault(contract, 0.0)
+
+        # 오타 번호 후보와 큰 이름 블록 후보 (작은 이름 블록과 겹친 계약은 점수가 높은 쪽이 남는다)
+        for contract, business in found.items():
+            pay_pos.append(position)
+            con_pos.append(contract)
+            level.append(business)
+            similarity.append(_contract_similarity(index, contract, similarities, payment_grams))
+
+    return (np.concatenate([exact_pay, np.array(pay_pos, dtype=np.int64)]),
+            np.concatenate([exact_con, np.array(con_pos, dtype=np.int64)]),
+            np.concatenate([np.full(len(exact_pay), EXACT), np.array(level, dtype=np.float64)]),
+            np.concatenate([np.ones(len(exact_pay)), np.array(similarity, dtype=np.float64)]))
+
+
+def _relative_error(amount, expected):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(expected > 0, np.abs(amount - expected) / np.maximum(expected, 1.0), np.inf)
+
+
+def _installment_error(amount, installment, months):
+    # 회차 금액의 정수 배(여러 달치를 한 번에 낸 경우)와의 상대 오차
+    with np.errstate(divide='ignore', invalid='ignore'):
+        count = np.clip(np.rint(amount / np.where(installment > 0, installment, 1.0)), 1, np.maximum(months, 1))
+    return _relative_error(amount, count * installment)
+
+
+def _amount_fit(amount, index, contracts):
+    # 회차 금액(두 스케줄)의 배수, 계약금, 총액 중 가장 가까운 금액과의 상대 오차
+    months = index.months[contracts]
+    error = np.minimum.reduce([
+        _installment_error(amount, index.body[contracts], months),
+        _installment_error(amount, index.flat[contracts], months),
+        _relative_error(amount, index.down[contracts]),
+        _relative_error(amount, index.total[contracts])
+    ])
+    return np.clip(1.0 - error / AMOUNT_TOLERANCE, 0.0, 1.0)
+
+
+def _date_fit(day, start, end):
+    # 계약 기간(앞뒤 여유 포함) 안이면 1, 벗어난 일수만큼 1년에 걸쳐 0으로
+    early = (start - np.timedelta64(DAYS_BEFORE_START, 'D') - day).astype(np.int64)
+    late = (day - end - np.timedelta64(DAYS_AFTER_END, 'D')).astype(np.int64)
+    fit = np.clip(1.0 - np.maximum(np.maximum(early, late), 0) / 365.0, 0.0, 1.0)
+    return np.where(np.isnat(day) | np.isnat(start), 0.0, fit)
+
+
+def _run_starts(values):
+    # 같은 값이 이어지는 구간의 첫 자리
+    starts = np.ones(len(values), dtype=bool)
+    starts[1:] = values[1:] != values[:-1]
+    return starts
+
+
+def _group_max(values, bounds):
+    # bounds에서 시작하는 구간별 최댓값
+    return np.maximum.reduceat(values, bounds) if len(values) else values[:0]
+
+
+def match(contracts, payments):
+    """입금 기록 행마다 연결할 계약을 고른다.
+
+    contracts/payments는 CONTRACT_FIELDS/PAYMENT_FIELDS를 담은 dict 행 목록이다.
+    (payment_id, contract_id 또는 None, 점수 또는 None) 목록과 건수 요약을 돌려준다.
+    """
+    index = ContractIndex(contracts)
+    columns = decode_columns('payment_records', payments, PAYMENT_FIELDS)
+    pay_pos, con_pos, level, similarity = _candidates(index, columns)
+
+    amount = columns['payment_amount'][pay_pos]
+    score = (WEIGHTS['business'] * level
+             + WEIGHTS['name'] * similarity
+             + WEIGHTS['amount'] * _amount_fit(amount, index, con_pos)
+             + WEIGHTS['date'] * _date_fit(columns['payment_date'][pay_pos], index.start[con_pos], index.end[con_pos]))
+
+    # 입금마다 점수가 가장 높은 후보, 같으면 시작일이 빠른 계약. (점수, 시작일 역순)을 정수 하나로 합쳐
+    # 연속된 후보 구간마다 최댓값을 구한다
+    first = _run_starts(pay_pos)
+    bounds = np.flatnonzero(first)
+    group = np.cumsum(first) - 1
+    earlier = (1 << 32) - 1 - (np.maximum(index.start[con_pos].view(np.int64), _NO_DAY) - _NO_DAY)
+    key = (np.rint(score * 1e6).astype(np.int64) << 32) + earlier
+    top = np.flatnonzero(key == _group_max(key, bounds)[group])
+    best = top[_run_starts(group[top])]
+
+    # 1위와 다른 사업자인 후보 중 가장 높은 점수
+    business = index.business[con_pos]
+    rival = _group_max(np.where(business != business[best][group], score, -np.inf), bounds)
+
+    exact = level[best] == EXACT
+    accepted = exact | (score[best] >= MIN_SCORE)
+    ambiguous = accepted & ~exact & (score[best] - rival < MIN_MARGIN)
+    accepted &= ~ambiguous
+
+    contract_ids = [None] * len(payments)
+    scores = [None] * len(payments)
+    for position, contract, value in zip(pay_pos[best][accepted].tolist(), index.ids[con_pos[best][accepted]].tolist(),
+                                         np.round(score[best][accepted], 4).tolist()):
+        contract_ids[position] = contract
+        scores[position] = value
+
+    matched = int(accepted.sum())
+    exact = int(exact.sum())
+    assignments = list(zip(columns['id'], contract_ids, scores))
+    return assignments, {
+        'payments': len(payments),
+        'matched': matched,
+        'exact': exact,
+        'fuzzy': matched - exact,
+        'ambiguous': int(ambiguous.sum()),
+        'unmatched': len(payments) - matched
+    }
+
+
+def run(repository, rematch=False, dry_run=False, batch_size=5000):
+    """연결되지 않은 입금 기록을 대사해 contract_id/match_score를 저장한다.
+
+    rematch=True면 이미 연결된 입금 기록도 다시 계산한다 (맞는 계약이 없으면 연결을 지운다).
+    dry_run=True면 저장하지 않고 결과 요약만 돌려준다.
+    """
+    started = time.perf_counter()
+    contracts = [row for batch in repository.iter_batches('contracts', batch_size, CONTRACT_FIELDS) for row in batch]
+    payments = [row for batch in repository.iter_batches('payment_records', batch_size, PAYMENT_FIELDS)
+                for row in batch if rematch or row['contract_id'] is None]
+    assignments, report = match(contracts, payments)
+
+    if not dry_run:
+        rows = [{'id': payment_id, 'contract_id': contract_id, 'match_score': score}
+                for payment_id, contract_id, score in assignments if rematch or contract_id is not None]
+        for offset in range(0, len(rows), batch_size):
+            repository.save_payment_matches(rows[offset:offset + batch_size])
+        report['saved'] = len(rows)
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def inputs_changed(old, new):
+    # 대사에 쓰는 값이 바뀌었는지 (바뀌었으면 저장된 연결을 지우고 다음 대사에서 다시 찾는다)
+    return any(old.get(name) != new.get(name) for name in PAYMENT_FIELDS if name not in ('id', 'contract_id'))
@@ -0,0 +1,229 @@
+import math
+from datetime import date, datetime
+from functools import lru_cache
+import numpy as np
+from storage import MATCH_COLUMNS, TABLE_COLUMNS
+
+# 계약/입금 기록 레코드
+#
+# 저장소가 돌려준 dict 행을 쓰기 경로(폼, 원장 증감분)에서 한 번만 해석해 __slots__
+# 객체로 만든다. 날짜는 datetime.date, 금액은 float, 개월 수는 int로 바꿔 두고
+# 계약은 시작 월 인덱스(1970-01 기준 개월 수, schedule.month_index와 같은 값)와
+# 종료일을, 입금 기록은 입금 월 인덱스를 미리 계산한다.
+# 전체 결과 집합(원장 재계산 등)은 행마다 객체를 만들지 않고 decode_columns로 컬럼 배열로 바꾼다.
+# 폼과 일괄 가져오기(importer.py)는 같은 컬럼 규칙과 오류 문구로 검증한다.
+
+FLOAT_COLUMNS = {
+    'contracts': ('product_price', 'total_amount', 'tax', 'total_with_tax', 'contract_amount', 'total_installment'),
+    'payment_records': ('payment_amount',)
+}
+
+INT_COLUMNS = {
+    'contracts': ('quantity', 'payment_months'),
+    'payment_records': ()
+}
+
+DATE_COLUMNS = {
+    'contracts': ('start_date',),
+    'payment_records': ('payment_date',)
+}
+
+REQUIRED_COLUMNS = {
+    'contracts': ('title', 'business_number', 'start_date'),
+    'payment_records': ('payment_date', 'payment_amount')
+}
+
+
+@lru_cache(maxsize=16384)
+def _iso_date(text):
+    # 같은 날짜 문자열이 반복되므로 해석 결과를 캐시한다
+    if len(text) != 10 or text[4] != '-' or text[7] != '-':
+        raise ValueError(f'날짜 형식이 올바르지 않습니다: {text}')
+    return date(int(text[:4]), int(text[5:7]), int(text[8:]))
+
+
+def parse_date(value):
+    # 'YYYY-MM-DD'(뒤의 시각은 무시), 'YYYY.MM.DD', 'YYYY/MM/DD' -> date. 빈 값은 None, 틀리면 ValueError
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()[:10]
+    if not text:
+        return None
+    return _iso_date(text.replace('.', '-').replace('/', '-'))
+
+
+def month_of(day):
+    # date -> 월 인덱스
+    return (day.year - 1970) * 12 + day.month - 1
+
+
+def add_months(day, months):
+    # relativedelta(months=n)와 같이 말일을 넘으면 그 달 말일로 맞춘다
+    month = month_of(day) + months
+    year, month = divmod(month, 12)
+    year += 1970
+    month += 1
+    if day.day <= 28:
+        return day.replace(year=year, month=month)
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    return date(year, month, min(day.day, (next_month - date(year, month, 1)).days))
+
+
+def _float(value):
+    return float(value) if value else 0.0
+
+
+def _int(value):
+    return int(value) if value else 0
+
+
+def _text(value):
+    return value
+
+
+def _optional_int(value):
+    return int(value) if value is not None else None
+
+
+def _optional_float(value):
+    return float(value) if value is not None else None
+
+
+def _converters(table):
+    # 컬럼마다 값 변환 함수 (from_row에서 컬럼 종류를 매번 확인하지 않도록 미리 고른다)
+    converters = []
+    for name in TABLE_COLUMNS[table]:
+        if name == 'contract_id':
+            converters.append((name, _optional_int))
+        elif name == 'match_score':
+            converters.append((name, _optional_float))
+        elif name in FLOAT_COLUMNS[table]:
+            converters.append((name, _float))
+        elif name in INT_COLUMNS[table]:
+            converters.append((name, _int))
+        elif name in DATE_COLUMNS[table]:
+            converters.append((name, parse_date))
+        else:
+            converters.append((name, _text))
+    return tuple(converters)
+
+
+class Record:
+    __slots__ = ()
+    table = None
+    converters = ()
+
+    @classmethod
+    def from_row(cls, row):
+        # 저장소의 dict 행 -> 레코드 (없는 컬럼은 None, 숫자 컬럼은 0)
+        record = cls.__new__(cls)
+        get = row.get
+        for name, convert in cls.converters:
+            setattr(record, name, convert(get(name)))
+        record._derive()
+        return record
+
+    def _derive(self):
+        pass
+
+    def as_row(self):
+        # 저장소에 넘길 dict (id와 대사 결과 컬럼 제외, 날짜는 ISO 문자열)
+        row = {}
+        for name in TABLE_COLUMNS[self.table]:
+            if name == 'id' or name in MATCH_COLUMNS:
+                continue
+            value = getattr(self, name)
+            row[name] = value.isoformat() if isinstance(value, date) else value
+        return row
+
+
+class Contract(Record):
+    __slots__ = TABLE_COLUMNS['contracts'] + ('start_month', 'end_date')
+    table = 'contracts'
+    converters = _converters('contracts')
+
+    def _derive(self):
+        start = self.start_date
+        self.start_month = month_of(start) if start is not None else None
+        self.end_date = add_months(start, self.payment_months) if start is not None else None
+
+
+class PaymentRecord(Record):
+    __slots__ = TABLE_COLUMNS['payment_records'] + ('payment_month',)
+    table = 'payment_records'
+    converters = _converters('payment_records')
+
+    def _derive(self):
+        day = self.payment_date
+        self.payment_month = month_of(day) if day is not None else None
+
+
+RECORD_TYPES = {
+    'contracts': Contract,
+    'payment_records': PaymentRecord
+}
+
+
+def decode(table, row):
+    # 행 하나 (None이면 None)
+    return RECORD_TYPES[table].from_row(row) if row else None
+
+
+def decode_columns(table, rows, names):
+    # 결과 집합 전체를 컬럼별 배열로 한 번에 해석한다. 숫자는 float64/int64(빈 값은 0),
+    # 날짜는 datetime64[D](빈 값은 NaT), 나머지는 리스트
+    columns = {}
+    for name in names:
+        values = [row[name] for row in rows]
+        if name in FLOAT_COLUMNS[table]:
+            columns[name] = np.fromiter((value or 0 for value in values), dtype=np.float64, count=len(values))
+        elif name in INT_COLUMNS[table]:
+            columns[name] = np.fromiter((value or 0 for value in values), dtype=np.int64, count=len(values))
+        elif name in DATE_COLUMNS[table]:
+            columns[name] = np.array([(value or 'NaT')[:10] for value in values], dtype='datetime64[D]')
+        else:
+            columns[name] = values
+    return columns
+
+
+class FormError(ValueError):
+    def __init__(self, column, message):
+        super().__init__(message)
+        self.column = column
+
+
+def parse_form(table, form):
+    """폼 입력을 검증해 저장소에 넘길 레코드를 만든다 (틀린 값이 있으면 FormError).
+
+    숫자는 쉼표를 지우고 빈 값은 0으로, 날짜는 YYYY-MM-DD로 맞춘다.
+    """
+    floats = FLOAT_COLUMNS[table]
+    ints = INT_COLUMNS[table]
+    dates = DATE_COLUMNS[table]
+    row = {}
+    for name in TABLE_COLUMNS[table]:
+        if name == 'id' or name in MATCH_COLUMNS:
+            continue
+        text = (form.get(name) or '').strip()
+        if not text and name in REQUIRED_COLUMNS[table]:
+            raise FormError(name, f'{name} 값이 비어 있습니다')
+        if name in floats or name in ints:
+            try:
+                value = float(text.replace(',', '')) if text else 0.0
+            except ValueError:
+                raise FormError(name, f'{name} 값이 숫자가 아닙니다') from None
+            if not math.isfinite(value):
+                raise FormError(name, f'{name} 값이 숫자가 아닙니다')
+            row[name] = int(value) if name in ints else value
+        elif name in dates:
+            try:
+                row[name] = parse_date(text)
+            except ValueError:
+                raise FormError(name, f'{name} 날짜 형식이 올바르지 않습니다 (YYYY-MM-DD)') from None
+        else:
+            row[name] = text
+    return RECORD_TYPES[table].from_row(row)
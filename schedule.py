@@ -0,0 +1,182 @@
+import numpy as np
+from collections import defaultdict
+
+# 할부 스케줄 계산 엔진
+#
+# 계약마다 relativedelta로 월을 하나씩 만들던 루프를 대신한다.
+# 월은 정수 인덱스(1970-01 기준 개월 수)로 다루고, 계약 전체를 한 번에
+# (계약 행, 월 인덱스, 금액) 배열로 펼친 뒤 np.bincount로 합산한다.
+# 기간(window)을 주면 그 기간과 겹치는 계약의 겹치는 달만 펼치므로 비용이
+# 전체 이력이 아니라 기간 길이에 비례한다.
+
+# 스케줄 계산에 필요한 계약 컬럼 (저장소에서 이것만 가져온다)
+SCHEDULE_COLUMNS = ('start_date', 'payment_months', 'total_installment', 'contract_amount')
+
+
+def month_index(dates):
+    # 'YYYY-MM-DD' 문자열 목록 -> 월 인덱스 배열
+    if len(dates) == 0:
+        return np.empty(0, dtype=np.int64)
+    days = np.array(dates, dtype='datetime64[D]')
+    return days.astype('datetime64[M]').astype(np.int64)
+
+
+def month_window(start_month, end_month):
+    # 'YYYY-MM' 두 값 -> (첫 월, 마지막 월) 인덱스. 기존 라우트와 같이 둘 다 있을 때만 기간으로 본다
+    if not (start_month and end_month):
+        return None
+    return int(np.datetime64(start_month, 'M').astype(np.int64)), int(np.datetime64(end_month, 'M').astype(np.int64))
+
+
+def add_months(days, months):
+    # datetime64[D] 배열에 개월 수를 더한다. relativedelta(months=n)와 같이 말일을 넘으면 그 달 말일로 맞춘다
+    month = days.astype('datetime64[M]')
+    day = (days - month.astype('datetime64[D]')).astype(np.int64)
+    target = month + months
+    month_length = ((target + 1).astype('datetime64[D]') - target.astype('datetime64[D]')).astype(np.int64)
+    return target.astype('datetime64[D]') + np.minimum(day, month_length - 1)
+
+
+def months_elapsed(days, as_of):
+    # add_months(days, k) <= as_of 인 가장 큰 k (as_of가 days보다 앞이면 음수).
+    # k개월 뒤는 as_of와 같은 달이므로 (말일로 맞춘) 일자만 비교하면 된다
+    month = days.astype('datetime64[M]')
+    as_of_month = as_of.astype('datetime64[M]')
+    month_length = (as_of_month + 1).astype('datetime64[D]') - as_of_month.astype('datetime64[D]')
+    day = np.minimum(days - month.astype('datetime64[D]'), month_length - np.timedelta64(1, 'D'))
+    late_day = day > as_of - as_of_month.astype('datetime64[D]')
+    return (as_of_month - month).astype(np.int64) - late_day
+
+
+def due_amounts(start_day, payment_months, total_installment, contract_amount, as_of):
+    """계약별로 as_of(datetime64[D])까지 납기가 된 금액과 납기가 된 항목 수.
+
+    expand(include_contract_amount=True)와 같은 스케줄이다. 항목 p(0은 계약금)는
+    시작일 + max(p - 1, 0)개월에 납기가 된다. 시작일이 없는 계약은 0.
+    """
+    months = np.asarray(payment_months, dtype=np.int64)
+    total = np.asarray(total_installment, dtype=np.float64)
+    down = np.asarray(contract_amount, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        body = np.where(months > 0, (total - down) / np.maximum(months, 1), total - down)
+    counts = 1 + np.maximum(months, 1)
+    elapsed = months_elapsed(start_day, as_of)
+    due_count = np.where(np.isnat(start_day) | (elapsed < 0), 0, np.minimum(elapsed + 2, counts))
+    due = np.where(due_count > 0, down + body * np.maximum(due_count - 1, 0), 0.0)
+    return due, due_count
+
+
+def month_labels(indices):
+    # 월 인덱스 배열 -> 'YYYY-MM' 문자열 목록
+    indices = np.asarray(indices, dtype=np.int64)
+    return np.datetime_as_string(indices.astype('datetime64[M]'), unit='M').tolist()
+
+
+def expand(start, payment_months, total_installment, contract_amount, include_contract_amount=True, window=None):
+    """계약별 입력 배열을 (계약 행, 월 인덱스, 금액) 배열로 펼친다.
+
+    include_contract_amount=True 이면 계약금을 시작 월에 넣고 나머지를
+    할부 개월 수로 나눈다(할부기간 0이면 일시불). False 이면 대시보드처럼
+    total_installment 전체를 할부 개월 수로 나누고 할부기간 0인 계약은 건너뛴다.
+    각 계약의 항목은 기존 루프와 같은 순서로 배치되므로 합계도 같다.
+    window=(첫 월, 마지막 월)이면 그 안에 드는 항목만 만든다 (순서는 그대로).
+    """
+    start = np.asarray(start, dtype=np.int64)
+    months = np.asarray(payment_months, dtype=np.int64)
+    total = np.asarray(total_installment, dtype=np.float64)
+    down = np.asarray(contract_amount, dtype=np.float64)
+    installment_months = np.clip(months, 0, None)
+
+    if include_contract_amount:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            body = np.where(months > 0, (total - down) / np.maximum(months, 1), total - down)
+        counts = 1 + np.maximum(installment_months, 1)
+    else:
+        body = total / np.maximum(months, 1)
+        counts = installment_months
+
+    # 계약마다 펼칠 항목 위치 [first, first + counts)
+    first = np.zeros(len(start), dtype=np.int64)
+    if window is not None:
+        # 항목 위치 p의 월은 include_contract_amount면 start + max(p - 1, 0), 아니면 start + p
+        lead = 1 if include_contract_amount else 0
+        window_first, window_last = window
+        first = np.where(start >= window_first, 0, window_first - start + lead)
+        last = np.where(start > window_last, -1, np.minimum(counts - 1, window_last - start + lead))
+        counts = np.maximum(last - first + 1, 0)
+
+    rows = np.repeat(np.arange(len(start), dtype=np.int64), counts)
+    offsets = np.cumsum(counts) - counts
+    position = np.arange(rows.size, dtype=np.int64) - np.repeat(offsets - first, counts)
+
+    if include_contract_amount:
+        month = start[rows] + np.maximum(position - 1, 0)
+        amount = np.where(position == 0, down[rows], body[rows])
+    else:
+        month = start[rows] + position
+        amount = body[rows]
+
+    return rows, month, amount
+
+
+def _columns(contracts):
+    start = month_index([contract['start_date'] for contract in contracts])
+    payment_months = [contract['payment_months'] or 0 for contract in contracts]
+    total_installment = [contract['total_installment'] or 0 for contract in contracts]
+    contract_amount = [contract['contract_amount'] or 0 for contract in contracts]
+    return start, payment_months, total_installment, contract_amount
+
+
+def _totals(month, amount):
+    if month.size == 0:
+        return {}
+    base = month.min()
+    sums = np.bincount(month - base, weights=amount)
+    present = np.flatnonzero(np.bincount(month - base))
+    return dict(zip(month_labels(present + base), sums[present].tolist()))
+
+
+def monthly_totals(contracts, include_contract_amount=True, start_month=None, end_month=None):
+    # 월별 합계 {'YYYY-MM': 금액} (월 오름차순). start_month/end_month가 있으면 그 기간만
+    if not contracts:
+        return {}
+    return column_totals(_columns(contracts), include_contract_amount, month_window(start_month, end_month))
+
+
+def contract_schedules(contracts):
+    # 월별 합계와 계약별 월 금액(defaultdict) 목록을 함께 반환
+    if not contracts:
+        return {}, []
+    return column_schedules(_columns(contracts))
+
+
+# 아래 둘은 이미 컬럼 배열(start, payment_months, total_installment, contract_amount)로
+# 가진 경우에 쓴다 (snapshot.py)
+
+def column_totals(columns, include_contract_amount=True, window=None):
+    _, month, amount = expand(*columns, include_contract_amount=include_contract_amount, window=window)
+    return _totals(month, amount)
+
+
+def column_schedules(columns):
+    count = len(columns[0])
+    if count == 0:
+        return {}, []
+    rows, month, amount = expand(*columns)
+    totals = _totals(month, amount)
+
+    base = month.min()
+    span = int(month.max() - base) + 1
+    cells, inverse = np.unique(rows * span + (month - base), return_inverse=True)
+    sums = np.bincount(inverse, weights=amount)
+    labels = month_labels(np.arange(span) + base)
+    cell_rows = cells // span
+    cell_labels = [labels[i] for i in (cells % span).tolist()]
+    bounds = np.searchsorted(cell_rows, np.arange(count + 1)).tolist()
+    sums = sums.tolist()
+
+    schedules = [
+        defaultdict(float, zip(cell_labels[bounds[i]:bounds[i + 1]], sums[bounds[i]:bounds[i + 1]]))
+        for i in range(count)
+    ]
+    return totals, schedules
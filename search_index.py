@@ -0,0 +1,250 @@
+import logging
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+# 자동완성 인덱스
+#
+# 계약의 상호/대표자/사업자번호를 메모리에 올려 두고 DB 왕복 없이 검색한다.
+# 한글은 자모 단위로 풀어서 색인하므로 입력 중인 글자('한비' -> '한빛')도 맞고,
+# 초성만 입력한 경우('ㅎㅂ')는 초성 문자열로 찾는다.
+# - 짧은 검색어: 정렬된 키 목록에서 접두사(단어 시작 포함)를 이진 탐색
+# - 3자모 이상: 트라이그램 색인으로 후보를 좁힌 뒤 부분 문자열 확인
+
+logger = logging.getLogger(__name__)
+
+CHOSEONG = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+JUNGSEONG = ('ㅏ', 'ㅐ', 'ㅑ', 'ㅒ', 'ㅓ', 'ㅔ', 'ㅕ', 'ㅖ', 'ㅗ', 'ㅗㅏ', 'ㅗㅐ', 'ㅗㅣ', 'ㅛ',
+             'ㅜ', 'ㅜㅓ', 'ㅜㅔ', 'ㅜㅣ', 'ㅠ', 'ㅡ', 'ㅡㅣ', 'ㅣ')
+JONGSEONG = ('', 'ㄱ', 'ㄲ', 'ㄱㅅ', 'ㄴ', 'ㄴㅈ', 'ㄴㅎ', 'ㄷ', 'ㄹ', 'ㄹㄱ', 'ㄹㅁ', 'ㄹㅂ', 'ㄹㅅ', 'ㄹㅌ',
+             'ㄹㅍ', 'ㄹㅎ', 'ㅁ', 'ㅂ', 'ㅂㅅ', 'ㅅ', 'ㅆ', 'ㅇ', 'ㅈ', 'ㅊ', 'ㅋ', 'ㅌ', 'ㅍ', 'ㅎ')
+
+# 겹자모(호환 자모)를 기본 자모로 푸는 표
+COMPOUND_JAMO = {
+    'ㄳ': 'ㄱㅅ', 'ㄵ': 'ㄴㅈ', 'ㄶ': 'ㄴㅎ', 'ㄺ': 'ㄹㄱ', 'ㄻ': 'ㄹㅁ', 'ㄼ': 'ㄹㅂ', 'ㄽ': 'ㄹㅅ',
+    'ㄾ': 'ㄹㅌ', 'ㄿ': 'ㄹㅍ', 'ㅀ': 'ㄹㅎ', 'ㅄ': 'ㅂㅅ', 'ㅘ': 'ㅗㅏ', 'ㅙ': 'ㅗㅐ', 'ㅚ': 'ㅗㅣ',
+    'ㅝ': 'ㅜㅓ', 'ㅞ': 'ㅜㅔ', 'ㅟ': 'ㅜㅣ', 'ㅢ': 'ㅡㅣ'
+}
+
+# 인덱스에 필요한 계약 컬럼
+INDEX_COLUMNS = ('id', 'title', 'business_number', 'representative')
+
+CONSONANTS = set(CHOSEONG) | {'ㄳ', 'ㄵ', 'ㄶ', 'ㄺ', 'ㄻ', 'ㄼ', 'ㄽ', 'ㄾ', 'ㄿ', 'ㅀ', 'ㅄ'}
+
+
+def normalize(text):
+    return unicodedata.normalize('NFC', str(text or '')).strip().lower()
+
+
+# 음절 -> 자모 / 초성 변환표 (str.translate로 한 번에 변환)
+DECOMPOSE_TABLE = {
+    0xAC00 + code: CHOSEONG[code // 588] + JUNGSEONG[(code % 588) // 28] + JONGSEONG[code % 28]
+    for code in range(11172)
+}
+DECOMPOSE_TABLE.update({ord(ch): jamo for ch, jamo in COMPOUND_JAMO.items()})
+CHOSEONG_TABLE = {0xAC00 + code: CHOSEONG[code // 588] for code in range(11172)}
+
+
+def decompose(text):
+    # '한빛' -> 'ㅎㅏㄴㅂㅣㅊ'
+    return text.translate(DECOMPOSE_TABLE)
+
+
+def choseong(text):
+    # '한빛' -> 'ㅎㅂ'
+    return text.translate(CHOSEONG_TABLE)
+
+
+def trigrams(key):
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+
+class ContractSearchIndex:
+    def __init__(self, refresh_interval=300):
+        self.refresh_interval = refresh_interval
+        self.loaded_at = None
+        self._lock = threading.RLock()
+        self._refreshing = False
+        self._clear()
+
+    def _clear(self):
+        self._entries = {}                    # 계약 id -> 응답 항목
+        self._keys = {}                       # 계약 id -> [(필드 순위, 키)]
+        self._prefix = []                     # 정렬된 (키, 필드 순위, 계약 id)
+        self._trigrams = defaultdict(set)     # 트라이그램 -> 계약 id 집합
+
+    def is_stale(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.refresh_interval
+
+    def load(self, contracts):
+        with self._lock:
+            self._clear()
+            for contract in contracts:
+                self._add(contract)
+            self._prefix.sort()
+            self.loaded_at = time.monotonic()
+
+    def refresh_in_background(self, fetch_contracts):
+        # 새 인덱스를 별도 스레드에서 만든 뒤 교체한다 (그동안은 기존 인덱스로 응답)
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                fresh = ContractSearchIndex(self.refresh_interval)
+                fresh.load(fetch_contracts())
+                with self._lock:
+                    self._entries = fresh._entries
+                    self._keys = fresh._keys
+                    self._prefix = fresh._prefix
+                    self._trigrams = fresh._trigrams
+                    self.loaded_at = fresh.loaded_at
+            except Exception:
+                logger.exception('자동완성 인덱스 갱신 실패')
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name='search-index-refresh', daemon=True).start()
+
+    def _contract_keys(self, contract):
+        title = normalize(contract['title'])
+        representative = normalize(contract['representative'])
+        business_number = normalize(contract['business_number']).replace('-', '')
+        # 필드 순위: 0 상호, 1 대표자, 2 사업자번호 (작을수록 먼저 보여줌)
+        keys = [(0, decompose(title)), (0, choseong(title).replace(' ', '')),
+                (1, decompose(representative)), (1, choseong(representative)),
+                (2, business_number)]
+        return [(rank, key) for rank, key in keys if key]
+
+    def _prefix_keys(self, key):
+        # 전체 키와 단어 시작 위치마다 접두사 검색용 키를 만든다
+        yield key
+        for i, ch in enumerate(key):
+            if ch == ' ' and key[i + 1:]:
+                yield key[i + 1:]
+
+    def _add(self, contract, keep_sorted=False):
+        id = contract['id']
+        keys = self._contract_keys(contract)
+        self._entries[id] = {
+            'value': contract['title'],
+            'business_number': contract['business_number'],
+            'representative': contract['representative']
+        }
+        self._keys[id] = keys
+        trigram_index = self._trigrams
+        for rank, key in keys:
+            for prefix_key in self._prefix_keys(key):
+                if keep_sorted:
+                    insort(self._prefix, (prefix_key, rank, id))
+                else:
+                    self._prefix.append((prefix_key, rank, id))
+            for i in range(len(key) - 2):
+                trigram_index[key[i:i + 3]].add(id)
+
+    def _remove(self, id):
+        keys = self._keys.pop(id, None)
+        self._entries.pop(id, None)
+        if keys is None:
+            return
+        for rank, key in keys:
+            for prefix_key in self._prefix_keys(key):
+                i = bisect_left(self._prefix, (prefix_key, rank, id))
+                if i < len(self._prefix) and self._prefix[i] == (prefix_key, rank, id):
+                    del self._prefix[i]
+            for gram in trigrams(key):
+                ids = self._trigrams.get(gram)
+                if ids is not None:
+                    ids.discard(id)
+                    if not ids:
+                        del self._trigrams[gram]
+
+    def upsert(self, contract):
+        # 계약 추가/수정 시 호출
+        if not contract:
+            return
+        with self._lock:
+            self._remove(contract['id'])
+            self._add(contract, keep_sorted=True)
+
+    def remove(self, id):
+        with self._lock:
+            self._remove(id)
+
+    def _queries(self, term):
+        term = normalize(term)
+        queries = {decompose(term)}
+        if all(ch in CONSONANTS or ch == ' ' for ch in term):
+            queries.add(term.replace(' ', ''))
+        if term.replace('-', '').isdigit():
+            queries.add(term.replace('-', ''))
+        return [query for query in queries if query]
+
+    def _rank(self, id, queries):
+        # (매치 종류, 필드 순위, 상호 길이, 상호). 매치 종류: 0 일치, 1 접두사, 2 단어 시작, 3 부분 문자열
+        best = None
+        for field_rank, key in self._keys[id]:
+            for query in queries:
+                if key == query:
+                    match = 0
+                elif key.startswith(query):
+                    match = 1
+                elif ' ' + query in key:
+                    match = 2
+                elif query in key:
+                    match = 3
+                else:
+                    continue
+                if best is None or (match, field_rank) < best:
+                    best = (match, field_rank)
+        if best is None:
+            return None
+        title = self._entries[id]['value'] or ''
+        return best + (len(title), title)
+
+    def search(self, term, limit=10):
+        queries = self._queries(term)
+        if not queries:
+            return []
+
+        with self._lock:
+            ranks = {}
+
+            # 1. 접두사/단어 시작 매치
+            for query in queries:
+                i = bisect_left(self._prefix, (query,))
+                while i < len(self._prefix) and self._prefix[i][0].startswith(query) and len(ranks) < limit * 20:
+                    id = self._prefix[i][2]
+                    if id not in ranks:
+                        ranks[id] = self._rank(id, queries)
+                    i += 1
+
+            # 2. 모자라면 트라이그램으로 부분 문자열 매치
+            if len(ranks) < limit:
+                for query in queries:
+                    postings = sorted((self._trigrams.get(gram, set()) for gram in trigrams(query)), key=len)
+                    if not postings:
+                        continue
+                    for id in set.intersection(*postings):
+                        if len(ranks) >= limit * 20:
+                            break
+                        if id not in ranks:
+                            rank = self._rank(id, queries)
+                            if rank is not None:
+                                ranks[id] = rank
+
+            results = []
+            seen = set()
+            for id in sorted(ranks, key=ranks.get):
+                entry = self._entries[id]
+                identity = (entry['value'], entry['business_number'], entry['representative'])
+                if identity not in seen:
+                    seen.add(identity)
+                    results.append(entry)
+                    if len(results) == limit:
+                        break
+            return results
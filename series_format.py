@@ -0,0 +1,100 @@
+import json
+import struct
+from importlib.util import find_spec
+import numpy as np
+
+# 월별 시리즈 API 응답 형식
+#
+# /api/monthly_income, /api/monthly_revenue, /api/monthly_series는 월 라벨과 float64 시리즈
+# 배열을 Accept 헤더에 맞춰 다음 형식 중 하나로 보낸다.
+#
+#   application/json (기본값)
+#       jsonify와 같은 JSON. orjson이 설치되어 있으면 NumPy 배열을 파이썬 리스트로 바꾸지 않고
+#       바로 직렬화한다 (출력 바이트는 같음).
+#   application/x-float64-columns
+#       [헤더 길이 uint32 LE][JSON 헤더 {'labels', 'series'}][시리즈마다 float64 LE 배열].
+#       헤더는 공백으로 채워 배열이 8바이트 경계에서 시작하고, 배열은 헤더의 series 순서로
+#       이어 붙인다. 클라이언트는 np.frombuffer(body, '<f8', offset=4 + 헤더 길이)로 읽는다.
+#   application/vnd.apache.arrow.stream
+#       pyarrow가 설치되어 있을 때만. month 문자열 컬럼과 시리즈별 float64 컬럼의 Arrow IPC 스트림.
+
+JSON_MIMETYPE = 'application/json'
+FLOAT64_MIMETYPE = 'application/x-float64-columns'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+
+def formats():
+    # 보낼 수 있는 형식 (선호 순서). 선택 패키지는 임포트하지 않고 설치 여부만 본다
+    available = [JSON_MIMETYPE, FLOAT64_MIMETYPE]
+    if find_spec('pyarrow') is not None:
+        available.append(ARROW_MIMETYPE)
+    return available
+
+
+def negotiate(accept):
+    # werkzeug MIMEAccept -> 보낼 형식. Accept가 없으면 JSON, 맞는 형식이 없으면 None (406)
+    if not accept:
+        return JSON_MIMETYPE
+    return accept.best_match(formats())
+
+
+def _orjson():
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def encode_json(payload):
+    # jsonify(payload)와 같은 바이트 (키 정렬, 공백 없음, 끝에 줄바꿈). payload 안의 NumPy 배열도 받는다
+    orjson = _orjson()
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(payload, default=_tolist, separators=(',', ':'), sort_keys=True) + '\n').encode('utf-8')
+
+
+def _tolist(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f'{type(value).__name__}은(는) JSON으로 직렬화할 수 없습니다')
+
+
+def encode_float64(labels, series):
+    header = json.dumps({'labels': labels, 'series': list(series)}, separators=(',', ':')).encode('utf-8')
+    header += b' ' * (-(len(header) + 4) % 8)
+    parts = [struct.pack('<I', len(header)), header]
+    parts.extend(np.ascontiguousarray(values, dtype='<f8').tobytes() for values in series.values())
+    return b''.join(parts)
+
+
+def decode_float64(body):
+    # encode_float64의 역 -> (labels, {이름: float64 배열}). 클라이언트/벤치마크 확인용
+    length, = struct.unpack_from('<I', body)
+    header = json.loads(body[4:4 + length])
+    values = np.frombuffer(body, '<f8', offset=4 + length).reshape(len(header['series']), len(header['labels']))
+    return header['labels'], dict(zip(header['series'], values))
+
+
+def encode_arrow(labels, series):
+    import pyarrow as pa
+    table = pa.table({'month': pa.array(labels, pa.string()),
+                      **{name: pa.array(values, pa.float64()) for name, values in series.items()}})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(mimetype, labels, series, single=False):
+    """월 라벨 목록과 {이름: float64 배열}을 mimetype 형식의 바이트로 만든다.
+
+    single이면 JSON은 기존 응답 모양 {'labels', 'data'}(첫 시리즈)로, 아니면 {'labels', 'series'}로 보낸다.
+    """
+    if mimetype == FLOAT64_MIMETYPE:
+        return encode_float64(labels, series)
+    if mimetype == ARROW_MIMETYPE:
+        return encode_arrow(labels, series)
+    if single:
+        return encode_json({'labels': labels, 'data': next(iter(series.values()))})
+    return encode_json({'labels': labels, 'series': series})
@@ -0,0 +1,248 @@
+import json
+import logging
+import mmap
+import os
+import tempfile
+import time
+import numpy as np
+import ledger
+from snapshot import AnalyticsSnapshot, status_rows
+
+# 워커 프로세스 간 공유 집계
+#
+# prefork 배포(gunicorn.conf.py)에서는 갱신 프로세스 하나만 월별 시리즈와 계약 상태 표를
+# 계산해 SHARED_AGGREGATES_DIR/aggregates.bin 한 파일(헤더 + 정렬된 NumPy 배열)로 쓴다.
+# 임시 파일에 다 쓴 뒤 os.replace로 바꿔 끼우므로 워커는 항상 완성된 버전만 본다.
+# 워커는 파일을 mmap으로 열어 배열을 복사 없이 읽으므로 페이지는 모든 워커가 공유한다
+# (/dev/shm 같은 tmpfs에 두면 디스크를 거치지 않는다). 교체된 파일은 이전 버전을
+# 읽고 있는 요청이 끝나 매핑이 해제될 때 사라진다.
+#
+# 워커에서 쓰기가 일어나면 dirty 파일의 시각을 갱신하고, 갱신 프로세스는 이를 보고
+# poll 간격 안에 새 버전을 게시한다. 변경이 없어도 interval마다 다시 계산한다.
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'AGGS0001'
+ALIGNMENT = 64
+BUNDLE_NAME = 'aggregates.bin'
+DIRTY_NAME = 'dirty'
+
+STATUS_COLUMNS = ('title', 'business', 'representative', 'end_date', 'total_amount',
+                  'paid_amount', 'payment_count', 'last_payment_date', 'active')
+
+
+def _aligned(size):
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+def write_bundle(directory, arrays, meta):
+    # arrays({이름: ndarray})와 meta(dict)를 한 파일로 써서 원자적으로 게시한다
+    arrays = {name: np.ascontiguousarray(values) for name, values in arrays.items()}
+    layout = {}
+    offset = 0
+    for name, values in arrays.items():
+        layout[name] = {'dtype': values.dtype.str, 'shape': values.shape, 'offset': offset}
+        offset += _aligned(values.nbytes)
+    header = json.dumps({'meta': meta, 'arrays': layout}).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.aggregates-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC + len(header).to_bytes(8, 'little') + header)
+            for name, values in arrays.items():
+                f.seek(data_start + layout[name]['offset'])
+                f.write(values.tobytes())
+            f.truncate(data_start + offset)
+        os.replace(temp_path, os.path.join(directory, BUNDLE_NAME))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+class Bundle:
+    # 게시된 파일 하나를 mmap으로 연 읽기 전용 배열 묶음
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.file_id = _file_id(os.fstat(f.fileno()))
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'공유 집계 파일 형식이 아닙니다: {path}')
+        header_size = int.from_bytes(self._map[len(MAGIC):len(MAGIC) + 8], 'little')
+        header_start = len(MAGIC) + 8
+        header = json.loads(self._map[header_start:header_start + header_size])
+        data_start = _aligned(header_start + header_size)
+
+        self.meta = header['meta']
+        self.arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            shape = tuple(spec['shape'])
+            count = int(np.prod(shape))
+            if count == 0:
+                values = np.empty(shape, dtype=dtype)
+            else:
+                values = np.frombuffer(self._map, dtype, count, data_start + spec['offset']).reshape(shape)
+            self.arrays[name] = values
+        self._blob_start = data_start + header['arrays']['strings.blob']['offset']
+
+    @property
+    def version(self):
+        return self.meta['version']
+
+    # 문자열 (상호, 사업자번호, 대표자)
+
+    def decode(self, codes):
+        # 필요한 문자열만 매핑에서 바로 잘라 디코딩한다 (워커별 문자열 사본을 만들지 않음)
+        offsets = self.arrays['strings.offsets']
+        base = self._blob_start
+        data = self._map
+        return [None if is_null else data[base + start:base + end].decode('utf-8') for start, end, is_null in zip(
+            offsets[codes].tolist(), offsets[codes + 1].tolist(), self.arrays['strings.null'][codes].tolist())]
+
+    # 월별 시리즈
+
+    def series(self, name, start_month=None, end_month=None):
+        # read_ledger와 같은 결과 {'YYYY-MM': 금액}
+        months = self.arrays[f'{name}.month']
+        amounts = self.arrays[f'{name}.amount']
+        start, stop = 0, len(months)
+        if start_month and end_month:
+            start = np.searchsorted(months, start_month.encode('utf-8'), 'left')
+            stop = max(np.searchsorted(months, end_month.encode('utf-8'), 'right'), start)
+        return dict(zip((month.decode('utf-8') for month in months[start:stop].tolist()), amounts[start:stop].tolist()))
+
+    # 계약 상태 표
+
+    def status_columns(self):
+        return {name: self.arrays[f'status.{name}'] for name in STATUS_COLUMNS}
+
+    def contract_status_count(self):
+        return len(self.arrays['status.title'])
+
+    def contract_status_batches(self, batch_size=1000):
+        # 한 배치씩 dict로 만들어 워커가 표 전체 사본을 들고 있지 않게 한다
+        columns = self.status_columns()
+        for start in range(0, self.contract_status_count(), batch_size):
+            yield list(status_rows(columns, self.decode, start, start + batch_size))
+
+    def contract_status(self, batch_size=1000):
+        for batch in self.contract_status_batches(batch_size):
+            yield from batch
+
+
+def _file_id(stat):
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class SharedAggregates:
+    # 워커 쪽: 게시된 최신 버전을 열어 두고, 파일이 바뀌면 다시 연다
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, BUNDLE_NAME)
+        self.dirty_path = os.path.join(directory, DIRTY_NAME)
+        self._bundle = None
+
+    def current(self):
+        # 아직 게시된 버전이 없으면 None
+        try:
+            file_id = _file_id(os.stat(self.path))
+        except FileNotFoundError:
+            return None
+        bundle = self._bundle
+        if bundle is None or bundle.file_id != file_id:
+            try:
+                bundle = self._bundle = Bundle(self.path)
+            except (OSError, ValueError):
+                logger.exception('공유 집계를 열 수 없습니다: %s', self.path)
+                return bundle
+        return bundle
+
+    def mark_dirty(self):
+        # 갱신 프로세스에 다시 계산을 요청한다
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.dirty_path, 'a'):
+                os.utime(self.dirty_path)
+        except OSError:
+            logger.exception('공유 집계 갱신 요청 실패: %s', self.dirty_path)
+
+
+def encode_strings(values):
+    # 문자열 목록 -> (끝 위치 배열, UTF-8 바이트, None 여부)
+    encoded = [(value or '').encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    null = np.array([value is None for value in values], dtype=bool)
+    return offsets, blob, null
+
+
+def build_aggregates(repository, snapshot, current_date=None):
+    # 원장과 스냅샷을 새로 읽어 게시할 배열과 메타데이터를 만든다
+    started = time.perf_counter()
+    snapshot.load(repository)
+    arrays = {}
+    for name in ledger.SERIES:
+        data = repository.read_ledger(name)
+        arrays[f'{name}.month'] = np.array([month.encode('utf-8') for month in data], dtype=bytes)
+        arrays[f'{name}.amount'] = np.fromiter(data.values(), dtype=np.float64, count=len(data))
+    for name, values in snapshot.status_columns(current_date).items():
+        arrays[f'status.{name}'] = values
+    # 코드는 추가만 되므로 적재 뒤의 사전 전체를 함께 쓴다
+    offsets, blob, null = encode_strings(list(snapshot.strings.values))
+    arrays['strings.offsets'] = offsets
+    arrays['strings.blob'] = blob
+    arrays['strings.null'] = null
+    meta = {
+        'built_at': time.time(),
+        'build_seconds': time.perf_counter() - started,
+        'contracts': len(snapshot.contracts),
+        'payment_records': len(snapshot.payments)
+    }
+    return arrays, meta
+
+
+def publish(repository, directory, snapshot=None):
+    # 한 번 계산해 다음 버전으로 게시하고 메타데이터를 돌려준다
+    snapshot = snapshot or AnalyticsSnapshot()
+    current = SharedAggregates(directory).current()
+    arrays, meta = build_aggregates(repository, snapshot)
+    meta['version'] = (current.version if current is not None else 0) + 1
+    write_bundle(directory, arrays, meta)
+    logger.info('공유 집계 %d 게시 (계약 %d건, 입금 기록 %d건, %.2f초)',
+                meta['version'], meta['contracts'], meta['payment_records'], meta['build_seconds'])
+    return meta
+
+
+def run_refresher(repository, directory, interval=60, poll=1.0, stop=None):
+    """공유 집계를 계산해 게시하는 루프. 배포 전체에서 프로세스 하나만 실행한다.
+
+    stop은 threading.Event/multiprocessing.Event (없으면 종료할 때까지 실행).
+    """
+    dirty_path = os.path.join(directory, DIRTY_NAME)
+    snapshot = AnalyticsSnapshot()
+    ledger.ensure(repository)
+    published_at = 0.0
+
+    while stop is None or not stop.is_set():
+        try:
+            dirty_at = os.stat(dirty_path).st_mtime
+        except FileNotFoundError:
+            dirty_at = 0.0
+        if time.time() - published_at >= interval or dirty_at >= published_at:
+            # 계산 중에 들어온 쓰기는 다음 차례에 반영되도록 시작 시각을 기준으로 삼는다
+            started = time.time()
+            try:
+                publish(repository, directory, snapshot)
+            except Exception:
+                logger.exception('공유 집계 계산 실패')
+            published_at = started
+        if stop is None:
+            time.sleep(poll)
+        else:
+            stop.wait(poll)
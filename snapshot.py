@@ -0,0 +1,346 @@
+import logging
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from schedule import add_months, column_totals, column_schedules, month_window
+import aging
+
+# 분석용 컬럼 스냅샷
+#
+# 계약/입금 기록을 dict 목록 대신 NumPy 컬럼 배열로 프로세스에 한 벌만 들고 있고,
+# 월별 합계/계약 상태/계약별 스케줄/미수금 연령 분석을 벡터 연산으로 계산한다.
+# 문자열(상호, 사업자번호, 대표자)은 사전 인코딩해 정수 코드로 저장한다.
+# 배열은 읽기 전용이며, 바뀔 때는 새 배열을 만들어 통째로 교체하므로 요청 스레드는
+# 잠금 없이 읽는다. 이 프로세스의 쓰기는 apply()로 바로 반영하고, 다른 워커의 변경은
+# refresh_interval마다 백그라운드에서 다시 적재해 반영한다.
+
+logger = logging.getLogger(__name__)
+
+CONTRACT_COLUMNS = ('id', 'title', 'business_number', 'representative', 'start_date',
+                    'payment_months', 'total_installment', 'contract_amount', 'total_with_tax')
+PAYMENT_COLUMNS = ('id', 'business_number', 'payment_date', 'payment_amount')
+
+SNAPSHOT_COLUMNS = {
+    'contracts': CONTRACT_COLUMNS,
+    'payment_records': PAYMENT_COLUMNS
+}
+
+
+class StringDictionary:
+    # 문자열 <-> 정수 코드. 코드는 추가만 되므로 이전 스냅샷의 코드도 계속 유효하다
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+        self._lock = threading.Lock()
+
+    def encode(self, values):
+        codes = np.empty(len(values), dtype=np.int32)
+        with self._lock:
+            lookup = self._codes
+            for i, value in enumerate(values):
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(self.values)
+                    self.values.append(value)
+                codes[i] = code
+        return codes
+
+    def decode(self, codes):
+        values = self.values
+        return [values[code] for code in codes.tolist()]
+
+
+class Frame:
+    # 같은 길이의 읽기 전용 컬럼 묶음
+
+    def __init__(self, **columns):
+        self.columns = tuple(columns)
+        for name, values in columns.items():
+            values.flags.writeable = False
+            setattr(self, name, values)
+
+    def __len__(self):
+        return len(self.id)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.columns)
+
+    def take(self, index):
+        return Frame(**{name: getattr(self, name)[index] for name in self.columns})
+
+    @staticmethod
+    def concat(frames):
+        first = frames[0]
+        return Frame(**{name: np.concatenate([getattr(frame, name) for frame in frames]) for name in first.columns})
+
+
+def _dates(rows, name):
+    # 'YYYY-MM-DD...' -> datetime64[D] (값이 없으면 NaT)
+    return np.array([(row[name] or 'NaT')[:10] for row in rows], dtype='datetime64[D]')
+
+
+def _numbers(rows, name, dtype):
+    return np.fromiter((row[name] or 0 for row in rows), dtype=dtype, count=len(rows))
+
+
+def _date_strings(days):
+    return [None if value == 'NaT' else value for value in np.datetime_as_string(days, unit='D').tolist()]
+
+
+class AnalyticsSnapshot:
+    def __init__(self, refresh_interval=300):
+        self.refresh_interval = refresh_interval
+        self.loaded_at = None
+        self.version = 0
+        # 적재할 때 본 공유 테이블 버전 (집계 캐시의 버전, ensure_loaded 참고)
+        self.table_versions = None
+        self.strings = StringDictionary()
+        self._frames = (self._frame('contracts', []), self._frame('payment_records', []))
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._refreshing = False
+        self._start_index = None
+
+    @property
+    def contracts(self):
+        return self._frames[0]
+
+    @property
+    def payments(self):
+        return self._frames[1]
+
+    def _frame(self, table, rows):
+        if table == 'contracts':
+            start = _dates(rows, 'start_date')
+            return Frame(
+                id=_numbers(rows, 'id', np.int64),
+                title=self.strings.encode([row['title'] for row in rows]),
+                business=self.strings.encode([row['business_number'] for row in rows]),
+                representative=self.strings.encode([row['representative'] for row in rows]),
+                start_day=start,
+                start_month=start.astype('datetime64[M]').astype(np.int64),
+                payment_months=_numbers(rows, 'payment_months', np.int64),
+                total_installment=_numbers(rows, 'total_installment', np.float64),
+                contract_amount=_numbers(rows, 'contract_amount', np.float64),
+                total_with_tax=_numbers(rows, 'total_with_tax', np.float64)
+            )
+        day = _dates(rows, 'payment_date')
+        return Frame(
+            id=_numbers(rows, 'id', np.int64),
+            business=self.strings.encode([row['business_number'] for row in rows]),
+            day=day,
+            month=day.astype('datetime64[M]').astype(np.int64),
+            amount=_numbers(rows, 'payment_amount', np.float64)
+        )
+
+    def _load_table(self, repository, table, batch_size):
+        frames = [self._frame(table, batch) for batch in repository.iter_batches(table, batch_size, SNAPSHOT_COLUMNS[table])]
+        return Frame.concat(frames) if frames else self._frame(table, [])
+
+    # 적재/갱신
+
+    def is_stale(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.refresh_interval
+
+    def load(self, repository, batch_size=5000):
+        # 계약과 입금 기록을 동시에 읽어 배열로 만든다
+        frames = repository.gather(
+            lambda: self._load_table(repository, 'contracts', batch_size),
+            lambda: self._load_table(repository, 'payment_records', batch_size)
+        )
+        with self._lock:
+            self._frames = tuple(frames)
+            self.version += 1
+            self.loaded_at = time.monotonic()
+
+    def _behind(self, table_versions):
+        return self.loaded_at is None or (table_versions is not None and table_versions != self.table_versions)
+
+    def ensure_loaded(self, repository, table_versions=None):
+        """처음이거나 다른 프로세스의 쓰기로 테이블 버전이 바뀌었으면 적재가 끝날 때까지 기다린다.
+
+        그렇지 않고 오래되기만 했으면(SNAPSHOT_REFRESH) 백그라운드에서 갱신한다.
+        버전은 적재 전에 읽은 값을 기록하므로 적재 중에 들어온 쓰기는 다음 호출에서 다시 적재된다.
+        """
+        if self._behind(table_versions):
+            with self._load_lock:
+                if self._behind(table_versions):
+                    self.load(repository)
+                    self.table_versions = table_versions
+        elif self.is_stale():
+            self.refresh_in_background(repository)
+
+    def refresh_in_background(self, repository):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.load(repository)
+            except Exception:
+                logger.exception('분석 스냅샷 갱신 실패')
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name='snapshot-refresh', daemon=True).start()
+
+    def apply(self, table, rows=(), removed_ids=()):
+        # 추가/수정된 행(rows)과 삭제된 id를 반영한 새 배열로 교체한다
+        rows = [row for row in rows if row]
+        ids = [row['id'] for row in rows] + [id for id in removed_ids if id is not None]
+        if not ids:
+            return
+        position = 0 if table == 'contracts' else 1
+        with self._lock:
+            frame = self._frames[position]
+            frame = frame.take(~np.isin(frame.id, ids))
+            if rows:
+                frame = Frame.concat([frame, self._frame(table, rows)])
+                if np.any(frame.id[1:] < frame.id[:-1]):
+                    frame = frame.take(np.argsort(frame.id, kind='stable'))
+            frames = list(self._frames)
+            frames[position] = frame
+            self._frames = tuple(frames)
+            self.version += 1
+
+    def stats(self):
+        contracts, payments = self._frames
+        return {
+            'version': self.version,
+            'contracts': len(contracts),
+            'payment_records': len(payments),
+            'strings': len(self.strings.values),
+            'array_bytes': contracts.nbytes + payments.nbytes
+        }
+
+    # 계산
+
+    def _schedule_columns(self, contracts):
+        return contracts.start_month, contracts.payment_months, contracts.total_installment, contracts.contract_amount
+
+    def _overlapping(self, contracts, window):
+        # 시작 월 순 정렬 인덱스로 기간과 겹칠 수 있는 계약만 고른다 (행 순서는 원래대로)
+        index = self._start_index
+        if index is None or index[0] is not contracts:
+            order = np.argsort(contracts.start_month, kind='stable')
+            longest = int(np.maximum(contracts.payment_months, 1).max())
+            index = self._start_index = (contracts, order, contracts.start_month[order], longest)
+        _, order, starts, longest = index
+        # 계약 항목은 시작 월부터 최대 longest개월에 걸치므로 그 이전에 시작한 계약은 볼 필요가 없다
+        lo = np.searchsorted(starts, window[0] - longest + 1, 'left')
+        hi = np.searchsorted(starts, window[1], 'right')
+        return np.sort(order[lo:hi])
+
+    def monthly_totals(self, include_contract_amount=True, start_month=None, end_month=None):
+        # schedule.monthly_totals와 같은 결과 {'YYYY-MM': 금액}. 기간이 있으면 그 기간과 겹치는 계약만 펼친다
+        contracts = self.contracts
+        if len(contracts) == 0:
+            return {}
+        columns = self._schedule_columns(contracts)
+        window = month_window(start_month, end_month)
+        if window is not None:
+            selected = self._overlapping(contracts, window)
+            columns = tuple(values[selected] for values in columns)
+        return column_totals(columns, include_contract_amount, window)
+
+    def contract_schedules(self, batch_size=1000):
+        # {'id', 'title', 'representative', 'monthly'} 행 생성기 - 월별 할부금 화면용.
+        # batch_size개 계약씩 펼치므로 계약 × 월 표 전체를 한꺼번에 들고 있지 않는다
+        contracts = self.contracts
+        columns = self._schedule_columns(contracts)
+        return self._schedule_rows(contracts, columns, batch_size)
+
+    def _schedule_rows(self, contracts, columns, batch_size):
+        for start in range(0, len(contracts), batch_size):
+            part = slice(start, start + batch_size)
+            _, schedules = column_schedules(tuple(values[part] for values in columns))
+            for id, title, representative, monthly in zip(
+                    contracts.id[part].tolist(), self.strings.decode(contracts.title[part]),
+                    self.strings.decode(contracts.representative[part]), schedules):
+                yield {
+                    'id': id,
+                    'title': title,
+                    'representative': representative,
+                    'monthly': monthly
+                }
+
+    def payment_totals(self, payments=None):
+        # 사업자번호 코드별 (입금 합계, 건수, 마지막 입금일) 배열
+        payments = self.payments if payments is None else payments
+        size = len(self.strings.values)
+        paid = np.bincount(payments.business, weights=payments.amount, minlength=size)
+        count = np.bincount(payments.business, minlength=size)
+        last = np.full(size, np.datetime64('NaT'), dtype='datetime64[D]')
+        if len(payments):
+            # 사업자번호, 날짜 순으로 정렬해 그룹마다 마지막 값을 고른다 (NaT는 가장 앞)
+            order = np.lexsort((payments.day.view(np.int64), payments.business))
+            business = payments.business[order]
+            ends = np.flatnonzero(np.r_[business[1:] != business[:-1], True])
+            last[business[ends]] = payments.day[order][ends]
+        return paid, count, last
+
+    def status_columns(self, current_date=None):
+        # 계약 상태 표를 컬럼 배열로 계산한다 (문자열은 self.strings 코드)
+        if current_date is None:
+            current_date = datetime.now().date()
+        contracts, payments = self._frames
+        paid, count, last = self.payment_totals(payments)
+
+        business = contracts.business
+        end = add_months(contracts.start_day, contracts.payment_months)
+        return {
+            'title': contracts.title,
+            'business': business,
+            'representative': contracts.representative,
+            'end_date': end,
+            'total_amount': contracts.total_with_tax,
+            'paid_amount': paid[business],
+            'payment_count': count[business],
+            'last_payment_date': last[business],
+            'active': np.datetime64(current_date, 'D') <= end
+        }
+
+    def aging_columns(self, as_of=None):
+        # 기준일의 미수금 연령 분석 컬럼 (aging.py, 문자열은 self.strings 코드)
+        if as_of is None:
+            as_of = datetime.now().date()
+        contracts, payments = self._frames
+        return aging.aging_columns(contracts, payments, as_of, len(self.strings.values))
+
+    def monthly_arrears(self):
+        # 월말 기준 전체 연체액 (첫 월 인덱스, 월별 금액 배열)
+        contracts, payments = self._frames
+        return aging.monthly_arrears(contracts, payments)
+
+    def contract_status(self, current_date=None):
+        # 계약 상태 화면/내보내기 행 목록 (계약마다 상호, 사업자번호, 대표자, 종료일, 금액/입금 합계, 진행 상태)
+        return list(status_rows(self.status_columns(current_date), self.strings.decode))
+
+
+def status_rows(columns, decode, start=0, stop=None):
+    # status_columns()의 [start:stop] 구간을 계약 상태 화면/내보내기용 dict로 만든다
+    columns = {name: values[start:stop] for name, values in columns.items()}
+    paid = columns['paid_amount']
+    remaining = columns['total_amount'] - paid
+    for title, business_number, representative, end_date, total, paid_amount, payment_count, remaining_amount, last_date, is_active in zip(
+            decode(columns['title']), decode(columns['business']), decode(columns['representative']),
+            np.datetime_as_string(columns['end_date'], unit='D').tolist(), columns['total_amount'].tolist(),
+            paid.tolist(), columns['payment_count'].tolist(), remaining.tolist(),
+            _date_strings(columns['last_payment_date']), columns['active'].tolist()):
+        yield {
+            'title': title,
+            'business_number': business_number,
+            'representative': representative,
+            'end_date': end_date,
+            'total_amount': total,
+            'paid_amount': paid_amount if payment_count else 0,
+            'remaining_amount': remaining_amount if remaining_amount > 0 else 0,
+            'payment_count': payment_count,
+            'last_payment_date': last_date,
+            'contract_status': '진행중' if is_active else '만료'
+        }
@@ -0,0 +1,163 @@
+-- 월별 집계 함수 (Supabase SQL Editor에서 실행)
+-- aggregates.py 가 supabase.rpc('monthly_revenue' / 'monthly_income') 로 호출한다.
+-- 결과 행 수는 데이터 행 수가 아니라 개월 수만큼이다.
+
+create index if not exists payment_records_payment_date_idx on payment_records (payment_date);
+create index if not exists contracts_start_date_idx on contracts (start_date);
+
+-- 월별 수익: 입금일 기준 월별 입금액 합계
+create or replace function monthly_revenue(start_month text default null, end_month text default null)
+returns table (month text, amount double precision)
+language sql stable
+as $$
+    select to_char(p.payment_date::date, 'YYYY-MM'), sum(p.payment_amount)::float8
+    from payment_records p
+    where (monthly_revenue.start_month is null
+           or p.payment_date::date >= to_date(monthly_revenue.start_month, 'YYYY-MM'))
+      and (monthly_revenue.end_month is null
+           or p.payment_date::date < to_date(monthly_revenue.end_month, 'YYYY-MM') + interval '1 month')
+    group by 1
+    order by 1
+$$;
+
+-- 월별 할부금
+-- include_contract_amount = true : 계약금은 시작 월, 나머지는 할부 개월 수로 분배 (할부기간 0이면 일시불)
+-- include_contract_amount = false: total_installment 전체를 할부 개월 수로 분배 (대시보드)
+-- 기간이 있으면 기간과 겹치는 계약만 골라 겹치는 회차만 펼친다 (계산량이 기간 길이에 비례)
+create or replace function monthly_income(
+    start_month text default null,
+    end_month text default null,
+    include_contract_amount boolean default true
+)
+returns table (month text, amount double precision)
+language sql stable
+as $$
+    with bounds (first_index, last_index) as (
+        -- 'YYYY-MM' -> 월 번호 (기간이 없으면 null)
+        select (extract(year from f) * 12 + extract(month from f))::int,
+               (extract(year from l) * 12 + extract(month from l))::int
+        from (select to_date(monthly_income.start_month, 'YYYY-MM') as f,
+                     to_date(monthly_income.end_month, 'YYYY-MM') as l) m
+    ),
+    overlapping as (
+        -- 끝 월 이전에 시작했고 (start_date 인덱스) 할부가 시작 월까지 이어지는 계약
+        select c.*, b.first_index - s.start_index as first_offset, b.last_index - s.start_index as last_offset
+        from contracts c
+        cross join bounds b
+        cross join lateral (select (extract(year from c.start_date::date) * 12
+                                    + extract(month from c.start_date::date))::int as start_index) s
+        where (monthly_income.end_month is null
+               or c.start_date::date < to_date(monthly_income.end_month, 'YYYY-MM') + interval '1 month')
+          and (b.first_index is null or s.start_index + greatest(c.payment_months, 1) > b.first_index)
+    ),
+    entries (bucket, value) as (
+        select date_trunc('month', c.start_date::date), c.contract_amount::float8
+        from overlapping c
+        where monthly_income.include_contract_amount
+        union all
+        select date_trunc('month', c.start_date::date) + make_interval(months => i),
+               case when monthly_income.include_contract_amount
+                    then (c.total_installment - c.contract_amount)::float8 / c.payment_months
+                    else c.total_installment::float8 / c.payment_months
+               end
+        from overlapping c
+        cross join lateral generate_series(greatest(coalesce(c.first_offset, 0), 0),
+                                           least(coalesce(c.last_offset, c.payment_months - 1), c.payment_months - 1)) as i
+        where c.payment_months > 0
+        union all
+        select date_trunc('month', c.start_date::date), (c.total_installment - c.contract_amount)::float8
+        from overlapping c
+        where monthly_income.include_contract_amount and c.payment_months <= 0
+    )
+    select to_char(bucket, 'YYYY-MM'), sum(value)
+    from entries
+    where (monthly_income.start_month is null or bucket >= to_date(monthly_income.start_month, 'YYYY-MM'))
+      and (monthly_income.end_month is null or bucket <= to_date(monthly_income.end_month, 'YYYY-MM'))
+    group by 1
+    order by 1
+$$;
+
+-- 월별 원장 (ledger.py): 쓰기 라우트가 증감분을 반영하고 /api/monthly_* 가 읽는다
+create table if not exists monthly_ledger (
+    series text not null,
+    month text not null,
+    amount double precision not null default 0,
+    entries integer not null default 0,
+    primary key (series, month)
+);
+
+create or replace function apply_ledger_deltas(deltas jsonb)
+returns void
+language sql
+as $$
+    insert into monthly_ledger (series, month, amount, entries)
+    select d->>'series', d->>'month', (d->>'amount')::float8, (d->>'entries')::int
+    from jsonb_array_elements(deltas) as d
+    on conflict (series, month) do update
+        set amount = monthly_ledger.amount + excluded.amount,
+            entries = monthly_ledger.entries + excluded.entries
+$$;
+
+-- 전체 재구성: 한 트랜잭션 안에서 원장을 비우고 다시 채운다
+create or replace function replace_ledger(ledger_rows jsonb)
+returns void
+language sql
+as $$
+    delete from monthly_ledger;
+    insert into monthly_ledger (series, month, amount, entries)
+    select d->>'series', d->>'month', (d->>'amount')::float8, (d->>'entries')::int
+    from jsonb_array_elements(ledger_rows) as d
+$$;
+
+-- 행 수정 + 이전 값 (storage.SupabaseRepository.write_with_ledger)
+-- 행을 잠그고(for update) 읽은 이전 행과 고친 뒤의 행을 {"old", "new"}로 돌려준다.
+-- 동시에 들어온 수정은 잠금에서 기다렸다가 앞선 수정 결과를 이전 행으로 받으므로
+-- 원장 증감분이 같은 이전 값을 두 번 빼지 않는다. 행이 없으면 null
+create or replace function update_returning_old(table_name text, row_id bigint, data jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    old_row jsonb;
+    new_row jsonb;
+begin
+    if table_name not in ('contracts', 'payment_records') then
+        raise exception 'unknown table: %', table_name;
+    end if;
+    execute format('select to_jsonb(t) from %I t where id = $1 for update', table_name)
+        into old_row using row_id;
+    if old_row is null or data = '{}'::jsonb then
+        return case when old_row is null then null else jsonb_build_object('old', old_row, 'new', old_row) end;
+    end if;
+    execute format(
+        'update %1$I t set (%2$s) = (select %2$s from jsonb_populate_record(null::%1$I, $1)) where id = $2 returning to_jsonb(t)',
+        table_name,
+        (select string_agg(quote_ident(key), ', ') from jsonb_object_keys(data) as key)
+    ) into new_row using old_row || data, row_id;
+    return jsonb_build_object('old', old_row, 'new', new_row);
+end
+$$;
+
+-- 일괄 삽입 + 원장 증감분 (storage.SupabaseRepository.insert_many_with_ledger)
+-- new_rows의 행을 삽입하고 deltas를 반영한 뒤 삽입된 행(id 포함) 목록을 돌려준다. 함수 하나가 한 트랜잭션이라
+-- 중간에 실패하면 삽입도 원장 반영도 남지 않는다
+create or replace function insert_rows_with_ledger(table_name text, new_rows jsonb, deltas jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    inserted jsonb;
+begin
+    if table_name not in ('contracts', 'payment_records') then
+        raise exception 'unknown table: %', table_name;
+    end if;
+    execute format(
+        'with inserted as (insert into %1$I (%2$s) select %2$s from jsonb_populate_recordset(null::%1$I, $1) returning *)'
+        ' select coalesce(jsonb_agg(to_jsonb(inserted)), ''[]''::jsonb) from inserted',
+        table_name,
+        (select string_agg(quote_ident(key), ', ') from jsonb_object_keys(new_rows->0) as key)
+    ) into inserted using new_rows;
+    perform apply_ledger_deltas(deltas);
+    return inserted;
+end
+$$;
@@ -0,0 +1,35 @@
+-- 입금 기록 대사 (Supabase SQL Editor에서 실행)
+-- reconcile.py 가 계약에 연결한 입금 기록의 계약 id와 점수를 저장한다.
+-- 계약을 지우면 연결과 점수만 지워지고 입금 기록은 남는다.
+
+alter table payment_records add column if not exists contract_id bigint references contracts (id) on delete set null;
+alter table payment_records add column if not exists match_score double precision;
+create index if not exists payment_records_contract_id_idx on payment_records (contract_id);
+
+-- 계약 삭제 시 연결된 입금 기록의 contract_id와 match_score를 함께 비운다
+create or replace function unlink_payment_records()
+returns trigger
+language plpgsql
+as $$
+begin
+    update payment_records set contract_id = null, match_score = null where contract_id = old.id;
+    return old;
+end
+$$;
+
+drop trigger if exists contracts_unlink_payment_records on contracts;
+create trigger contracts_unlink_payment_records
+    before delete on contracts
+    for each row execute function unlink_payment_records();
+
+-- 대사 결과 일괄 저장: matches = [{"id", "contract_id", "match_score"}] (contract_id가 null이면 연결 해제)
+create or replace function save_payment_matches(matches jsonb)
+returns void
+language sql
+as $$
+    update payment_records p
+    set contract_id = (m->>'contract_id')::bigint,
+        match_score = (m->>'match_score')::float8
+    from jsonb_array_elements(matches) as m
+    where p.id = (m->>'id')::bigint
+$$;
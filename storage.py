@@ -0,0 +1,595 @@
+import os
+import sqlite3
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+import aggregates
+
+# 저장소 백엔드
+#
+# 라우트는 Supabase 클라이언트를 직접 쓰지 않고 Repository 인터페이스를 거친다.
+# STORAGE_BACKEND 설정으로 'supabase'(기본값) 또는 'sqlite'(contracts.db)를 고른다.
+# 서로 독립적인 조회(계약 + 입금 기록 등)는 gather()로 스레드 풀에서 동시에 보낸다.
+
+CONTRACT_COLUMNS = (
+    'id', 'title', 'business_number', 'representative', 'contract_type',
+    'product_price', 'quantity', 'total_amount', 'tax', 'total_with_tax',
+    'contract_amount', 'total_installment', 'payment_months', 'start_date'
+)
+
+PAYMENT_COLUMNS = (
+    'id', 'title', 'business_number', 'representative', 'payer_name',
+    'payment_account', 'payment_date', 'payment_amount', 'memo',
+    'contract_id', 'match_score'
+)
+
+# 입금 기록을 계약에 연결한 결과 (reconcile.py가 채운다. 폼/가져오기 입력 컬럼이 아님)
+MATCH_COLUMNS = ('contract_id', 'match_score')
+
+TABLE_COLUMNS = {
+    'contracts': CONTRACT_COLUMNS,
+    'payment_records': PAYMENT_COLUMNS
+}
+
+# 기간 필터(date_from/date_to)가 적용되는 날짜 컬럼
+DATE_COLUMNS = {
+    'contracts': 'start_date',
+    'payment_records': 'payment_date'
+}
+
+# 값이 같은 행만 남기는 필터
+EQUAL_FILTERS = {
+    'contracts': ('business_number', 'contract_type'),
+    'payment_records': ('business_number',)
+}
+
+
+# 동시 조회 스레드 수. Supabase HTTP 연결 풀 크기도 여기에 맞춘다
+FETCH_WORKERS = int(os.environ.get('FETCH_WORKERS', 8))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    # 프로세스마다 하나의 풀을 만들어 모든 요청이 함께 쓴다
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='fetch')
+    return _executor
+
+
+def _check_columns(table, columns=()):
+    # SQL에 들어가는 테이블/컬럼 이름은 허용 목록에 있는 것만 쓴다 ('*'도 거부)
+    allowed = TABLE_COLUMNS.get(table)
+    if allowed is None:
+        raise ValueError(f'알 수 없는 테이블입니다: {table}')
+    for column in columns:
+        if column not in allowed:
+            raise ValueError(f'{table}에 없는 컬럼입니다: {column}')
+    return columns
+
+
+def _projection(table, columns, with_id=False):
+    # 여러 행을 읽는 조회의 컬럼 목록. 호출하는 쪽이 필요한 컬럼을 반드시 지정한다
+    # (전체 컬럼이 필요하면 TABLE_COLUMNS[table]을 명시적으로 넘긴다)
+    if not columns:
+        raise ValueError(f'{table} 조회에 컬럼 목록이 없습니다 (columns를 지정하세요)')
+    columns = tuple(columns)
+    if with_id and 'id' not in columns:
+        columns = ('id',) + columns
+    return _check_columns(table, columns)
+
+
+class Repository:
+    # 계약/입금 기록 CRUD와 월별 집계 인터페이스.
+    # 여러 행을 읽는 메서드(select, iter_batches, query_page, iter_page)는 columns가 필수다.
+    # 필요한 컬럼만 가져오도록 호출하는 쪽이 정하고, 빠지면 ValueError
+
+    def gather(self, *calls):
+        # 서로 독립적인 조회 calls(인자 없는 함수)를 동시에 실행하고 결과를 순서대로 돌려준다.
+        # 첫 번째는 현재 스레드에서 실행하고 나머지만 스레드 풀로 보낸다 (contextvars는 복사해 넘김)
+        if len(calls) <= 1:
+            return [call() for call in calls]
+        futures = [_get_executor().submit(contextvars.copy_context().run, call) for call in calls[1:]]
+        first = calls[0]()
+        return [first] + [future.result() for future in futures]
+
+    def select(self, table, order=None, desc=False, columns=None):
+        raise NotImplementedError
+
+    def iter_batches(self, table, batch_size=1000, columns=None):
+        # id 기준 키셋 페이지네이션으로 batch_size개씩 나눠 가져온다 (id는 항상 포함)
+        raise NotImplementedError
+
+    def query_page(self, table, page=1, limit=50, sort='id', desc=False, filters=None, count='exact', columns=None):
+        # 필터/정렬/페이지를 DB에서 적용하고 (행 목록, 전체 건수)를 돌려준다.
+        # filters: business_number, contract_type, date_from, date_to
+        raise NotImplementedError
+
+    def iter_page(self, table, page=1, limit=50, sort='id', desc=False, filters=None, count='exact', columns=None):
+        # query_page와 같은 조회를 (행 반복자, 전체 건수)로 돌려준다. 화면 스트리밍용으로,
+        # 행을 한꺼번에 dict 목록으로 만들지 않는 저장소는 이 메서드를 다시 정의한다
+        rows, total = self.query_page(table, page, limit, sort, desc, filters, count, columns)
+        return iter(rows), total
+
+    def get(self, table, id):
+        raise NotImplementedError
+
+    def insert(self, table, data):
+        raise NotImplementedError
+
+    def insert_many(self, table, rows):
+        # 여러 행을 한 번에 삽입하고 삽입된 행(id 포함)을 돌려준다
+        raise NotImplementedError
+
+    def insert_many_with_ledger(self, table, rows, ledger_rows):
+        # insert_many와 같되 ledger_rows(table, rows)가 만든 원장 증감분을 같은 트랜잭션에서 반영한다.
+        # 증감분은 삽입할 행으로 만든다 (id가 필요 없음). 일괄 가져오기용
+        raise NotImplementedError
+
+    def update(self, table, id, data):
+        raise NotImplementedError
+
+    def delete(self, table, id):
+        raise NotImplementedError
+
+    def write_with_ledger(self, table, id=None, data=None, ledger_rows=None):
+        """행 하나를 추가(id 없음)/수정/삭제(data 없음)하고 원장 증감분을 함께 반영한다.
+
+        ledger_rows(table, old, new)는 쓰기 직전의 행과 쓴 뒤의 행으로 원장 증감분을 만든다.
+        old는 따로 읽은 값이 아니라 쓰기와 같은 트랜잭션(또는 같은 문장)에서 얻은 값이라
+        동시에 들어온 수정이 같은 이전 값을 두 번 빼지 않는다. (old, new)를 돌려준다.
+        """
+        raise NotImplementedError
+
+    def monthly_revenue(self, start_month=None, end_month=None):
+        raise NotImplementedError
+
+    def monthly_income(self, start_month=None, end_month=None, include_contract_amount=True):
+        raise NotImplementedError
+
+    # 월별 원장 (ledger.py 참고). rows: {'series', 'month', 'amount', 'entries'} 목록
+
+    def has_ledger(self):
+        raise NotImplementedError
+
+    def read_ledger(self, series, start_month=None, end_month=None):
+        raise NotImplementedError
+
+    def apply_ledger_deltas(self, rows):
+        raise NotImplementedError
+
+    def replace_ledger(self, rows):
+        raise NotImplementedError
+
+    def save_payment_matches(self, rows):
+        # rows: [{'id', 'contract_id', 'match_score'}] (contract_id가 None이면 연결 해제)
+        raise NotImplementedError
+
+
+class SupabaseRepository(Repository):
+    def __init__(self, url, key):
+        self.url = url
+        self.key = key
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # 클라이언트는 처음 사용할 때 만든다 (임포트 시점에 환경변수가 없어도 됨)
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from supabase import create_client
+                    # PostgREST 요청은 클라이언트의 httpx 세션 하나를 거치며, 이 세션이 이미
+                    # keep-alive 연결을 풀로 재사용한다 (스레드 간 공유 가능)
+                    self._client = create_client(self.url, self.key)
+        return self._client
+
+    def select(self, table, order=None, desc=False, columns=None):
+        query = self.client.table(table).select(*_projection(table, columns))
+        if order:
+            query = query.order(order, desc=desc)
+        return query.execute().data
+
+    def iter_batches(self, table, batch_size=1000, columns=None):
+        columns = _projection(table, columns, with_id=True)
+        last_id = None
+        while True:
+            query = self.client.table(table).select(*columns)
+            if last_id is not None:
+                query = query.gt('id', last_id)
+            batch = query.order('id').limit(batch_size).execute().data
+            if not batch:
+                return
+            yield batch
+            if len(batch) < batch_size:
+                return
+            last_id = batch[-1]['id']
+
+    def query_page(self, table, page=1, limit=50, sort='id', desc=False, filters=None, count='exact', columns=None):
+        # count='estimated' 이면 PostgREST의 추정 건수를 쓴다 (큰 테이블에서 더 빠름)
+        _check_columns(table, [sort])
+        filters = filters or {}
+        query = self.client.table(table).select(*_projection(table, columns), count=count)
+        for column in EQUAL_FILTERS[table]:
+            if filters.get(column):
+                query = query.eq(column, filters[column])
+        if filters.get('date_from'):
+            query = query.gte(DATE_COLUMNS[table], filters['date_from'])
+        if filters.get('date_to'):
+            query = query.lte(DATE_COLUMNS[table], filters['date_to'])
+        offset = (page - 1) * limit
+        # 정렬 값이 같은 행도 페이지마다 순서가 바뀌지 않도록 id로 한 번 더 정렬한다 (SQLite와 같은 순서)
+        response = query.order(sort, desc=desc).order('id', desc=desc).range(offset, offset + limit - 1).execute()
+        return response.data, response.count
+
+    def get(self, table, id):
+        response = self.client.table(table).select(*TABLE_COLUMNS[table]).eq('id', id).execute()
+        return response.data[0] if response.data else None
+
+    def insert(self, table, data):
+        _check_columns(table, data)
+        response = self.client.table(table).insert(data).execute()
+        return response.data[0] if response.data else None
+
+    def insert_many(self, table, rows):
+        if not rows:
+            return []
+        for row in rows:
+            _check_columns(table, row)
+        return self.client.table(table).insert(rows).execute().data
+
+    def insert_many_with_ledger(self, table, rows, ledger_rows):
+        # insert_rows_with_ledger RPC 하나가 행 삽입과 원장 반영을 한 트랜잭션에서 한다 (sql/monthly_aggregates.sql)
+        if not rows:
+            return []
+        for row in rows:
+            _check_columns(table, row)
+        params = {'table_name': table, 'new_rows': rows, 'deltas': ledger_rows(table, rows)}
+        return self.client.rpc('insert_rows_with_ledger', params).execute().data
+
+    def update(self, table, id, data):
+        _check_columns(table, data)
+        response = self.client.table(table).update(data).eq('id', id).execute()
+        return response.data[0] if response.data else None
+
+    def delete(self, table, id):
+        response = self.client.table(table).delete().eq('id', id).execute()
+        return response.data[0] if response.data else None
+
+    def write_with_ledger(self, table, id=None, data=None, ledger_rows=None):
+        # 수정은 update_returning_old RPC가 행을 잠그고 고친 뒤 이전 행과 새 행을 함께 돌려준다
+        # (sql/monthly_aggregates.sql). 삭제/추가는 DELETE/INSERT ... RETURNING 한 문장이 곧 이전/새 행이다.
+        # 원장 반영은 그다음 RPC라, 그 사이에 프로세스가 죽으면 `flask ledger-check`/`ledger-rebuild`로 맞춘다
+        if id is None:
+            old, new = None, self.insert(table, data)
+        elif data is None:
+            old, new = self.delete(table, id), None
+        else:
+            _check_columns(table, data)
+            result = self.client.rpc('update_returning_old', {'table_name': table, 'row_id': id, 'data': data}).execute().data
+            old, new = (result['old'], result['new']) if result else (None, None)
+        rows = ledger_rows(table, old, new) if ledger_rows and (old or new) else None
+        if rows:
+            self.apply_ledger_deltas(rows)
+        return old, new
+
+    def monthly_revenue(self, start_month=None, end_month=None):
+        return aggregates.supabase_monthly_revenue(self.client, start_month, end_month)
+
+    def monthly_income(self, start_month=None, end_month=None, include_contract_amount=True):
+        return aggregates.supabase_monthly_income(self.client, start_month, end_month, include_contract_amount)
+
+    def has_ledger(self):
+        return bool(self.client.table('monthly_ledger').select('series').limit(1).execute().data)
+
+    def read_ledger(self, series, start_month=None, end_month=None):
+        start_month, end_month = aggregates.month_range(start_month, end_month)
+        query = self.client.table('monthly_ledger').select('month', 'amount').eq('series', series).gt('entries', 0)
+        if start_month:
+            query = query.gte('month', start_month).lte('month', end_month)
+        return {row['month']: row['amount'] for row in query.order('month').execute().data}
+
+    def apply_ledger_deltas(self, rows):
+        self.client.rpc('apply_ledger_deltas', {'deltas': rows}).execute()
+
+    def replace_ledger(self, rows):
+        self.client.rpc('replace_ledger', {'ledger_rows': rows}).execute()
+
+    def save_payment_matches(self, rows):
+        self.client.rpc('save_payment_matches', {'matches': rows}).execute()
+
+
+SQLITE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS contracts
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  title TEXT,
+                  business_number TEXT,
+                  representative TEXT,
+                  contract_type TEXT,
+                  product_price REAL,
+                  quantity INTEGER,
+                  total_amount REAL,
+                  tax REAL,
+                  total_with_tax REAL,
+                  contract_amount REAL,
+                  total_installment REAL,
+                  payment_months INTEGER,
+                  start_date TEXT);
+    CREATE TABLE IF NOT EXISTS payment_records
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  title TEXT,
+                  business_number TEXT,
+                  representative TEXT,
+                  payer_name TEXT,
+                  payment_account TEXT,
+                  payment_date TEXT,
+                  payment_amount REAL,
+                  memo TEXT,
+                  contract_id INTEGER REFERENCES contracts (id) ON DELETE SET NULL,
+                  match_score REAL);
+    CREATE INDEX IF NOT EXISTS contracts_business_number_idx ON contracts (business_number);
+    CREATE INDEX IF NOT EXISTS contracts_start_date_idx ON contracts (start_date);
+    CREATE INDEX IF NOT EXISTS payment_records_business_number_idx ON payment_records (business_number);
+    CREATE INDEX IF NOT EXISTS payment_records_payment_date_idx ON payment_records (payment_date);
+    CREATE TABLE IF NOT EXISTS monthly_ledger
+                 (series TEXT NOT NULL,
+                  month TEXT NOT NULL,
+                  amount REAL NOT NULL DEFAULT 0,
+                  entries INTEGER NOT NULL DEFAULT 0,
+                  PRIMARY KEY (series, month));
+"""
+
+# 기존 DB에 나중에 추가된 컬럼 (CREATE TABLE IF NOT EXISTS는 이미 있는 테이블을 바꾸지 않는다)
+SQLITE_MIGRATIONS = (
+    ('payment_records', 'contract_id', 'INTEGER REFERENCES contracts (id) ON DELETE SET NULL'),
+    ('payment_records', 'match_score', 'REAL')
+)
+
+SQLITE_MIGRATED_SCHEMA = """
+    CREATE INDEX IF NOT EXISTS payment_records_contract_id_idx ON payment_records (contract_id);
+    -- 계약을 지우면 입금 기록의 연결과 대사 점수를 함께 지운다 (외래 키의 SET NULL은 점수를 남김)
+    CREATE TRIGGER IF NOT EXISTS contracts_unlink_payment_records BEFORE DELETE ON contracts
+    BEGIN
+        UPDATE payment_records SET contract_id = NULL, match_score = NULL WHERE contract_id = OLD.id;
+    END;
+"""
+
+
+class SQLiteRepository(Repository):
+    # 스레드마다 연결을 하나씩 열어 재사용한다 (WAL 모드라 읽기와 쓰기가 서로 막지 않음).
+    # SQL 문자열은 허용된 테이블/컬럼 이름으로만 조합하므로 sqlite3 문장 캐시에서
+    # 준비된 문장(prepared statement)이 재사용된다.
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            with self._lock:
+                if not self._schema_ready:
+                    conn.executescript(SQLITE_SCHEMA)
+                    self._migrate(conn)
+                    self._schema_ready = True
+                self._connections.append(conn)
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self, conn):
+        for table, column, definition in SQLITE_MIGRATIONS:
+            existing = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+            if column not in existing:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        conn.executescript(SQLITE_MIGRATED_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def select(self, table, order=None, desc=False, columns=None):
+        _check_columns(table, [order] if order else ())
+        sql = f'SELECT {", ".join(_projection(table, columns))} FROM {table}'
+        if order:
+            sql += f' ORDER BY {order} {"DESC" if desc else "ASC"}'
+        return [dict(row) for row in self.connection().execute(sql)]
+
+    def iter_batches(self, table, batch_size=1000, columns=None):
+        sql = f'SELECT {", ".join(_projection(table, columns, with_id=True))} FROM {table} WHERE id > ? ORDER BY id LIMIT ?'
+        last_id = 0
+        while True:
+            batch = [dict(row) for row in self.connection().execute(sql, (last_id, batch_size))]
+            if not batch:
+                return
+            yield batch
+            if len(batch) < batch_size:
+                return
+            last_id = batch[-1]['id']
+
+    def query_page(self, table, page=1, limit=50, sort='id', desc=False, filters=None, count='exact', columns=None):
+        rows, total = self._page_cursor(table, page, limit, sort, desc, filters, columns)
+        return [dict(row) for row in rows], total
+
+    def iter_page(self, table, page=1, limit=50, sort='id', desc=False, filters=None, count='exact', columns=None):
+        # 커서에서 한 행씩 읽어 dict로 바꾼다
+        rows, total = self._page_cursor(table, page, limit, sort, desc, filters, columns)
+        return (dict(row) for row in rows), total
+
+    def _page_cursor(self, table, page, limit, sort, desc, filters, columns):
+        _check_columns(table, [sort])
+        filters = filters or {}
+        conditions = []
+        params = []
+        for column in EQUAL_FILTERS[table]:
+            if filters.get(column):
+                conditions.append(f'{column} = ?')
+                params.append(filters[column])
+        if filters.get('date_from'):
+            conditions.append(f'{DATE_COLUMNS[table]} >= ?')
+            params.append(filters['date_from'])
+        if filters.get('date_to'):
+            conditions.append(f'{DATE_COLUMNS[table]} <= ?')
+            params.append(filters['date_to'])
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+
+        conn = self.connection()
+        total = conn.execute(f'SELECT COUNT(*) FROM {table}{where}', params).fetchone()[0]
+        direction = 'DESC' if desc else 'ASC'
+        rows = conn.execute(
+            f'SELECT {", ".join(_projection(table, columns))} FROM {table}{where} ORDER BY {sort} {direction}, id {direction} LIMIT ? OFFSET ?',
+            params + [limit, (page - 1) * limit]
+        )
+        return rows, total
+
+    def get(self, table, id):
+        row = self.connection().execute(f'SELECT {", ".join(TABLE_COLUMNS[table])} FROM {table} WHERE id = ?', (id,)).fetchone()
+        return dict(row) if row else None
+
+    def insert(self, table, data):
+        conn = self.connection()
+        with conn:
+            return self._insert(conn, table, data)
+
+    def _insert(self, conn, table, data):
+        columns = _check_columns(table, list(data))
+        sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))}) RETURNING {", ".join(TABLE_COLUMNS[table])}'
+        return dict(conn.execute(sql, [data[column] for column in columns]).fetchone())
+
+    def insert_many(self, table, rows):
+        if not rows:
+            return []
+        columns = _check_columns(table, list(rows[0]))
+        sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))}) RETURNING {", ".join(TABLE_COLUMNS[table])}'
+        conn = self.connection()
+        with conn:
+            # 한 트랜잭션 안에서 같은 준비된 문장을 반복 실행한다
+            return [dict(conn.execute(sql, [row[column] for column in columns]).fetchone()) for row in rows]
+
+    def insert_many_with_ledger(self, table, rows, ledger_rows):
+        if not rows:
+            return []
+        deltas = ledger_rows(table, rows)
+        conn = self.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            inserted = [self._insert(conn, table, row) for row in rows]
+            if deltas:
+                self._apply_ledger_deltas(conn, deltas)
+        return inserted
+
+    def update(self, table, id, data):
+        conn = self.connection()
+        with conn:
+            return self._update(conn, table, id, data)
+
+    def _update(self, conn, table, id, data):
+        columns = _check_columns(table, list(data))
+        sql = f'UPDATE {table} SET {", ".join(f"{column} = ?" for column in columns)} WHERE id = ? RETURNING {", ".join(TABLE_COLUMNS[table])}'
+        row = conn.execute(sql, [data[column] for column in columns] + [id]).fetchone()
+        return dict(row) if row else None
+
+    def delete(self, table, id):
+        conn = self.connection()
+        with conn:
+            return self._delete(conn, table, id)
+
+    def _delete(self, conn, table, id):
+        returning = ', '.join(TABLE_COLUMNS[table])
+        row = conn.execute(f'DELETE FROM {table} WHERE id = ? RETURNING {returning}', (id,)).fetchone()
+        return dict(row) if row else None
+
+    def write_with_ledger(self, table, id=None, data=None, ledger_rows=None):
+        # BEGIN IMMEDIATE로 처음부터 쓰기 잠금을 잡고 이전 행 읽기, 행 쓰기, 원장 반영을 한 트랜잭션에서 한다.
+        # 다른 연결(다른 워커)의 쓰기는 잠금이 풀릴 때까지 기다리므로 같은 이전 값을 보지 않는다
+        conn = self.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            if id is None:
+                old, new = None, self._insert(conn, table, data)
+            elif data is None:
+                old, new = self._delete(conn, table, id), None
+            else:
+                old = self.get(table, id)
+                new = self._update(conn, table, id, data) if old else None
+            rows = ledger_rows(table, old, new) if ledger_rows and (old or new) else None
+            if rows:
+                self._apply_ledger_deltas(conn, rows)
+        return old, new
+
+    def monthly_revenue(self, start_month=None, end_month=None):
+        return aggregates.sqlite_monthly_revenue(self.connection(), start_month, end_month)
+
+    def monthly_income(self, start_month=None, end_month=None, include_contract_amount=True):
+        return aggregates.sqlite_monthly_income(self.connection(), start_month, end_month, include_contract_amount)
+
+    def has_ledger(self):
+        return self.connection().execute('SELECT 1 FROM monthly_ledger LIMIT 1').fetchone() is not None
+
+    def read_ledger(self, series, start_month=None, end_month=None):
+        start_month, end_month = aggregates.month_range(start_month, end_month)
+        rows = self.connection().execute(
+            'SELECT month, amount FROM monthly_ledger'
+            ' WHERE series = :series AND entries > 0'
+            ' AND (:start_month IS NULL OR month >= :start_month)'
+            ' AND (:end_month IS NULL OR month <= :end_month)'
+            ' ORDER BY month',
+            {'series': series, 'start_month': start_month, 'end_month': end_month}
+        )
+        return {month: amount for month, amount in rows}
+
+    def apply_ledger_deltas(self, rows):
+        conn = self.connection()
+        with conn:
+            self._apply_ledger_deltas(conn, rows)
+
+    def _apply_ledger_deltas(self, conn, rows):
+        conn.executemany(
+            'INSERT INTO monthly_ledger (series, month, amount, entries)'
+            ' VALUES (:series, :month, :amount, :entries)'
+            ' ON CONFLICT (series, month) DO UPDATE SET'
+            ' amount = amount + excluded.amount, entries = entries + excluded.entries',
+            rows
+        )
+
+    def replace_ledger(self, rows):
+        conn = self.connection()
+        with conn:
+            conn.execute('DELETE FROM monthly_ledger')
+            conn.executemany(
+                'INSERT INTO monthly_ledger (series, month, amount, entries)'
+                ' VALUES (:series, :month, :amount, :entries)',
+                rows
+            )
+
+    def save_payment_matches(self, rows):
+        conn = self.connection()
+        with conn:
+            conn.executemany(
+                'UPDATE payment_records SET contract_id = :contract_id, match_score = :match_score WHERE id = :id',
+                rows
+            )
+
+
+def create_repository(config):
+    backend = config.get('STORAGE_BACKEND', 'supabase')
+    if backend == 'supabase':
+        return SupabaseRepository(config.get('SUPABASE_URL'), config.get('SUPABASE_KEY'))
+    if backend == 'sqlite':
+        return SQLiteRepository(config.get('SQLITE_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'contracts.db'))
+    raise ValueError(f'지원하지 않는 저장소 백엔드입니다: {backend}')
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 저장소 루트의 모듈(schedule.py 등)을 tests/에서 바로 임포트한다
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,82 @@
+import shutil
+import pytest
+import benchmark
+import metrics
+from storage import TABLE_COLUMNS, create_repository
+
+# 자주 호출되는 화면/API가 저장소에서 필요한 컬럼만 읽는지 확인한다.
+# 저장소를 감싼 스파이가 여러 행을 읽는 호출을 모두 기록하고, 컬럼 목록 없이 들어오거나
+# 테이블 전체 컬럼을 읽는 호출이 있으면 실패한다.
+
+READ_METHODS = ('select', 'iter_batches', 'query_page', 'iter_page')
+COLUMNS_POSITION = {'select': 3, 'iter_batches': 2, 'query_page': 7, 'iter_page': 7}
+
+HOT_ROUTES = (
+    '/monthly_installments',
+    '/monthly_revenue',
+    '/contract_status',
+    '/dashboard',
+    '/api/monthly_income',
+    '/api/monthly_income?start_month=2024-01&end_month=2024-12',
+    '/api/monthly_revenue',
+    '/api/monthly_series'
+)
+
+
+class ColumnSpy:
+    # 읽기 호출의 (메서드, 테이블, columns)를 기록하고 나머지는 그대로 넘긴다
+
+    def __init__(self, repository):
+        self._repository = repository
+        self.reads = []
+
+    def __getattr__(self, name):
+        attr = getattr(self._repository, name)
+        if name not in READ_METHODS:
+            return attr
+
+        def call(table, *args, **kwargs):
+            position = COLUMNS_POSITION[name] - 1
+            columns = kwargs.get('columns', args[position] if len(args) > position else None)
+            self.reads.append((name, table, columns))
+            return attr(table, *args, **kwargs)
+
+        return call
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    path = tmp_path_factory.mktemp('db') / 'contracts.db'
+    shutil.copy(benchmark.os.path.join(benchmark.os.path.dirname(benchmark.__file__), 'contracts.db'), path)
+    # 캐시를 끄고(CACHE_TTL=0) 템플릿은 benchmark.py의 대체 템플릿을 쓴다
+    return benchmark._load_app(str(path), cache=False)
+
+
+@pytest.fixture
+def spy(app):
+    spy = ColumnSpy(create_repository(app.config))
+    app.extensions['repository'] = metrics.instrument(spy)
+    # 스냅샷/원장도 새 저장소로 다시 적재되도록 비운다
+    for name in ('analytics_snapshot', 'ledger_ready'):
+        app.extensions.pop(name, None)
+    yield spy
+    app.extensions.pop('repository', None)
+
+
+@pytest.mark.parametrize('path', HOT_ROUTES)
+def test_hot_routes_read_explicit_columns(app, spy, path):
+    response = app.test_client().get(path)
+    assert response.status_code == 200
+    response.get_data()
+    response.close()
+    for method, table, columns in spy.reads:
+        assert columns, f'{path}: {method}({table!r})가 컬럼 목록 없이 호출됨'
+        assert set(columns) != set(TABLE_COLUMNS[table]), f'{path}: {method}({table!r})가 전체 컬럼을 읽음'
+
+
+def test_read_without_columns_is_rejected(app):
+    repository = create_repository(app.config)
+    with pytest.raises(ValueError):
+        list(repository.iter_batches('contracts'))
+    with pytest.raises(ValueError):
+        repository.query_page('payment_records')
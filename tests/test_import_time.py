@@ -0,0 +1,19 @@
+import numpy as np
+import benchmark
+
+# app 임포트 시간 회귀 점검 (`python benchmark.py importtime`과 같은 기준).
+# 새 인터프리터에서 app을 임포트해 지연 임포트할 패키지가 올라오지 않는지, 임포트 시간이
+# benchmark.IMPORT_BUDGET_MS 안인지 확인한다. 시간은 흔들리므로 여러 번 재서 중앙값을 쓴다.
+
+RUNS = 3
+
+
+def test_app_import_skips_lazy_packages():
+    packages = benchmark.import_times()
+    loaded = [name for name in benchmark.LAZY_PACKAGES if name in packages]
+    assert not loaded, f'app 임포트 시 함께 로드됨: {loaded}'
+
+
+def test_app_import_within_budget():
+    total = float(np.median([benchmark.import_times().get('app', 0.0) for _ in range(RUNS)]))
+    assert 0 < total <= benchmark.IMPORT_BUDGET_MS, f'app 임포트 {total:.1f}ms (상한 {benchmark.IMPORT_BUDGET_MS:.0f}ms)'
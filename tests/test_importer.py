@@ -0,0 +1,36 @@
+import io
+import pandas as pd
+import pytest
+import importer
+
+# 일괄 가져오기 검증: 잘못된 값은 파일 전체가 아니라 그 행만 오류로 보고한다.
+
+
+def chunk(**columns):
+    return pd.DataFrame(columns, dtype=object)
+
+
+def test_non_finite_numbers_are_row_errors():
+    df = chunk(상호=['a', 'b', 'c', 'd'], 사업자번호=['1', '2', '3', '4'], 대표자=['x', 'y', 'z', 'w'],
+               할부개월=['inf', '3', '-inf', '12'], 총할부금=['1,000', 'inf', '2', 'nan'], 시작일=['2024-01-31'] * 4)
+    rows, errors = importer.normalize_chunk('contracts', df, 2)
+    assert errors == [
+        {'row': 2, 'error': 'payment_months 값이 숫자가 아닙니다'},
+        {'row': 3, 'error': 'total_installment 값이 숫자가 아닙니다'},
+        {'row': 4, 'error': 'payment_months 값이 숫자가 아닙니다'},
+        {'row': 5, 'error': 'total_installment 값이 숫자가 아닙니다'}
+    ]
+    assert rows == []
+
+
+def test_valid_numbers_are_kept():
+    df = chunk(상호=['a'], 사업자번호=['1'], 대표자=['x'], 할부개월=['12'], 총할부금=['1,200,000'], 시작일=['2024.01.31'])
+    rows, errors = importer.normalize_chunk('contracts', df, 2)
+    assert errors == []
+    assert rows[0]['payment_months'] == 12 and rows[0]['total_installment'] == 1200000.0
+    assert rows[0]['start_date'] == '2024-01-31'
+
+
+def test_unknown_encoding_is_value_error():
+    with pytest.raises(ValueError):
+        importer.import_file(None, 'contracts', io.BytesIO(b'title\n'), 'c.csv', encoding='nope')
@@ -0,0 +1,88 @@
+import io
+import shutil
+import threading
+import pytest
+import benchmark
+import importer
+import ledger
+from storage import SQLiteRepository
+
+# 쓰기 라우트가 쓰는 write_with_ledger가 행 쓰기와 원장 증감분을 한 트랜잭션으로 반영해,
+# 여러 워커가 같은 행을 동시에 고쳐도 원장이 DB 집계와 어긋나지 않는지 확인한다.
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / 'contracts.db'
+    shutil.copy(benchmark.os.path.join(benchmark.os.path.dirname(benchmark.__file__), 'contracts.db'), path)
+    repository = SQLiteRepository(str(path))
+    ledger.rebuild(repository)
+    repository.close()
+    return str(path)
+
+
+def test_concurrent_edits_keep_ledger_consistent(path):
+    # 워커마다 저장소(연결)를 따로 두고 같은 입금 기록의 입금일/금액을 번갈아 고친다
+    record = SQLiteRepository(path).get('payment_records', 1)
+    errors = []
+
+    def worker(n):
+        repository = SQLiteRepository(path)
+        try:
+            for i in range(40):
+                data = {'payment_date': f'2024-{(n + i) % 12 + 1:02d}-15', 'payment_amount': float(1000 * (n + i))}
+                repository.write_with_ledger('payment_records', record['id'], data, ledger.change_rows)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            repository.close()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert ledger.check(SQLiteRepository(path)) == []
+
+
+def test_insert_update_delete(path):
+    repository = SQLiteRepository(path)
+    contract = {'title': '테스트', 'business_number': '000-00-00000', 'representative': '대표', 'contract_type': '렌탈',
+                'product_price': 1000000.0, 'quantity': 1, 'total_amount': 1000000.0, 'tax': 100000.0,
+                'total_with_tax': 1100000.0, 'contract_amount': 100000.0, 'total_installment': 1100000.0,
+                'payment_months': 10, 'start_date': '2024-01-31'}
+    old, new = repository.write_with_ledger('contracts', data=contract, ledger_rows=ledger.change_rows)
+    assert old is None and new['id']
+    old, new = repository.write_with_ledger('contracts', new['id'], {'payment_months': 0}, ledger.change_rows)
+    assert old['payment_months'] == 10 and new['payment_months'] == 0
+    assert ledger.check(repository) == []
+    old, new = repository.write_with_ledger('contracts', new['id'], ledger_rows=ledger.change_rows)
+    assert old['id'] and new is None
+    assert ledger.check(repository) == []
+    assert repository.write_with_ledger('contracts', old['id'], {'quantity': 2}, ledger.change_rows) == (None, None)
+
+
+def test_import_batches_keep_ledger_consistent(path):
+    repository = SQLiteRepository(path)
+    csv = '상호,사업자번호,대표자,할부개월,계약금,총할부금,시작일\n' + ''.join(
+        f'상호{i},000-00-{i:05d},대표,{i % 13},{i * 10},{i * 1000},2024-{i % 12 + 1:02d}-28\n' for i in range(25))
+    report = importer.import_file(repository, 'contracts', io.BytesIO(csv.encode('utf-8')), 'c.csv', batch_size=10,
+                                  ledger_rows=ledger.inserted_rows)
+    assert report['inserted'] == 25
+    assert ledger.check(repository) == []
+
+
+def test_import_batch_rolls_back_with_ledger(path, monkeypatch):
+    # 원장 반영이 실패하면 그 배치의 행도 남지 않는다
+    repository = SQLiteRepository(path)
+    before = len(repository.select('payment_records', columns=('id',)))
+
+    def fail(conn, rows):
+        raise RuntimeError('ledger')
+
+    monkeypatch.setattr(repository, '_apply_ledger_deltas', fail)
+    rows = [{'payment_date': '2024-05-01', 'payment_amount': 1000.0}]
+    with pytest.raises(RuntimeError):
+        repository.insert_many_with_ledger('payment_records', rows, ledger.inserted_rows)
+    assert len(repository.select('payment_records', columns=('id',))) == before
@@ -0,0 +1,129 @@
+import random
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+import pytest
+from dateutil.relativedelta import relativedelta
+import schedule
+
+# schedule.py가 예전 relativedelta 루프(월별 할부금/대시보드 화면)와 같은 숫자를 내는지 확인한다
+
+
+def loop_schedules(contracts):
+    # 예전 /monthly_installments 루프: 계약금은 시작 월, 나머지는 할부 개월 수로 나눔 (0이면 일시불)
+    monthly_data = defaultdict(float)
+    contract_data = []
+    for contract in contracts:
+        start_date = datetime.strptime(contract['start_date'], '%Y-%m-%d')
+        start_month = start_date.strftime('%Y-%m')
+        contract_monthly = defaultdict(float)
+        monthly_data[start_month] += contract['contract_amount']
+        contract_monthly[start_month] += contract['contract_amount']
+        if contract['payment_months'] > 0:
+            monthly_installment = (contract['total_installment'] - contract['contract_amount']) / contract['payment_months']
+            for i in range(contract['payment_months']):
+                month = (start_date + relativedelta(months=i)).strftime('%Y-%m')
+                monthly_data[month] += monthly_installment
+                contract_monthly[month] += monthly_installment
+        else:
+            monthly_data[start_month] += contract['total_installment'] - contract['contract_amount']
+            contract_monthly[start_month] += contract['total_installment'] - contract['contract_amount']
+        contract_data.append(contract_monthly)
+    return monthly_data, contract_data
+
+
+def loop_installments(contracts):
+    # 예전 /dashboard 루프: total_installment 전체를 할부 개월 수로 나눔.
+    # 할부기간 0인 계약은 예전 코드에서 ZeroDivisionError였고 지금은 건너뛴다
+    monthly_installments = defaultdict(float)
+    for contract in contracts:
+        if contract['payment_months'] <= 0:
+            continue
+        start_date = datetime.strptime(contract['start_date'], '%Y-%m-%d')
+        monthly_installment = contract['total_installment'] / contract['payment_months']
+        for i in range(contract['payment_months']):
+            month = (start_date + relativedelta(months=i)).strftime('%Y-%m')
+            monthly_installments[month] += monthly_installment
+    return monthly_installments
+
+
+def contract(id, start_date, payment_months, total_installment, contract_amount):
+    return {'id': id, 'start_date': start_date, 'payment_months': payment_months,
+            'total_installment': total_installment, 'contract_amount': contract_amount}
+
+
+FIXTURE = [
+    contract(1, '2024-01-31', 12, 1200000.0, 200000.0),   # 말일 시작: 2월은 29일, 4월은 30일로 맞춰짐
+    contract(2, '2023-08-31', 7, 700000.0, 0.0),
+    contract(3, '2024-02-29', 24, 2400000.0, 100000.0),   # 윤일 시작
+    contract(4, '2024-03-15', 0, 500000.0, 100000.0),     # 일시불
+    contract(5, '2024-03-01', 0, 300000.0, 0.0),
+    contract(6, '2022-12-31', 3, 1000000.0, 1000000.0),   # 계약금만
+    contract(7, '2024-05-10', 36, 1000000.0, 333333.0),   # 나누어떨어지지 않는 할부금
+    contract(8, '2024-01-31', 1, 50000.0, 10000.0),
+]
+
+
+def random_contracts(count=300, seed=7):
+    rng = random.Random(seed)
+    contracts = []
+    for id in range(count):
+        day = rng.choice([1, 15, 28, 29, 30, 31])
+        month = rng.randint(1, 12)
+        year = rng.randint(2018, 2026)
+        last_day = (datetime(year + month // 12, month % 12 + 1, 1) - datetime(year, month, 1)).days
+        total = float(rng.randint(1, 5000) * 1000)
+        contracts.append(contract(id, f'{year}-{month:02d}-{min(day, last_day):02d}',
+                                  rng.choice([0, 1, 3, 6, 10, 12, 24, 36, 60]), total,
+                                  float(rng.randint(0, int(total // 1000)) * 1000)))
+    return contracts
+
+
+@pytest.fixture(params=['fixture', 'random'])
+def contracts(request):
+    return FIXTURE if request.param == 'fixture' else random_contracts()
+
+
+def test_monthly_totals_matches_loop(contracts):
+    expected, _ = loop_schedules(contracts)
+    assert schedule.monthly_totals(contracts) == dict(sorted(expected.items()))
+
+
+def test_monthly_totals_without_contract_amount_matches_dashboard_loop(contracts):
+    expected = loop_installments(contracts)
+    assert schedule.monthly_totals(contracts, include_contract_amount=False) == dict(sorted(expected.items()))
+
+
+def test_contract_schedules_match_loop(contracts):
+    expected_totals, expected_rows = loop_schedules(contracts)
+    totals, rows = schedule.contract_schedules(contracts)
+    assert totals == dict(sorted(expected_totals.items()))
+    assert [dict(row) for row in rows] == [dict(row) for row in expected_rows]
+
+
+@pytest.mark.parametrize('include_contract_amount', [True, False])
+@pytest.mark.parametrize('start_month, end_month', [('2024-02', '2024-06'), ('2019-01', '2019-01'), ('2030-01', '2030-12')])
+def test_window_matches_filtered_loop(contracts, include_contract_amount, start_month, end_month):
+    # 기간을 주면 전체 루프 결과에서 그 기간의 달만 고른 것과 같다
+    expected = loop_schedules(contracts)[0] if include_contract_amount else loop_installments(contracts)
+    expected = {month: amount for month, amount in sorted(expected.items()) if start_month <= month <= end_month}
+    assert schedule.monthly_totals(contracts, include_contract_amount, start_month, end_month) == expected
+
+
+def test_expand_months_follow_relativedelta():
+    # 항목별 월이 relativedelta(months=i)로 만든 월과 같다 (말일 시작 포함)
+    columns = schedule._columns(FIXTURE)
+    rows, month, amount = schedule.expand(*columns, include_contract_amount=False)
+    labels = schedule.month_labels(month)
+    expected = []
+    for contract in FIXTURE:
+        start_date = datetime.strptime(contract['start_date'], '%Y-%m-%d')
+        expected.extend((contract['id'], (start_date + relativedelta(months=i)).strftime('%Y-%m'))
+                        for i in range(contract['payment_months']))
+    assert [(FIXTURE[row]['id'], label) for row, label in zip(rows.tolist(), labels)] == expected
+    assert np.all(amount > 0)
+
+
+def test_empty():
+    assert schedule.monthly_totals([]) == {}
+    assert schedule.contract_schedules([]) == ({}, [])
@@ -0,0 +1,85 @@
+from cache import AggregateCache, create_cache
+from export_cache import ExportCache
+
+# prefork 워커 두 개를 같은 버전 디렉터리를 쓰는 캐시 두 개로 흉내 내어,
+# 한 워커의 쓰기(invalidate)가 다른 워커의 캐시 키를 바꾸는지 확인한다.
+
+
+def test_invalidate_reaches_other_worker(tmp_path):
+    first = AggregateCache(versions_dir=str(tmp_path))
+    second = AggregateCache(versions_dir=str(tmp_path))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert second.get_or_compute('contract_status', ('contracts', 'payment_records'), compute) == 1
+    assert second.get_or_compute('contract_status', ('contracts', 'payment_records'), compute) == 1
+    first.invalidate('payment_records')
+    assert second.version('payment_records') == first.version('payment_records') != 0
+    assert second.get_or_compute('contract_status', ('contracts', 'payment_records'), compute) == 2
+
+
+def test_local_versions_without_directory():
+    first = AggregateCache()
+    second = AggregateCache()
+    first.invalidate('contracts')
+    assert first.version('contracts') == 1
+    assert second.version('contracts') == 0
+
+
+def test_cache_shares_export_cache_versions(tmp_path):
+    cache = create_cache({'EXPORT_CACHE_DIR': str(tmp_path)})
+    export_cache = ExportCache(str(tmp_path))
+    export_cache.invalidate('contracts')
+    assert cache.version('contracts') == export_cache.version('contracts') != 0
+    cache.invalidate('contracts', 'payment_records')
+    assert export_cache.version('payment_records') == cache.version('payment_records') != 0
+
+
+class FakeBundle:
+    # 갱신 프로세스가 게시한 묶음 대신 income/installments/revenue 시리즈만 돌려준다
+    def __init__(self, version, amount):
+        self.version = version
+        self.amount = amount
+
+    def series(self, name, start_month=None, end_month=None):
+        return {'2024-01': self.amount}
+
+
+class FakeShared:
+    def __init__(self, bundle):
+        self.bundle = bundle
+
+    def current(self):
+        return self.bundle
+
+    def mark_dirty(self):
+        pass
+
+
+def test_monthly_series_follows_shared_bundle_version(tmp_path):
+    # 쓰기로 테이블 버전이 먼저 오른 뒤 새 묶음이 게시되면, 옛 묶음으로 계산한 값을 계속 보내지 않는다
+    import shutil
+    import benchmark
+    path = tmp_path / 'contracts.db'
+    shutil.copy(benchmark.os.path.join(benchmark.os.path.dirname(benchmark.__file__), 'contracts.db'), path)
+    app = benchmark._load_app(str(path), cache=False)
+    saved = {name: app.extensions.pop(name, None) for name in ('aggregate_cache', 'shared_aggregates', 'repository', 'analytics_snapshot')}
+    directory = app.config['SHARED_AGGREGATES_DIR']
+    try:
+        app.config['SHARED_AGGREGATES_DIR'] = str(tmp_path / 'shared')
+        app.extensions['aggregate_cache'] = AggregateCache(versions_dir=str(tmp_path / 'versions'))
+        shared = app.extensions['shared_aggregates'] = FakeShared(FakeBundle(1, 100.0))
+        client = app.test_client()
+        url = '/api/monthly_series?series=income&start_month=2024-01&end_month=2024-01'
+        assert client.get(url).get_json()['series']['income'] == [100.0]
+        shared.bundle = FakeBundle(2, 200.0)
+        assert client.get(url).get_json()['series']['income'] == [200.0]
+    finally:
+        app.config['SHARED_AGGREGATES_DIR'] = directory
+        for name, value in saved.items():
+            app.extensions.pop(name, None)
+            if value is not None:
+                app.extensions[name] = value
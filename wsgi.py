@@ -0,0 +1,3 @@
+from app import app
+
+# WSGI 진입점: gunicorn -c gunicorn.conf.py wsgi:app